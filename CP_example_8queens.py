@@ -6,9 +6,76 @@ Created on Thu Feb  9 12:38:01 2023
 """
 
 from ortools.sat.python import cp_model
+import collections
+import KC_model_io
 
 
-def queens_problem(board_size):
+encodings = ("pairwise", "alldifferent")
+
+
+class QueensSolutionCallback(cp_model.CpSolverSolutionCallback):
+    """Streams the solutions found. Only the last buffer_size solutions are
+    kept in memory (all of them if buffer_size is None); if a file is given
+    every solution is also written to it as one line of rows. The search is
+    stopped after limit solutions."""
+
+    def __init__(self, queens, limit=None, buffer_size=None, file=None):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.__queens = queens
+        self.__limit = limit
+        self.__file = file
+        self.solutions = collections.deque(maxlen=buffer_size)
+        self.solution_count = 0
+
+    def on_solution_callback(self):
+        """Called at each new solution."""
+        rows = [self.Value(q) for q in self.__queens]
+        self.solutions.append(rows)
+        if self.__file is not None:
+            self.__file.write(' '.join(map(str, rows)) + '\n')
+        self.solution_count += 1
+        if self.__limit is not None and self.solution_count >= self.__limit:
+            self.StopSearch()
+
+
+def explicit_solution(board_size):
+    """Returns a solution of the n-queens problem (n >= 4) from the classical
+    explicit construction: even rows first, then odd rows, with the
+    exceptions for n mod 6 = 2 or 3."""
+    evens = list(range(2, board_size + 1, 2))
+    odds = list(range(1, board_size + 1, 2))
+    if board_size % 6 == 2:
+        odds = [3, 1] + odds[3:] + [5]
+    elif board_size % 6 == 3:
+        evens = evens[1:] + [2]
+        odds = odds[2:] + [1, 3]
+    return [row - 1 for row in evens + odds]
+
+
+def queens_model(board_size, encoding="pairwise", hint=False):
+    """Builds the n-queens model and returns it with its handles (the list of
+    queen variables, one per column, valued by the row).
+    Arguments:
+        encoding: "pairwise" adds the three != constraints for every pair of
+            columns (O(n^2) constraints); "alldifferent" adds one
+            AddAllDifferent on the rows and one on each diagonal direction
+            (queens[i] + i and queens[i] - i), O(n) in size
+        hint: if True, the explicit solution is given to the solver as a hint"""
+    if encoding not in encodings:
+        raise ValueError("encoding must be one of %s, not %r" % (encodings, encoding))
+    if encoding == "alldifferent":
+        model, handles = _queens_model_alldifferent(board_size)
+    else:
+        model, handles = _queens_model_pairwise(board_size)
+
+    if hint and board_size >= 4:
+        for queen, row in zip(handles["queens"], explicit_solution(board_size)):
+            model.AddHint(queen, row)
+    return model, handles
+
+
+def _queens_model_pairwise(board_size):
+    """Builds the n-queens model with the three != constraints per pair."""
     model = cp_model.CpModel()
 
     # Variables
@@ -21,14 +88,198 @@ def queens_problem(board_size):
             model.Add(queens[i] + i != queens[j] + j)  # upper diagonal
             model.Add(queens[i] - i != queens[j] - j)  # lower diagonal
 
+    return model, {"queens": queens}
+
+
+def _queens_model_alldifferent(board_size):
+    """Builds the n-queens model with three AddAllDifferent constraints."""
+    model = cp_model.CpModel()
+
+    # Variables
+    queens = [model.NewIntVar(lb=0, ub=board_size - 1, name="x%d" % i) for i in range(board_size)]
+
+    # Constraints
+    model.AddAllDifferent(queens)  # same row
+    model.AddAllDifferent(queens[i] + i for i in range(board_size))  # upper diagonal
+    model.AddAllDifferent(queens[i] - i for i in range(board_size))  # lower diagonal
+
+    return model, {"queens": queens}
+
+
+def queens_problem(board_size, model_file=None, encoding="pairwise"):
+    """Solves the n-queens problem and returns the row of the queen in every
+    column. If model_file is given, the model is imported from it when it
+    exists for the same board size and encoding (no build), and exported to it
+    after the build otherwise; the file
+    is a binary proto, or text if the name ends with ".txt" (KC_model_io).
+    encoding: "pairwise" or "alldifferent" (see queens_model)"""
+    model, handles, _ = KC_model_io.load_or_build(
+        model_file, lambda: queens_model(board_size, encoding),
+        {"board_size": board_size, "encoding": encoding})
+    queens = handles["queens"]
+
     # Solve
     solver = cp_model.CpSolver()
     solver.Solve(model)
 
     # Print solution
-    result = [solver.Value(queens[i]) for i in range(board_size)]
-    # model.ExportToFile(file="queens.lp")  # Trying get this to write an .lp file, but it's coming out as gibberish
+    result = [solver.Value(queens[i]) for i in range(len(queens))]
     return result
 
 
-print(queens_problem(8))
+def all_queens_solutions(board_size, encoding="alldifferent", limit=None):
+    """Enumerates the solutions of the n-queens problem (all of them, or the
+    first limit) and returns them as a list of row lists."""
+    model, handles = queens_model(board_size, encoding)
+    solver = cp_model.CpSolver()
+    solver.parameters.enumerate_all_solutions = True
+    callback = QueensSolutionCallback(handles["queens"], limit)
+    solver.Solve(model, callback)
+    return list(callback.solutions)
+
+
+def symmetric_images(queens, inverse=None):
+    """Returns the images of the queens under the 7 non-identity symmetries of
+    the board (reflections and rotations). queens is a list of variables or of
+    values, one per column, valued by the row; inverse[r] is the column of
+    the queen in row r and is computed when queens are values."""
+    n = len(queens)
+    if inverse is None:
+        inverse = [0] * n
+        for column, row in enumerate(queens):
+            inverse[row] = column
+    return [[queens[n - 1 - j] for j in range(n)],  # mirror the columns
+            [n - 1 - queens[j] for j in range(n)],  # mirror the rows
+            [n - 1 - queens[n - 1 - j] for j in range(n)],  # rotate 180
+            [inverse[j] for j in range(n)],  # transpose
+            [inverse[n - 1 - j] for j in range(n)],  # rotate 90
+            [n - 1 - inverse[j] for j in range(n)],  # rotate 270
+            [n - 1 - inverse[n - 1 - j] for j in range(n)]]  # anti-transpose
+
+
+def add_symmetry_breaking(model, queens):
+    """This function keeps only the lexicographically smallest solution of
+    every class of symmetric solutions (lex-leader constraints for the 7
+    reflections and rotations of the board), which divides the number of
+    solutions by up to 8. The inverse permutation (the column of the queen in
+    every row) is channeled with AddInverse. Every auxiliary variable is fixed
+    by the queens, so enumeration still gives each solution once."""
+    n = len(queens)
+    inverse = [model.NewIntVar(0, n - 1, "inv%d" % r) for r in range(n)]
+    model.AddInverse(queens, inverse)
+    for k, image in enumerate(symmetric_images(queens, inverse)):
+        _add_lex_less_equal(model, queens, image, "sym%d" % k)
+
+
+def _add_lex_less_equal(model, x, y, name):
+    """Adds x <= y in lexicographic order: x[k] <= y[k] as long as the
+    prefixes before k are equal. prefix_equal and equal are reified both ways
+    so that they are fixed by x and y."""
+    prefix_equal = None  # the empty prefix is equal
+    for k in range(len(x)):
+        if prefix_equal is None:
+            model.Add(x[k] <= y[k])
+        else:
+            model.Add(x[k] <= y[k]).OnlyEnforceIf(prefix_equal)
+        if k == len(x) - 1:
+            break
+
+        equal = model.NewBoolVar('%s_eq%d' % (name, k))
+        model.Add(x[k] == y[k]).OnlyEnforceIf(equal)
+        model.Add(x[k] != y[k]).OnlyEnforceIf(equal.Not())
+        if prefix_equal is None:
+            prefix_equal = equal
+        else:
+            both = model.NewBoolVar('%s_prefix%d' % (name, k))
+            model.AddBoolAnd([prefix_equal, equal]).OnlyEnforceIf(both)
+            model.AddBoolOr([prefix_equal.Not(), equal.Not()]).OnlyEnforceIf(both.Not())
+            prefix_equal = both
+
+
+def enumerate_queens(board_size, encoding="alldifferent", symmetry_breaking=False,
+                     buffer_size=1000, path=None, limit=None, max_time_in_seconds=None):
+    """This function enumerates the solutions of the n-queens problem and
+    streams them through QueensSolutionCallback, so memory does not grow with
+    the number of solutions.
+    Arguments:
+        encoding: "pairwise" or "alldifferent" (see queens_model)
+        symmetry_breaking: if True, only one solution per symmetry class is
+            enumerated (see add_symmetry_breaking)
+        buffer_size: number of most recent solutions kept in memory
+        path: optional file to which every solution is written, one per line
+        limit: stop after this many solutions
+    Returns a dictionary with the status, the number of solutions, the
+    buffered solutions, the wall time and the number of solutions per second."""
+    model, handles = queens_model(board_size, encoding)
+    if symmetry_breaking:
+        add_symmetry_breaking(model, handles["queens"])
+
+    solver = cp_model.CpSolver()
+    solver.parameters.enumerate_all_solutions = True
+    if max_time_in_seconds is not None:
+        solver.parameters.max_time_in_seconds = max_time_in_seconds
+    file = open(path, "w") if path is not None else None
+    try:
+        callback = QueensSolutionCallback(handles["queens"], limit, buffer_size, file)
+        status = solver.Solve(model, callback)
+    finally:
+        if file is not None:
+            file.close()
+
+    return {"status": solver.StatusName(status),
+            "solutions": callback.solution_count,
+            "buffer": list(callback.solutions),
+            "wall_time": solver.WallTime(),
+            "solutions_per_second": callback.solution_count / max(solver.WallTime(), 1e-9)}
+
+
+def benchmark_encodings(sizes=(8, 100, 500, 1000, 2000, 4000), max_pairwise_size=500,
+                        max_solve_size=1000, max_time_in_seconds=30.0, hint=True):
+    """Builds and solves the n-queens model for every board size with both
+    encodings and returns a list of result dictionaries: encoding, size,
+    constraints, model bytes, build time, solve time and status.
+    The pairwise encoding is only built up to max_pairwise_size (its build
+    alone takes about a minute for n = 1000). Models larger than
+    max_solve_size are built but not solved: presolve expands the
+    AllDifferent on the rows into n^2 literals and loading them does not
+    stop at the time limit. With hint, both encodings are warm started from
+    the explicit solution."""
+    import time
+
+    results = []
+    for board_size in sizes:
+        for encoding in encodings:
+            if encoding == "pairwise" and board_size > max_pairwise_size:
+                continue
+            build_start = time.time()
+            model, handles = queens_model(board_size, encoding, hint)
+            build_time = time.time() - build_start
+
+            result = {"encoding": encoding, "size": board_size,
+                      "constraints": len(model.Proto().constraints),
+                      "bytes": model.Proto().ByteSize(),
+                      "build_time": build_time, "solve_time": 0.0, "status": "NOT_SOLVED"}
+            if board_size <= max_solve_size:
+                solver = cp_model.CpSolver()
+                solver.parameters.max_time_in_seconds = max_time_in_seconds
+                status = solver.Solve(model)
+                result.update({"solve_time": solver.WallTime(), "status": solver.StatusName(status)})
+            results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    print(queens_problem(8))
+    print('%i solutions of the 8-queens problem' % len(all_queens_solutions(8)))
+
+    for board_size in (8, 10, 12):
+        for symmetry_breaking in (False, True):
+            report = enumerate_queens(board_size, symmetry_breaking=symmetry_breaking)
+            print('n=%2i symmetry breaking %-5s: %6i solutions in %6.2f s (%8.0f solutions/s) %s' %
+                  (board_size, symmetry_breaking, report["solutions"], report["wall_time"],
+                   report["solutions_per_second"], report["status"]), flush=True)
+
+    for r in benchmark_encodings():
+        print('%-12s n=%5i  constraints %8i  %10i bytes  build %7.2f s  solve %7.2f s  %s' %
+              (r["encoding"], r["size"], r["constraints"], r["bytes"], r["build_time"],
+               r["solve_time"], r["status"]), flush=True)
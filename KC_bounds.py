@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 20 00:05:00 2026
+
+Lower bounds on the makespan of the flexible targetshop, computed from the
+big dataframe without CP-SAT.
+
+Every (target, phase) is relaxed to its shortest alternative. Its head is the
+shortest work of its target before it and its tail the shortest work after
+it. Three bounds follow:
+    critical path: the shortest work of every target (the longest one bounds
+        the makespan).
+    energy: for a set S of platforms, the phases whose alternatives are all
+        in S must be processed on S, so the makespan is at least the smallest
+        head, plus their work divided by |S|, plus the smallest tail. The sets
+        tried are the alternative sets of the phases and all platforms.
+    Jackson: the same phases on one machine of speed |S| (a relaxation of |S|
+        parallel platforms), with heads and tails, and preemption allowed.
+        Jackson's preemptive schedule (always run the available phase with
+        the longest tail) gives the optimal makespan of that relaxation.
+The bounds are cheap, so they can be computed in a thread while CP-SAT
+solves (start_bounds), used to prove a gap early and stop the search
+(GapLimit), and added to the model as a constraint on the makespan
+(add_makespan_bound).
+"""
+
+import concurrent.futures
+import heapq
+import math
+import numpy as np
+from ortools.sat.python import cp_model
+
+
+def phase_relaxation(df):
+    """This function returns the relaxed phases of the big dataframe as a
+    dictionary of arrays indexed by (target, phase), sorted on target_num and
+    phase_num: target, phase, duration (shortest alternative), head, tail and
+    platforms (frozenset of the plat_num of the alternatives)."""
+    feasible = df[df["PLATPROCTIME"] >= 0]
+    groups = feasible.groupby(["Target_num", "Phase_num"])
+    duration = groups["PLATPROCTIME"].min()
+    platforms = groups["Plat_num"].agg(frozenset)
+
+    target = duration.index.get_level_values(0).to_numpy()
+    d = duration.to_numpy().astype(np.int64)
+    work_before = duration.groupby(level=0).cumsum().to_numpy() - d
+    work = duration.groupby(level=0).transform("sum").to_numpy()
+    return {"target": target,
+            "phase": duration.index.get_level_values(1).to_numpy(),
+            "duration": d,
+            "head": work_before,
+            "tail": work - work_before - d,
+            "platforms": platforms.to_numpy()}
+
+
+def jackson_preemptive(heads, durations, tails):
+    """This function returns the makespan of Jackson's preemptive schedule on
+    one machine: max over the jobs of completion + tail, running at any time
+    the released job with the longest tail."""
+    order = np.argsort(heads, kind="stable")
+    heap = []  # (-tail, remaining duration)
+    time_now = 0.0
+    makespan = 0.0
+    k = 0
+    n = len(order)
+    while k < n or heap:
+        if not heap:
+            time_now = max(time_now, heads[order[k]])
+        while k < n and heads[order[k]] <= time_now:
+            j = order[k]
+            heapq.heappush(heap, (-tails[j], durations[j]))
+            k += 1
+        tail, remaining = heapq.heappop(heap)
+        next_release = heads[order[k]] if k < n else math.inf
+        if time_now + remaining > next_release:
+            heapq.heappush(heap, (tail, remaining - (next_release - time_now)))
+            time_now = next_release
+        else:
+            time_now += remaining
+            makespan = max(makespan, time_now - tail)
+    return makespan
+
+
+def lower_bounds(df):
+    """This function returns a dictionary with the lower bounds on the makespan
+    (see the module docstring):
+        critical_path, critical_target: the bound and the target_num giving it
+        energy, energy_platforms: the energy bound and its set of plat_num
+        jackson, jackson_platforms: the Jackson bound and its set of plat_num
+        bound: the best of the three"""
+    phases = phase_relaxation(df)
+    duration, head, tail = phases["duration"], phases["head"], phases["tail"]
+
+    length = head + duration + tail
+    k = int(np.argmax(length))
+    result = {"critical_path": int(length[k]), "critical_target": int(phases["target"][k]),
+              "energy": 0, "energy_platforms": frozenset(),
+              "jackson": 0, "jackson_platforms": frozenset()}
+
+    all_platforms = frozenset(int(p) for p in df["Plat_num"].unique())
+    for platforms in set(phases["platforms"]) | {all_platforms}:
+        inside = np.array([s <= platforms for s in phases["platforms"]]) & (duration > 0)
+        if not inside.any():
+            continue
+        m = len(platforms)
+        energy = head[inside].min() + duration[inside].sum() / m + tail[inside].min()
+        if math.ceil(energy - 1e-9) > result["energy"]:
+            result["energy"], result["energy_platforms"] = math.ceil(energy - 1e-9), platforms
+        jackson = jackson_preemptive(head[inside].astype(float), duration[inside] / m,
+                                     tail[inside].astype(float))
+        if math.ceil(jackson - 1e-9) > result["jackson"]:
+            result["jackson"], result["jackson_platforms"] = math.ceil(jackson - 1e-9), platforms
+
+    result["bound"] = max(result["critical_path"], result["energy"], result["jackson"])
+    return result
+
+
+def start_bounds(df):
+    """This function starts lower_bounds in a background thread and returns its
+    concurrent.futures.Future, so the bounds are computed while the model is
+    built and solved."""
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(lower_bounds, df)
+    executor.shutdown(wait=False)
+    return future
+
+
+def add_makespan_bound(model, handles, bound):
+    """This function adds makespan >= bound to a model built by
+    KC_model.flexible_targetshop_model (bound is a number or the dictionary of
+    lower_bounds)."""
+    if isinstance(bound, dict):
+        bound = bound["bound"]
+    model.Add(handles["makespan"] >= int(bound))
+
+
+def best_bound(solver_bound, bounds):
+    """Returns the best of the solver's bound and the bound of lower_bounds (a
+    dictionary, a Future that is ignored until done, or None)."""
+    if isinstance(bounds, concurrent.futures.Future):
+        bounds = bounds.result() if bounds.done() else None
+    return max(solver_bound, bounds["bound"] if bounds is not None else 0)
+
+
+def proven_gap(objective, solver_bound, bounds):
+    """Returns the relative gap between a makespan and best_bound."""
+    bound = best_bound(solver_bound, bounds)
+    return (objective - bound) / objective if objective > 0 else 0.0
+
+
+class GapLimit(cp_model.CpSolverSolutionCallback):
+    """Stops the search as soon as the gap of a solution, proven with the
+    solver's bound and the bounds of lower_bounds, is at most gap."""
+
+    def __init__(self, bounds, gap=0.0):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.bounds = bounds
+        self.gap = gap
+        self.stopped = False
+
+    def on_solution_callback(self):
+        """Called at each new solution."""
+        if proven_gap(self.ObjectiveValue(), self.BestObjectiveBound(), self.bounds) <= self.gap:
+            self.stopped = True
+            self.StopSearch()
+
+
+if __name__ == "__main__":
+    import time
+    import KC_data_stack
+    import KC_model
+
+    f = "small_inputs_gmuV5.xlsx"  # enter the filename (path) for the data
+    df = KC_data_stack.create_big_dataframe(f)
+
+    start_time = time.time()
+    bounds = lower_bounds(df)
+    print('bounds in %.3f s: critical path %i (target %i), energy %i (platforms %s), '
+          'Jackson %i (platforms %s)' %
+          (time.time() - start_time, bounds["critical_path"], bounds["critical_target"],
+           bounds["energy"], sorted(bounds["energy_platforms"]), bounds["jackson"],
+           sorted(bounds["jackson_platforms"])))
+
+    future = start_bounds(df)
+    model, handles = KC_model.flexible_targetshop_model(df, formulation="lean")
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = 10.0
+    status = solver.Solve(model)
+    print('CP-SAT alone: makespan %i, bound %i, gap %.3f; with the bounds: gap %.3f' %
+          (solver.ObjectiveValue(), solver.BestObjectiveBound(),
+           proven_gap(solver.ObjectiveValue(), solver.BestObjectiveBound(), {"bound": 0}),
+           proven_gap(solver.ObjectiveValue(), solver.BestObjectiveBound(), future)))
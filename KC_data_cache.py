@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 17:30:00 2026
+
+Incremental updates of the big dataframe when the workbook changes.
+
+Every sheet is hashed from its XML part in the .xlsx archive, which is much
+cheaper than parsing it. The sheets are grouped by the KC_data_melt function
+that reads and melts them, so when a sheet changes only its group is read and
+melted again. If the rows of the group (its ids, types and phases) are the same
+as before, the new values are written into the affected rows of the cached big
+dataframe and of the cached phase alternatives in place; otherwise the joins
+are redone from the cached group dataframes without reading the other sheets.
+"""
+
+import hashlib
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+import numpy as np
+import pandas as pd
+import KC_data_melt
+import KC_model
+
+# group name: (import function, sheets it reads, lookup keys, structure
+# columns, suffix given by join_big_dataframe to columns that collide)
+sheet_groups = {
+    "target": (KC_data_melt.import_target_data,
+               ("inp_TargetType", "inp_TargetDetail", "inp_TargetKCReq"),
+               ["Target ID", "Phase"], ["Target ID", "Target Type", "Phase"], "_x"),
+    "platform": (KC_data_melt.import_platform_data,
+                 ("inp_PlatformDetail", "inp_PlatPosTime", "inp_PlatType",
+                  "inp_PlatCapacityAvailable", "inp_WpnLoadout", "inp_IFTUCAPACITY",
+                  "inp_MINIFTUDURATION"),
+                 ["Plat ID", "Phase"], ["Plat ID", "Plat Type", "Phase"], "_y"),
+    "platform_target": (KC_data_melt.import_platform_target_data,
+                        ("inp_PlatDetCapes", "inp_PlatCapacity", "inp_PlatProcTime",
+                         "inp_PlatTrackLife", "inp_PlatRange"),
+                        ["Plat Type", "Target Type", "Phase"],
+                        ["Plat Type", "Target Type", "Phase"], ""),
+    "weapon": (KC_data_melt.import_weapon_data,
+               ("inp_WpnType", "inp_WpnSurv", "inp_SSPK", "wpns_shots_reqd",
+                "inp_ARMLASTDIST", "inp_MAXTIMEBEFOREFIRSTIFTU", "inp_LASTIFTUDIST"),
+               None, None, None)}
+
+_ns = {"main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+       "rel": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+       "pkg": "http://schemas.openxmlformats.org/package/2006/relationships"}
+
+
+def sheet_hashes(f):
+    """This function returns a dictionary of content hashes indexed by sheet
+    name. A sheet is hashed from its XML part in the archive, together with the
+    shared strings table when the sheet has string cells (a string edit may only
+    change that table). Argument: filename (path) of the excel file"""
+    with zipfile.ZipFile(f) as archive:
+        names = archive.namelist()
+        shared = archive.read("xl/sharedStrings.xml") if "xl/sharedStrings.xml" in names else b""
+
+        hashes = {}
+        for name, part in _sheet_parts(archive).items():
+            content = archive.read(part)
+            digest = hashlib.sha1(content)
+            if b't="s"' in content:
+                digest.update(shared)
+            hashes[name] = digest.hexdigest()
+    return hashes
+
+
+def _sheet_parts(archive):
+    """Returns the name of the XML part of every sheet of an open .xlsx
+    archive, indexed by sheet name."""
+    workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+    rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    targets = {r.get("Id"): r.get("Target") for r in rels.findall("pkg:Relationship", _ns)}
+
+    parts = {}
+    for sheet in workbook.find("main:sheets", _ns):
+        target = targets[sheet.get("{%s}id" % _ns["rel"])].lstrip("/")
+        parts[sheet.get("name")] = target if target.startswith("xl/") else "xl/" + target
+    return parts
+
+
+def load_scenario(f):
+    """This function reads the workbook and returns the cache used by
+    update_scenario: a dictionary with the file name, the sheet hashes, the
+    group dataframes (frames), the big dataframe (df), the weapon dataframe
+    (df_wt) and the phase alternatives of KC_model.phase_alternatives."""
+    frames = {name: group[0](f) for name, group in sheet_groups.items()}
+    df = KC_data_melt.join_big_dataframe(frames["target"], frames["platform"],
+                                         frames["platform_target"])
+    return {"f": f,
+            "hashes": sheet_hashes(f),
+            "frames": frames,
+            "df": df,
+            "df_wt": frames["weapon"],
+            "alternatives": KC_model.phase_alternatives(df)}
+
+
+def update_scenario(cache, f=None):
+    """This function brings the cache from load_scenario up to date with the
+    workbook (by default the file it was loaded from). Only the groups with a
+    changed sheet are read again. Returns a dictionary describing the update:
+        sheets: names of the changed sheets
+        groups: names of the groups read again
+        rebuilt: True if the big dataframe had to be joined again (the rows of
+            a group changed); Target_num and Plat_num may then be renumbered
+        rows: index of the rows of the big dataframe patched in place
+        columns: columns of the big dataframe patched in place"""
+    if f is not None:
+        cache["f"] = f
+    hashes = sheet_hashes(cache["f"])
+    changed = sorted(s for s in hashes if hashes[s] != cache["hashes"].get(s))
+    groups = [name for name, group in sheet_groups.items() if set(group[1]) & set(changed)]
+    update = {"sheets": changed, "groups": groups, "rebuilt": False,
+              "rows": np.array([], dtype=int), "columns": []}
+
+    patches = []
+    for name in groups:
+        importer, _, keys, structure, suffix = sheet_groups[name]
+        old, new = cache["frames"][name], importer(cache["f"])
+        cache["frames"][name] = new
+        if keys is None:
+            continue
+        if not _same_rows(old, new, structure):
+            update["rebuilt"] = True
+        else:
+            patches.append((new, _changed_rows(old, new, keys), keys, suffix))
+
+    cache["hashes"] = hashes
+    cache["df_wt"] = cache["frames"]["weapon"]
+    if update["rebuilt"]:
+        frames = cache["frames"]
+        cache["df"] = KC_data_melt.join_big_dataframe(frames["target"], frames["platform"],
+                                                      frames["platform_target"])
+        cache["alternatives"] = KC_model.phase_alternatives(cache["df"])
+        return update
+
+    rows = set()
+    columns = set()
+    for new, changed_rows, keys, suffix in patches:
+        patched_rows, patched_columns = _patch_rows(cache["df"], new, changed_rows, keys, suffix)
+        rows.update(patched_rows)
+        columns.update(patched_columns)
+    update["rows"] = np.array(sorted(rows), dtype=int)
+    update["columns"] = sorted(columns)
+
+    if "PLATPROCTIME" in columns:
+        _patch_alternatives(cache["alternatives"], cache["df"], update["rows"])
+    return update
+
+
+def _same_rows(old, new, structure):
+    """Returns True if both group dataframes have the same rows, in the same
+    order, on the structure columns (the columns used by the joins)."""
+    if len(old) != len(new):
+        return False
+    return old[structure].reset_index(drop=True).equals(new[structure].reset_index(drop=True))
+
+
+def _changed_rows(old, new, keys):
+    """Returns a boolean dataframe, indexed like new, that is True where a
+    value column differs between the two group dataframes."""
+    columns = [c for c in new.columns if c not in keys]
+    a = old[columns].reset_index(drop=True)
+    b = new[columns].reset_index(drop=True)
+    differs = (a != b) & ~(a.isna() & b.isna())
+    differs.index = new.index
+    return differs
+
+
+def _patch_rows(df, new, differs, keys, suffix):
+    """Writes the changed values of a group dataframe into the rows of the big
+    dataframe with the same keys. Returns the row index and the columns
+    patched."""
+    changed = differs.any(axis=1)
+    columns = [c for c in differs.columns if differs[c].any()]
+    if not changed.any():
+        return [], []
+
+    changed_keys = pd.MultiIndex.from_frame(new.loc[changed, keys])
+    rows = np.flatnonzero(pd.MultiIndex.from_frame(df[keys]).isin(changed_keys))
+    values = new.set_index(keys).loc[pd.MultiIndex.from_frame(df.loc[rows, keys]), columns]
+
+    df_columns = [c if c in df.columns else c + suffix for c in columns]
+    for column, df_column in zip(columns, df_columns):
+        df.iloc[rows, df.columns.get_loc(df_column)] = values[column].to_numpy()
+    return rows, df_columns
+
+
+def _patch_alternatives(alternatives, df, rows):
+    """Recomputes the phase alternatives of the (target, phase) pairs that own
+    the given rows of the big dataframe."""
+    pairs = set(zip(df["Target_num"].iloc[rows], df["Phase_num"].iloc[rows]))
+    affected = df[[pair in pairs for pair in zip(df["Target_num"], df["Phase_num"])]]
+    recomputed = KC_model.phase_alternatives(affected)
+    for t, i in pairs:
+        key = (int(t), int(i))
+        if key in recomputed:
+            alternatives[key] = recomputed[key]
+        else:
+            alternatives.pop(key, None)
+
+
+def _set_cell_value(f, sheet_name, cell, value):
+    """Rewrites the archive with a new numeric value in one cell of a sheet,
+    leaving every other part byte for byte unchanged (used by the demo below;
+    saving with openpyxl would drop the cached values of formula cells)."""
+    with zipfile.ZipFile(f) as archive:
+        part = _sheet_parts(archive)[sheet_name]
+        parts = [(info, archive.read(info.filename)) for info in archive.infolist()]
+
+    pattern = re.compile(r'(<c r="%s"[^>]*>)<v>[^<]*</v>' % cell)
+    with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as archive:
+        for info, content in parts:
+            if info.filename == part:
+                content = pattern.sub(r'\g<1><v>%s</v>' % value, content.decode(), count=1).encode()
+            archive.writestr(info, content)
+
+
+if __name__ == "__main__":
+    import os
+    import shutil
+    import tempfile
+    import time
+
+    f = "small_inputs_gmuV5.xlsx"  # enter the filename (path) for the data
+    copy = os.path.join(tempfile.mkdtemp(), os.path.basename(f))
+    shutil.copy(f, copy)
+
+    start_time = time.time()
+    cache = load_scenario(copy)
+    print('full load: %.2f s' % (time.time() - start_time))
+
+    # change one PLATPOSTIME value (first platform, Find phase)
+    _set_cell_value(copy, "inp_PlatPosTime", "B3", 25)
+
+    start_time = time.time()
+    update = update_scenario(cache)
+    print('incremental update: %.2f s, sheets %s, groups %s, rebuilt %s, %i rows patched in %s' %
+          (time.time() - start_time, update["sheets"], update["groups"], update["rebuilt"],
+           len(update["rows"]), update["columns"]))
+
+    start_time = time.time()
+    df = KC_data_melt.create_big_dataframe(copy)
+    print('full rebuild: %.2f s' % (time.time() - start_time))
+    key = ["(t,i,p)"]
+    check = pd.merge(df[key + ["PLATPOSTIME"]], cache["df"][key + ["PLATPOSTIME"]], on=key)
+    print('patched dataframe matches the rebuild: %s' %
+          (check["PLATPOSTIME_x"] == check["PLATPOSTIME_y"]).all())
+    shutil.rmtree(os.path.dirname(copy))
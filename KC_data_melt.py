@@ -48,6 +48,12 @@ def import_target_data(f):
     inp_TargetDetail = pd.read_excel(f, sheet_name="inp_TargetDetail", skiprows=1, usecols="A:H")
     inp_TargetKCReq = pd.read_excel(f, sheet_name="inp_TargetKCReq", skiprows=1, usecols="A:O")
     
+    return merge_target_data(inp_TargetType, inp_TargetDetail, inp_TargetKCReq)
+
+
+def merge_target_data(inp_TargetType, inp_TargetDetail, inp_TargetKCReq):
+    """This function melts and merges the target sheets read by
+    import_target_data. Arguments: the sheets as dataframes"""
     # melt TargetKCGeq
     inp_TargetKCReq = inp_TargetKCReq.melt(id_vars = "Target Type", value_vars=phase_dict.values(), 
                                            var_name = "Phase",value_name="Phase_Required")
@@ -74,6 +80,16 @@ def import_platform_data(f):
     inp_IFTUCAPACITY = pd.read_excel(f, sheet_name="inp_IFTUCAPACITY", skiprows=1, usecols="A:F")
     inp_MINIFTUDURATION = pd.read_excel(f, sheet_name="inp_MINIFTUDURATION", skiprows=1, usecols="A:F")
     
+    return merge_platform_data(inp_PlatformDetail, inp_PlatPosTime, inp_PlatType,
+                               inp_PlatCapacityAvailable, inp_WpnLoadout,
+                               inp_IFTUCAPACITY, inp_MINIFTUDURATION)
+
+
+def merge_platform_data(inp_PlatformDetail, inp_PlatPosTime, inp_PlatType,
+                        inp_PlatCapacityAvailable, inp_WpnLoadout,
+                        inp_IFTUCAPACITY, inp_MINIFTUDURATION):
+    """This function melts and merges the platform sheets read by
+    import_platform_data. Arguments: the sheets as dataframes"""
     # melt TargetKCGeq
     inp_PlatPosTime = inp_PlatPosTime.melt(id_vars = "Plat ID", value_vars=phase_dict.values(),
                                            var_name = "Phase",value_name="PLATPOSTIME")
@@ -105,6 +121,14 @@ def import_platform_target_data(f):
     inp_PlatTrackLife = pd.read_excel(f, sheet_name="inp_PlatTrackLife", skiprows=1, usecols="A:F")
     inp_PlatRange = pd.read_excel(f, sheet_name="inp_PlatRange", skiprows=1, usecols="A:P")
     
+    return merge_platform_target_data(inp_PlatDetCapes, inp_PlatCapacity, inp_PlatProcTime,
+                                      inp_PlatTrackLife, inp_PlatRange)
+
+
+def merge_platform_target_data(inp_PlatDetCapes, inp_PlatCapacity, inp_PlatProcTime,
+                               inp_PlatTrackLife, inp_PlatRange):
+    """This function melts and merges the platform-target sheets read by
+    import_platform_target_data. Arguments: the sheets as dataframes"""
     # "Melt" the data to make Phase a column along with a column for the value of interest
     inp_PlatCapacity = inp_PlatCapacity.melt(
         id_vars = ["Plat Type", "Target Type"], value_vars=phase_dict.values(), 
@@ -190,6 +214,16 @@ def create_big_dataframe(f):
     df_pt_tt = import_platform_target_data(f)
     df_t = import_target_data(f)
     
+    return join_big_dataframe(df_t, df_p, df_pt_tt)
+
+
+def join_big_dataframe(df_t, df_p, df_pt_tt):
+    """This function joins the target, platform and platform-target dataframes
+    into the big dataframe and adds the (t,i,p) indices. It is split from
+    create_big_dataframe so that the joins can be rerun on dataframes that are
+    already in memory.
+    Arguments: the dataframes returned by import_target_data,
+    import_platform_data and import_platform_target_data"""
     # create a dataframe with all platform types, target types and phases
     df_pt_tt_i = pd.merge(df_pt_tt, df_p, on=["Plat Type", "Phase"])
     
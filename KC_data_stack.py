@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 18:20:00 2026
+
+Memory-efficient construction of the big dataframe.
+
+KC_data_melt melts every wide phase sheet into a long dataframe and joins the
+long dataframes on string keys, including an outer merge followed by a replace
+over the whole frame. Here the ids and types are replaced by integer codes
+once, every wide phase sheet is stacked into a dense array indexed by codes
+(for example proc_time[pt, tt, phase]), the rows of the big dataframe are the
+nonzero entries of a boolean [t, i, p] mask, and every column is gathered
+with one NumPy take. No intermediate long dataframe is created.
+
+The result has the same rows, columns and values as
+KC_data_melt.create_big_dataframe, except that Target_num and Plat_num follow
+the order of the targets and platforms in the workbook instead of the
+(unordered) set order.
+"""
+
+import warnings
+import numpy as np
+import pandas as pd
+import KC_data_melt
+
+# sheet name: read_excel arguments, as in KC_data_melt
+sheet_specs = {
+    "inp_TargetType": {"usecols": "A:M"},
+    "inp_TargetDetail": {"usecols": "A:H"},
+    "inp_TargetKCReq": {"usecols": "A:O"},
+    "inp_PlatformDetail": {"usecols": "A:N"},
+    "inp_PlatPosTime": {"usecols": "A:O"},
+    "inp_PlatType": {"usecols": "A:B"},
+    "inp_PlatCapacityAvailable": {"usecols": "A:O"},
+    "inp_WpnLoadout": {"usecols": "A:F"},
+    "inp_IFTUCAPACITY": {"usecols": "A:F"},
+    "inp_MINIFTUDURATION": {"usecols": "A:F"},
+    "inp_PlatDetCapes": {"usecols": "A:C"},
+    "inp_PlatCapacity": {"usecols": "A:P"},
+    "inp_PlatProcTime": {"usecols": "A:P"},
+    "inp_PlatRange": {"usecols": "A:P"},
+    "inp_PlatTrackLife": {"usecols": "A:F"}}
+
+# platform type sheets joined on "Plat Type" only, in the order of KC_data_melt
+plat_type_sheets = ("inp_PlatType", "inp_WpnLoadout", "inp_IFTUCAPACITY", "inp_MINIFTUDURATION")
+
+
+def read_sheets(f):
+    """This function reads the sheets used by the big dataframe with a single
+    open of the workbook and returns them in a dictionary indexed by sheet
+    name. Argument: filename (path) of the excel file"""
+    warnings.simplefilter(action="ignore", category=UserWarning)
+    sheets = {}
+    with pd.ExcelFile(f) as workbook:
+        for name, kwargs in sheet_specs.items():
+            if name == "inp_PlatPosTime":
+                kwargs = dict(kwargs, nrows=len(sheets["inp_PlatformDetail"]))
+            sheets[name] = workbook.parse(name, skiprows=1, **kwargs)
+    sheets["inp_PlatformDetail"] = sheets["inp_PlatformDetail"].drop("Jamming State", axis="columns")
+    return sheets
+
+
+def create_big_dataframe(f):
+    """Drop-in replacement for KC_data_melt.create_big_dataframe.
+    Argument: f: data file name (path)"""
+    return stack_big_dataframe(read_sheets(f))
+
+
+def _codes(values, categories):
+    """Returns the position of every value in categories (-1 if missing)."""
+    return pd.Index(categories).get_indexer(values)
+
+
+def _take(column, rows):
+    """Gathers the values of a sheet column at the given rows; rows equal to
+    -1 give NaN (as a left merge would)."""
+    values = column.to_numpy()
+    if (rows >= 0).all():
+        return values[rows]
+    if values.dtype.kind in "iub":
+        values = values.astype(float)
+    taken = values[np.maximum(rows, 0)]
+    taken[rows < 0] = np.nan
+    return taken
+
+
+def _stack_phases(sheet, keys, categories, phases):
+    """Stacks the phase columns of a wide sheet into a float array indexed
+    [key codes..., phase], NaN where the sheet has no value. Returns the array,
+    a boolean array indexed [key codes...] that is True where the sheet has a
+    row, a boolean array indexed [phase] that is True where the sheet has the
+    phase column, and True if every phase column is an integer column."""
+    shape = tuple(len(c) for c in categories)
+    index = [_codes(sheet[k], c) for k, c in zip(keys, categories)]
+    keep = np.logical_and.reduce([i >= 0 for i in index])
+    index = tuple(i[keep] for i in index)
+
+    has_phase = np.array([phase in sheet.columns for phase in phases])
+    columns = [phase for phase in phases if phase in sheet.columns]
+    values = np.full(shape + (len(phases),), np.nan)
+    values[tuple(i[:, None] for i in index) + (np.flatnonzero(has_phase)[None, :],)] = \
+        sheet.loc[keep, columns].to_numpy(dtype=float)
+
+    present = np.zeros(shape, dtype=bool)
+    present[index] = True
+    integer = all(sheet[c].dtype.kind in "iu" for c in columns)
+    return values, present, has_phase, integer
+
+
+def _row_lookup(sheet, keys, categories):
+    """Returns an int array indexed [key codes...] holding the row of the sheet
+    with those keys, -1 if there is none."""
+    rows = np.full(tuple(len(c) for c in categories), -1)
+    index = [_codes(sheet[k], c) for k, c in zip(keys, categories)]
+    keep = np.logical_and.reduce([i >= 0 for i in index])
+    rows[tuple(i[keep] for i in index)] = np.flatnonzero(keep)
+    return rows
+
+
+def _as_merged(values, integer):
+    """Returns the gathered phase values with the dtype a merge would give:
+    integer if the sheet columns are integer and no value is missing."""
+    if integer and not np.isnan(values).any():
+        return values.astype(np.int64)
+    return values
+
+
+def stack_big_dataframe(sheets, phases=None):
+    """This function builds the big dataframe from the sheets returned by
+    read_sheets (or generated ones with the same columns).
+    Arguments:
+        sheets: dictionary of sheet dataframes indexed by sheet name
+        phases: phase names in phase number order (default KC_data_melt.phase_dict)"""
+    if phases is None:
+        phases = tuple(KC_data_melt.phase_dict.values())
+    phase_nums = np.array([num for num, name in KC_data_melt.phase_dict.items() if name in phases])
+    phase_names = np.array(phases, dtype=object)
+
+    targets = sheets["inp_TargetDetail"]
+    platforms = sheets["inp_PlatformDetail"]
+    target_types = pd.unique(targets["Target Type"])
+    plat_types = pd.unique(platforms["Plat Type"])
+    t_tt = _codes(targets["Target Type"], target_types)
+    p_pt = _codes(platforms["Plat Type"], plat_types)
+
+    # targets: left merge with the target types, inner on the melted KC requirements
+    tt_rows = _row_lookup(sheets["inp_TargetType"], ["Target Type"], [target_types])
+    required, kc_present, _, kc_integer = _stack_phases(
+        sheets["inp_TargetKCReq"], ["Target Type"], [target_types], phases)
+    target_ok = kc_present[t_tt]
+
+    # platforms: inner merges on Plat ID and on Plat Type
+    pos_time, pos_present, _, pos_integer = _stack_phases(
+        sheets["inp_PlatPosTime"], ["Plat ID"], [platforms["Plat ID"]], phases)
+    capacity_available, ca_present, _, ca_integer = _stack_phases(
+        sheets["inp_PlatCapacityAvailable"], ["Plat Type"], [plat_types], phases)
+    pt_rows = {name: _row_lookup(sheets[name], ["Plat Type"], [plat_types]) for name in plat_type_sheets}
+    plat_ok = pos_present & ca_present[p_pt]
+    for rows in pt_rows.values():
+        plat_ok &= rows[p_pt] >= 0
+
+    # platform-target: inner merge of capacity, proc time and range, outer with
+    # the track life, NaN replaced by -1, inner with the detection capabilities
+    pt_tt_keys, pt_tt_categories = ["Plat Type", "Target Type"], [plat_types, target_types]
+    stacked = {}
+    inner = np.ones((len(plat_types), len(target_types)), dtype=bool)
+    for name, value in (("inp_PlatCapacity", "PLATCAPACITY"), ("inp_PlatProcTime", "PLATPROCTIME"),
+                        ("inp_PlatRange", "PLATRANGE")):
+        stacked[value] = _stack_phases(sheets[name], pt_tt_keys, pt_tt_categories, phases)
+        inner &= stacked[value][1]
+    stacked["PLATTRACKLIFE"] = _stack_phases(sheets["inp_PlatTrackLife"], pt_tt_keys, pt_tt_categories, phases)
+    _, track_present, track_phases, _ = stacked["PLATTRACKLIFE"]
+    track_rows = track_present[:, :, None] & track_phases[None, None, :]
+    dc_rows = _row_lookup(sheets["inp_PlatDetCapes"], pt_tt_keys, pt_tt_categories)
+    pt_tt_present = (inner[:, :, None] | track_rows) & (dc_rows >= 0)[:, :, None]
+
+    # rows of the big dataframe, in (t, i, p) order
+    mask = pt_tt_present.transpose(1, 2, 0)[t_tt][:, :, p_pt]
+    mask &= target_ok[:, None, None] & plat_ok[None, None, :]
+    t, i, p = np.nonzero(mask)
+    del mask
+    tt, pt = t_tt[t], p_pt[p]
+
+    # every column is gathered only when it is inserted into the dataframe, so
+    # at most one temporary column exists next to it
+    outer_rows = inner[:, :, None] | track_rows
+
+    def pt_tt_column(value):
+        array, _, _, integer = stacked[value]
+        rows = track_rows if value == "PLATTRACKLIFE" else np.broadcast_to(inner[:, :, None], track_rows.shape)
+        gathered = np.where(rows[pt, tt, i], array[pt, tt, i], np.nan)
+        gathered[np.isnan(gathered)] = -1
+        # the outer merge leaves NaN (a float column) wherever the sheet has no row
+        return _as_merged(gathered, integer and not (outer_rows & ~rows).any())
+
+    target_type = sheets["inp_TargetType"]
+    left = [(c, lambda c=c: _take(targets[c], t)) for c in targets.columns]
+    left += [(c, lambda c=c: _take(target_type[c], tt_rows[tt])) for c in target_type.columns.drop("Target Type")]
+    left += [("Phase", lambda: phase_names[i]),
+             ("Phase_Required", lambda: _as_merged(required[tt, i], kc_integer))]
+
+    detection = sheets["inp_PlatDetCapes"]
+    right = [("Plat Type", lambda: plat_types[pt])]
+    right += [(value, lambda value=value: pt_tt_column(value)) for value in stacked]
+    right += [(c, lambda c=c: _take(detection[c], dc_rows[pt, tt])) for c in detection.columns.drop(pt_tt_keys)]
+    right += [(c, lambda c=c: _take(platforms[c], p)) for c in platforms.columns.drop("Plat Type")]
+    right += [("PLATPOSTIME", lambda: _as_merged(pos_time[p, i], pos_integer)),
+              ("PLATCAPACITYAVAILABLE", lambda: _as_merged(capacity_available[pt, i], ca_integer))]
+    for name in plat_type_sheets:
+        right += [(c, lambda c=c, name=name: _take(sheets[name][c], pt_rows[name][pt]))
+                  for c in sheets[name].columns.drop("Plat Type")]
+
+    # number the targets and platforms that have rows, in workbook order
+    target_num = np.unique(t, return_inverse=True)[1] + 1
+    plat_num = np.unique(p, return_inverse=True)[1] + 1
+
+    df = pd.DataFrame({"(t,i,p)_num": list(zip(target_num.tolist(), phase_nums[i].tolist(), plat_num.tolist())),
+                       "(t,i,p)": list(zip(_take(targets["Target ID"], t), phase_names[i],
+                                           _take(platforms["Plat ID"], p)))})
+    left_names = {column for column, _ in left}
+    right_names = {column for column, _ in right}
+    for column, gather in left:
+        df[column + "_x" if column in right_names else column] = gather()
+        if column == "Target ID":
+            df["Target_num"] = target_num
+        elif column == "Phase":
+            df["Phase_num"] = phase_nums[i]
+    for column, gather in right:
+        df[column + "_y" if column in left_names else column] = gather()
+        if column == "Plat ID":
+            df["Plat_num"] = plat_num
+
+    return df
+
+
+def melt_big_dataframe(sheets):
+    """The reference pipeline: KC_data_melt's melts and merges run on sheets
+    already in memory (used by the benchmark)."""
+    df_t = KC_data_melt.merge_target_data(
+        sheets["inp_TargetType"], sheets["inp_TargetDetail"], sheets["inp_TargetKCReq"])
+    df_p = KC_data_melt.merge_platform_data(
+        sheets["inp_PlatformDetail"], sheets["inp_PlatPosTime"], sheets["inp_PlatType"],
+        sheets["inp_PlatCapacityAvailable"], sheets["inp_WpnLoadout"],
+        sheets["inp_IFTUCAPACITY"], sheets["inp_MINIFTUDURATION"])
+    df_pt_tt = KC_data_melt.merge_platform_target_data(
+        sheets["inp_PlatDetCapes"], sheets["inp_PlatCapacity"], sheets["inp_PlatProcTime"],
+        sheets["inp_PlatTrackLife"], sheets["inp_PlatRange"])
+    return KC_data_melt.join_big_dataframe(df_t, df_p, df_pt_tt)
+
+
+def generate_sheets(sheets, target_copies, platform_copies, seed=0):
+    """This function generates a larger scenario from the sheets of a workbook
+    by copying every target target_copies times and every platform
+    platform_copies times under new ids, with jittered positions. The type
+    sheets are unchanged. Returns a new dictionary of sheets."""
+    rng = np.random.default_rng(seed)
+    generated = dict(sheets)
+
+    def copies(sheet, id_column, number):
+        if number == 1:
+            return sheet
+        copied = pd.concat([sheet] * number, ignore_index=True)
+        suffix = np.repeat(np.arange(number), len(sheet)).astype(str)
+        copied[id_column] = copied[id_column].astype(str) + "_" + suffix
+        return copied
+
+    targets = copies(sheets["inp_TargetDetail"], "Target ID", target_copies)
+    platforms = copies(sheets["inp_PlatformDetail"], "Plat ID", platform_copies)
+    for sheet, suffix in ((targets, "_target"), (platforms, "_plat")):
+        for column in ("Latitude" + suffix, "Longitude" + suffix):
+            sheet[column] = sheet[column] + rng.normal(0, 0.5, len(sheet))
+    generated["inp_TargetDetail"] = targets
+    generated["inp_PlatformDetail"] = platforms
+    generated["inp_PlatPosTime"] = copies(sheets["inp_PlatPosTime"], "Plat ID", platform_copies)
+    return generated
+
+
+def _run_pipeline(pipeline, sheets, target_copies, platform_copies):
+    """Generates a scenario and builds its big dataframe; returns the number of
+    rows, the wall time and the peak resident set size of the process in MB
+    before and after the build. Runs in a fresh process so that the peak
+    belongs to this build only."""
+    import resource
+    import time
+
+    generated = generate_sheets(sheets, target_copies, platform_copies)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    start_time = time.time()
+    df = (stack_big_dataframe if pipeline == "stack" else melt_big_dataframe)(generated)
+    wall_time = time.time() - start_time
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return len(df), wall_time, before, after
+
+
+def benchmark(sheets, scales=((1, 1), (10, 5), (20, 10), (40, 10))):
+    """This function builds the big dataframe of generated scenarios with both
+    pipelines, each build in its own process, and returns a list of result
+    dictionaries (pipeline, target and platform copies, rows, wall time, peak
+    RSS and the increase of the peak RSS during the build, in MB)."""
+    import concurrent.futures
+    import multiprocessing
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for target_copies, platform_copies in scales:
+        for pipeline in ("melt", "stack"):
+            with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as executor:
+                rows, wall_time, before, after = executor.submit(
+                    _run_pipeline, pipeline, sheets, target_copies, platform_copies).result()
+            results.append({"pipeline": pipeline, "target_copies": target_copies,
+                            "platform_copies": platform_copies, "rows": rows,
+                            "wall_time": wall_time, "peak_rss": after,
+                            "build_rss": after - before})
+    return results
+
+
+if __name__ == "__main__":
+    f = "small_inputs_gmuV5.xlsx"  # enter the filename (path) for the data
+    sheets = read_sheets(f)
+
+    print('%-6s %8s %8s %10s %10s %14s %14s' %
+          ("", "targets", "plats", "rows", "time (s)", "peak RSS (MB)", "build RSS (MB)"))
+    for r in benchmark(sheets):
+        print('%-6s %8i %8i %10i %10.2f %14.0f %14.0f' %
+              (r["pipeline"], 30 * r["target_copies"], 8 * r["platform_copies"], r["rows"],
+               r["wall_time"], r["peak_rss"], r["build_rss"]))
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 20 05:40:00 2026
+
+Diagnosis of infeasible flexible targetshop scenarios.
+
+When a scenario is infeasible, CP-SAT only answers INFEASIBLE. Here the
+scenario is built again (lean encoding, from the operation table of KC_model)
+with its constraints split into groups, each enforced by an assumption
+literal:
+    ("precedence", target_num): the phase order of the target, with the
+        handoff gaps and forbidden handoffs between its phases (KC_link_graph)
+    ("platform", plat_num): the NoOverlap of the platform and the weapons it
+        may expend (its loadouts, KC_weapons, times its Max loadouts expended
+        per platform, KC_parameters)
+    ("weapon", weapon_type): the inventory of the weapon type (KC_weapons)
+    ("window", target_num): the time windows of the target: the Max Time
+        Horizon and the Engage -> IFTU -> Assess windows (KC_kinematics)
+    ("track_life", target_num): the track life gaps of the target: after a
+        Fix or Track phase, the next phase starts within the PLATTRACKLIFE of
+        the platform that held the track
+The selection of one platform per phase (and of one weapon per engagement) and
+the durations are not part of any group: they always hold. With every assumption, the solver returns a
+sufficient set of them for the infeasibility
+(SufficientAssumptionsForInfeasibility), which is shrunk by deletion: a group
+is removed when the others remain infeasible without it. The groups left are
+reported with the Target ID and Plat ID of the workbook, so the rows to look
+at are known without bisecting the workbook by hand.
+"""
+
+import time
+from ortools.sat import cp_model_pb2
+from ortools.sat.python import cp_model
+import numpy as np
+import KC_model
+import KC_weapons
+
+group_names = {"precedence": "precedence chain of target %s",
+               "platform": "NoOverlap/capacity of platform %s",
+               "window": "time windows of target %s",
+               "track_life": "track life gaps of target %s",
+               "weapon": "inventory of weapon type %s"}
+track_phases = ("Fix", "Track1", "Track2", "Track3")
+
+
+def _alt_values(df, column):
+    """Returns a column of the big dataframe in the order of the alternatives
+    of KC_model.operation_table."""
+    feasible = df["PLATPROCTIME"].to_numpy() >= 0
+    t, i, p = (df[c].to_numpy()[feasible] for c in ("Target_num", "Phase_num", "Plat_num"))
+    return df[column].to_numpy()[feasible][np.lexsort((p, i, t))]
+
+
+def diagnosis_model(df, windows=None, gaps=None, limits=None, track_life=False, weapons=None):
+    """This function builds the diagnosis model of a scenario (see the module
+    docstring) and returns the model and the dictionary of its assumption
+    literals indexed by (group, target_num, plat_num or weapon_type).
+    Arguments:
+        df: the big dataframe the model is built from (after the pruning of
+            KC_geo or KC_kinematics.apply_windows, if used)
+        windows: the IFTU windows of KC_kinematics.iftu_windows, or None
+        gaps: the handoff gaps [phase_num, p, p'] of KC_link_graph, or None
+        limits: the limits of KC_parameters.model_limits (horizon, and the
+            loadouts expended per platform with the weapons), or None
+        track_life: if True, the track life gaps are added (they are not in
+            the model of KC_model, so they are only checked on demand)
+        weapons: the weapon arrays of KC_weapons.weapon_arrays, or None"""
+    table = KC_model.operation_table(df)
+    horizon = KC_model.compute_horizon(df)
+    model = cp_model.CpModel()
+    assumptions = {}
+
+    def assumption(group, num):
+        if (group, num) not in assumptions:
+            assumptions[(group, num)] = model.NewBoolVar('assume_%s_%s' % (group, num))
+        return assumptions[(group, num)]
+
+    # phases: one platform each, the duration of the platform selected
+    target, phase = table["target"].tolist(), table["phase"].tolist()
+    platform, duration = table["platform"].tolist(), table["duration"].tolist()
+    starts, ends, presences = [], [], [None] * len(platform)
+    op_index = {}
+    for op, (t, i, first, count) in enumerate(zip(target, phase, table["first"].tolist(),
+                                                  table["count"].tolist())):
+        suffix = '_tgt%i_phase%i' % (t, i)
+        start = model.NewIntVar(0, horizon, 'start' + suffix)
+        alts = range(first, first + count)
+        for a in alts:
+            presences[a] = model.NewBoolVar('presence%s_plat%i' % (suffix, platform[a]))
+        model.AddExactlyOne(presences[a] for a in alts)
+        starts.append(start)
+        ends.append(start + sum(duration[a] * presences[a] for a in alts))
+        op_index[(t, i)] = op
+
+    # platform groups: NoOverlap of the intervals present on an assumed platform
+    per_platform = {}
+    for a, (op, p) in enumerate(zip(table["op"].tolist(), platform)):
+        present = model.NewBoolVar('on_plat%i_alt%i' % (p, a))
+        model.AddImplication(present, presences[a])
+        model.AddImplication(present, assumption("platform", p))
+        model.AddBoolOr([presences[a].Not(), assumption("platform", p).Not(), present])
+        per_platform.setdefault(p, []).append(
+            model.NewOptionalFixedSizeIntervalVar(starts[op], duration[a], present,
+                                                  'interval_alt%i' % a))
+    for p, intervals in per_platform.items():
+        if len(intervals) > 1:
+            model.AddNoOverlap(intervals)
+
+    engage_id = int(df.loc[df["Phase"] == "Engage", "Phase_num"].iloc[0])
+    engage = np.flatnonzero(table["phase"][table["op"]] == engage_id)
+    if weapons is not None:
+        _add_weapons(model, df, weapons, engage, table, presences, assumption,
+                     None if limits is None else limits["max_loadouts"])
+
+    # precedence groups: phase order and handoff gaps of every target
+    life = _alt_values(df, "PLATTRACKLIFE") if track_life else None
+    track = set(int(i) for i in df.loc[df["Phase"].isin(track_phases), "Phase_num"].unique())
+    for op in range(1, len(target)):
+        t = target[op]
+        if target[op - 1] != t:
+            continue
+        prec = assumption("precedence", t)
+        model.Add(starts[op] >= ends[op - 1]).OnlyEnforceIf(prec)
+        senders = range(table["first"][op - 1], table["first"][op - 1] + table["count"][op - 1])
+        receivers = range(table["first"][op], table["first"][op] + table["count"][op])
+        for a in senders:
+            if gaps is not None:
+                latency = [gaps[phase[op - 1], platform[a], platform[b]] for b in receivers]
+                setup = []
+                for b, gap in zip(receivers, latency):
+                    if np.isinf(gap):
+                        model.AddBoolOr([presences[a].Not(), presences[b].Not()]).OnlyEnforceIf(prec)
+                    elif gap > 0:
+                        setup.append(int(np.ceil(gap)) * presences[b])
+                if setup:
+                    model.Add(starts[op] >= ends[op - 1] + sum(setup)).OnlyEnforceIf([presences[a], prec])
+            if life is not None and phase[op - 1] in track and life[a] >= 0:
+                model.Add(starts[op] <= ends[op - 1] + int(life[a])).OnlyEnforceIf(
+                    [presences[a], assumption("track_life", t)])
+
+    # window groups: horizon and IFTU windows of every target
+    if limits is not None and limits["max_horizon_min"] < horizon:
+        for t in sorted(set(target)):
+            last = max(op for (u, _), op in op_index.items() if u == t)
+            model.Add(ends[last] <= limits["max_horizon_min"]).OnlyEnforceIf(assumption("window", t))
+    if windows is not None:
+        for a in np.flatnonzero(table["phase"][table["op"]] == windows["engage"]).tolist():
+            t, p = target[table["op"][a]], platform[a]
+            if (t, windows["iftu"]) not in op_index or (t, windows["assess"]) not in op_index:
+                continue
+            window = assumption("window", t)
+            if np.isinf(windows["assess_lag"][t, p]):
+                model.Add(presences[a] == 0).OnlyEnforceIf(window)
+                continue
+            engage_end = ends[table["op"][a]]
+            iftu, assess = op_index[(t, windows["iftu"])], op_index[(t, windows["assess"])]
+            enforce = [presences[a], window]
+            model.Add(starts[iftu] <= engage_end + int(windows["iftu_latest"][t, p])).OnlyEnforceIf(enforce)
+            model.Add(ends[iftu] >= engage_end + int(windows["iftu_lag"][t, p])).OnlyEnforceIf(enforce)
+            model.Add(starts[assess] >= engage_end + int(windows["assess_lag"][t, p])).OnlyEnforceIf(enforce)
+
+    return model, assumptions
+
+
+def _add_weapons(model, df, weapons, engage, table, presences, assumption, max_loadouts):
+    """Adds the weapon allocation of KC_weapons.add_weapon_allocation for the
+    Engage alternatives: the loadouts (times the Max loadouts expended per
+    platform, if given) in the platform groups and the inventories in the
+    weapon groups. As in add_weapon_allocation, an unarmed Engage alternative
+    is never selected, and ValueError is raised for an Engage phase left with
+    no platform."""
+    candidates = KC_weapons.weapon_candidates(weapons)
+    weapon_types = weapons["weapon_types"]
+    tt_index = {tt: k for k, tt in enumerate(weapons["target_types"])}
+    pt_index = {pt: k for k, pt in enumerate(weapons["plat_types"])}
+    target_type = dict(zip(df["Target_num"], df["Target Type"]))
+    plat_type = dict(zip(df["Plat_num"], df["Plat Type"]))
+
+    per_platform, per_weapon = {}, {}
+    armed, unarmed = set(), set()
+    for a in engage.tolist():
+        t, p = int(table["target"][table["op"][a]]), int(table["platform"][a])
+        pt, tt = pt_index[plat_type[p]], tt_index[target_type[t]]
+        if not candidates[pt, :, tt].any():
+            model.Add(presences[a] == 0)  # an unarmed platform cannot engage
+            unarmed.add(t)
+            continue
+        armed.add(t)
+        choices = []
+        for w in np.flatnonzero(candidates[pt, :, tt]).tolist():
+            choice = model.NewBoolVar('weapon_tgt%i_plat%i_%s' % (t, p, weapon_types[w]))
+            shots = int(weapons["shots"][w, tt])
+            per_platform.setdefault((p, w), []).append(shots * choice)
+            per_weapon.setdefault(w, []).append(shots * choice)
+            choices.append(choice)
+        model.Add(sum(choices) == presences[a])
+    if unarmed - armed:
+        engage_id = int(table["phase"][table["op"][engage[0]]])
+        raise ValueError("no platform with a usable weapon for (target, phase) %s" %
+                         [(t, engage_id) for t in sorted(unarmed - armed)])
+
+    for (p, w), expended in per_platform.items():
+        limit = KC_weapons.expended_limit(weapons["loadout"][pt_index[plat_type[p]], w],
+                                          None if max_loadouts is None else max_loadouts[p])
+        if limit is not None:
+            model.Add(sum(expended) <= limit).OnlyEnforceIf(assumption("platform", p))
+    for w, expended in per_weapon.items():
+        model.Add(sum(expended) <= int(weapons["inventory"][w])
+                  ).OnlyEnforceIf(assumption("weapon", weapon_types[w]))
+
+
+def _check(model, groups, assumptions, max_time_in_seconds):
+    """Solves the model under the assumptions of some groups and returns the
+    status and the groups of the sufficient assumptions (if INFEASIBLE)."""
+    model.ClearAssumptions()
+    model.AddAssumptions([assumptions[g] for g in groups])
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = max_time_in_seconds
+    status = solver.Solve(model)
+    if status != cp_model.INFEASIBLE:
+        return status, None
+    by_index = {assumptions[g].Index(): g for g in groups}
+    return status, [by_index[k] for k in solver.SufficientAssumptionsForInfeasibility()
+                    if k in by_index]
+
+
+def find_conflict(model, assumptions, max_time_in_seconds=60.0, check_time_in_seconds=10.0):
+    """This function looks for a small conflicting set of constraint groups of
+    a diagnosis model and returns a dictionary with:
+        status: status of the solve with every group (INFEASIBLE when there
+            is a conflict)
+        conflict: the conflicting groups, as (group, num) keys of assumptions
+        minimal: True when every group left was checked to be needed (the
+            conflict is irreducible), False when a check reached its time limit
+        checks: number of solves of the deletion shrink
+        time: wall time in seconds
+    Arguments:
+        max_time_in_seconds: time limit of the solve with every group
+        check_time_in_seconds: time limit of every deletion check"""
+    start_time = time.time()
+    groups = sorted(assumptions)
+    status, core = _check(model, groups, assumptions, max_time_in_seconds)
+    result = {"status": cp_model_pb2.CpSolverStatus.Name(status), "conflict": [],
+              "minimal": False, "checks": 0}
+    if status != cp_model.INFEASIBLE:
+        result["time"] = time.time() - start_time
+        return result
+
+    # deletion-based shrink: a candidate is dropped when the needed groups and
+    # the other candidates are still infeasible without it, and the candidates
+    # are then cut down to the sufficient assumptions of that solve
+    needed, candidates = [], core or groups
+    minimal = True
+    while candidates:
+        group, others = candidates[0], candidates[1:]
+        status, core = _check(model, needed + others, assumptions, check_time_in_seconds)
+        result["checks"] += 1
+        if status == cp_model.INFEASIBLE:
+            candidates = [g for g in others if g in core] if core else others
+            continue
+        if status == cp_model.UNKNOWN:
+            minimal = False  # not proven to be needed, kept
+        needed.append(group)
+        candidates = others
+
+    result.update({"conflict": needed, "minimal": minimal, "time": time.time() - start_time})
+    return result
+
+
+def conflict_report(conflict, df):
+    """This function returns the conflicting groups of find_conflict as lines
+    of text that name the targets and platforms by their workbook IDs."""
+    target_ids = dict(zip(df["Target_num"], df["Target ID"]))
+    plat_ids = dict(zip(df["Plat_num"], df["Plat ID"]))
+    lines = []
+    for group, num in conflict:
+        ids = plat_ids if group == "platform" else target_ids
+        lines.append(group_names[group] % ids.get(num, num))
+    return lines
+
+
+def diagnose(df, windows=None, gaps=None, limits=None, track_life=False, weapons=None,
+             max_time_in_seconds=60.0, check_time_in_seconds=10.0):
+    """This function builds the diagnosis model of a scenario (see
+    diagnosis_model for the arguments), looks for a conflict (find_conflict)
+    and returns its result with the report lines of conflict_report."""
+    model, assumptions = diagnosis_model(df, windows, gaps, limits, track_life, weapons)
+    result = find_conflict(model, assumptions, max_time_in_seconds, check_time_in_seconds)
+    result["groups"] = len(assumptions)
+    result["report"] = conflict_report(result["conflict"], df)
+    return result
+
+
+if __name__ == "__main__":
+    import KC_data_melt
+    import KC_data_stack
+    import KC_parameters
+
+    f = "small_inputs_gmuV5.xlsx"  # enter the filename (path) for the data
+    df = KC_data_stack.create_big_dataframe(f)
+    control = KC_parameters.read_control(f)
+
+    # a Max Time Horizon shorter than the phase chains of some targets
+    limits = KC_parameters.model_limits(dict(control, max_horizon_min=85), df)
+    scenarios = {"Max Time Horizon 85 min": (df, limits, None)}
+
+    # one bad row: every platform takes longer than the Max Time Horizon for
+    # the Find phase of one target
+    bad = df.copy()
+    rows = (bad["Target ID"] == bad["Target ID"].iloc[0]) & (bad["Phase"] == "Find")
+    bad.loc[rows & (bad["PLATPROCTIME"] >= 0), "PLATPROCTIME"] = 8000
+    scenarios["Find of %s takes 8000 min" % bad["Target ID"].iloc[0]] = \
+        (bad, KC_parameters.model_limits(control, bad), None)
+
+    # a theater inventory of 10 weapons of every type: too few to engage
+    # every target with the weapons usable against it
+    weapons = KC_weapons.weapon_arrays(df, KC_data_melt.import_weapon_data(f))
+    weapons["inventory"] = np.minimum(weapons["inventory"], 10)
+    scenarios["inventory of 10 per weapon type"] = (df, KC_parameters.model_limits(control, df),
+                                                    weapons)
+
+    for name, (scenario_df, limits, weapons) in scenarios.items():
+        result = diagnose(scenario_df, limits=limits, track_life=True, weapons=weapons)
+        print('%s: %s, %i of %i groups in conflict (minimal: %s, %i checks, %.2f s)' %
+              (name, result["status"], len(result["conflict"]), result["groups"],
+               result["minimal"], result["checks"], result["time"]))
+        for line in result["report"]:
+            print('  ' + line)
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 20 00:50:00 2026
+
+Platform and target geometry: distance matrices from the Latitude, Longitude
+and Altitude (km) columns, and the range feasibility of the (t,i,p) index.
+
+Two distances are available, both computed for all pairs in one broadcast:
+    "ground": the great circle distance on the mean Earth radius (from the
+        chord between the points on the unit sphere), ignoring the altitudes.
+    "slant": the straight-line distance between the points in Earth-centered
+        Earth-fixed coordinates (WGS84 ellipsoid), which accounts for the
+        altitudes (a satellite at 1000 km is never within 1000 km of the
+        ground).
+A (target, phase, platform) is in range when the distance from the platform to
+the target is at most its PLATRANGE ("Range in km for each Killchain phase (i)
+for a platform type vs target type"). The distances between the platforms
+(platform_distance) cut the communication links that are out of range in
+KC_link_graph.handoff_gaps, as used by the driver, the service and KC_jamming.
+
+A platform whose type is LOS limited ("LOS Lim" of inp_PlatType) must also see
+the target over the horizon. On a sphere two points at altitudes h1 and h2 see
+each other when the angle between them at the Earth's center is at most
+arccos(R / (R + h1)) + arccos(R / (R + h2)). Refraction can be modeled with an
+effective Earth radius k R (k = 4/3 for radio). Types that are not LOS limited
+(satellites standing for a constellation, C2 nodes) are always feasible.
+
+The alternatives out of range or out of sight can be removed from the big
+dataframe before the model is built, so they never become CP variables.
+"""
+
+import time
+import numpy as np
+
+earth_radius_km = 6371.0088  # mean Earth radius
+wgs84_a_km = 6378.137  # WGS84 semi-major axis
+wgs84_e2 = 6.69437999014e-3  # WGS84 first eccentricity squared
+distance_methods = ("ground", "slant")
+
+
+def ecef(lat, lon, alt):
+    """This function returns the Earth-centered Earth-fixed coordinates (x, y, z)
+    in km of points given by latitude and longitude in degrees and altitude in
+    km above the WGS84 ellipsoid."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    n = wgs84_a_km / np.sqrt(1 - wgs84_e2 * np.sin(lat) ** 2)
+    return ((n + alt) * np.cos(lat) * np.cos(lon),
+            (n + alt) * np.cos(lat) * np.sin(lon),
+            (n * (1 - wgs84_e2) + alt) * np.sin(lat))
+
+
+def distance_matrix(a, b, method="slant"):
+    """This function returns the [a, b] matrix of distances in km between two
+    sets of points, each given as a tuple of arrays (latitude, longitude,
+    altitude). See the module docstring for the methods."""
+    if method not in distance_methods:
+        raise ValueError("method must be one of %s, not %r" % (distance_methods, method))
+    if method == "ground":
+        # great circle angle from the chord between the points on the unit sphere
+        squared = _squared_distance(_unit_vectors(a), _unit_vectors(b))
+        return 2 * earth_radius_km * np.arcsin(np.minimum(np.sqrt(squared) / 2, 1))
+    return np.sqrt(_squared_distance(ecef(*(np.asarray(c, dtype=float) for c in a)),
+                                     ecef(*(np.asarray(c, dtype=float) for c in b))))
+
+
+def _unit_vectors(points):
+    """Returns the (x, y, z) unit vectors of points (latitude, longitude, ...)."""
+    lat, lon = np.radians(points[0]), np.radians(points[1])
+    return np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)
+
+
+def _squared_distance(u, v):
+    """Returns the [a, b] matrix of squared distances between two sets of
+    (x, y, z) coordinates, one coordinate at a time."""
+    squared = None
+    for x, y in zip(u, v):
+        d = x[:, None] - y[None, :]
+        squared = d * d if squared is None else squared + d * d
+    return squared
+
+
+def _positions(df, side):
+    """Returns (num, latitude, longitude, altitude) arrays of the targets or the
+    platforms of the big dataframe, sorted on Target_num or Plat_num."""
+    num = "Target_num" if side == "target" else "Plat_num"
+    columns = [num, "Latitude_" + side, "Longitude_" + side, "Altitude_%s (km)" % side]
+    positions = df[columns].drop_duplicates(num).sort_values(num)
+    return tuple(positions[c].to_numpy() for c in columns)
+
+
+def platform_target_distance(df, method="slant"):
+    """This function returns the distance in km from every platform to every
+    target as an array distance[target_num, plat_num] (1-based, so row and
+    column 0 are NaN). Argument: df: the big dataframe"""
+    t, *target = _positions(df, "target")
+    p, *platform = _positions(df, "plat")
+    distance = np.full((t.max() + 1, p.max() + 1), np.nan)
+    distance[np.ix_(t, p)] = distance_matrix(target, platform, method)
+    return distance
+
+
+def platform_distance(df, method="slant"):
+    """This function returns the [p, p'] matrix of distances in km between the
+    platforms, in plat_num order (the distance argument of KC_link_graph)."""
+    _, *platform = _positions(df, "plat")
+    return distance_matrix(platform, platform, method)
+
+
+def in_range_mask(df, distance=None, method="slant"):
+    """This function returns the boolean array in_range[target_num, phase_num,
+    plat_num] (1-based): True where the row of the big dataframe exists and the
+    platform is within PLATRANGE of the target.
+    Arguments:
+        df: the big dataframe
+        distance: array from platform_target_distance (computed if None)"""
+    if distance is None:
+        distance = platform_target_distance(df, method)
+    t = df["Target_num"].to_numpy()
+    i = df["Phase_num"].to_numpy()
+    p = df["Plat_num"].to_numpy()
+    in_range = np.zeros((t.max() + 1, i.max() + 1, p.max() + 1), dtype=bool)
+    in_range[t, i, p] = df["PLATRANGE"].to_numpy() >= distance[t, p]
+    return in_range
+
+
+def line_of_sight(a, b, refraction=1.0):
+    """This function returns the [a, b] boolean matrix of the pairs of points
+    that see each other over the horizon. Points are tuples of arrays
+    (latitude, longitude, altitude in km); refraction is the factor k of the
+    effective Earth radius. The ground distance between the points is compared
+    with the sum of their horizon distances on the effective Earth
+    (horizon_distance)."""
+    ground = distance_matrix(a, b, "ground")
+    horizon_a = horizon_distance(np.maximum(np.asarray(a[2], dtype=float), 0), refraction)
+    horizon_b = horizon_distance(np.maximum(np.asarray(b[2], dtype=float), 0), refraction)
+    return ground <= horizon_a[:, None] + horizon_b[None, :]
+
+
+def horizon_distance(altitude, refraction=1.0):
+    """Returns the distance in km along the ground from a point at the given
+    altitude (km) to its horizon, on the effective Earth of radius
+    refraction * earth_radius_km."""
+    radius = refraction * earth_radius_km
+    return radius * np.arccos(radius / (radius + np.asarray(altitude, dtype=float)))
+
+
+def los_mask(df, refraction=1.0, phases=None):
+    """This function returns the boolean array los[target_num, phase_num,
+    plat_num] (1-based): True where the row of the big dataframe exists and
+    the platform sees the target, or its type is not LOS limited.
+    Arguments:
+        df: the big dataframe
+        refraction: factor k of the effective Earth radius
+        phases: names of the phases that need line of sight (default all)"""
+    t, *target = _positions(df, "target")
+    p, *platform = _positions(df, "plat")
+    visible = np.zeros((t.max() + 1, p.max() + 1), dtype=bool)
+    visible[np.ix_(t, p)] = line_of_sight(target, platform, refraction)
+
+    rows_t = df["Target_num"].to_numpy()
+    rows_i = df["Phase_num"].to_numpy()
+    rows_p = df["Plat_num"].to_numpy()
+    exempt = df["LOS Lim"].to_numpy() != 1
+    if phases is not None:
+        exempt |= ~df["Phase"].isin(phases).to_numpy()
+    los = np.zeros((rows_t.max() + 1, rows_i.max() + 1, rows_p.max() + 1), dtype=bool)
+    los[rows_t, rows_i, rows_p] = exempt | visible[rows_t, rows_p]
+    return los
+
+
+def feasibility_mask(df, method="slant", refraction=1.0, phases=None):
+    """This function returns in_range_mask & los_mask, the [target_num,
+    phase_num, plat_num] mask of the geometrically feasible alternatives."""
+    return in_range_mask(df, method=method) & los_mask(df, refraction, phases)
+
+
+def type_in_range(distance, range_by_type, target_type, plat_type):
+    """This function returns in_range[t, i, p] from type-level data, without
+    building the (t,i,p) rows: distance is the [t, p] matrix, range_by_type
+    the [target type, phase, platform type] PLATRANGE array and target_type and
+    plat_type the type codes of the targets and platforms. The ranges are
+    gathered once per platform ([target type, phase, p]) and the targets of
+    every target type are compared in one broadcast."""
+    range_by_platform = range_by_type[:, :, plat_type]
+    in_range = np.empty((len(target_type), range_by_type.shape[1], len(plat_type)), dtype=bool)
+    for k in np.unique(target_type):
+        rows = np.flatnonzero(target_type == k)
+        in_range[rows] = range_by_platform[k][None, :, :] >= distance[rows][:, None, :]
+    return in_range
+
+
+def prune_alternatives(df, in_range):
+    """This function returns a copy of the big dataframe in which the
+    alternatives outside the mask (in_range_mask, los_mask or
+    feasibility_mask) get PLATPROCTIME -1, so the model builders
+    (KC_model.phase_alternatives) skip them."""
+    pruned = df.copy()
+    keep = in_range[df["Target_num"].to_numpy(), df["Phase_num"].to_numpy(), df["Plat_num"].to_numpy()]
+    pruned.loc[~keep, "PLATPROCTIME"] = -1
+    return pruned
+
+
+def alternative_mask(df):
+    """This function returns the boolean array alternative[target_num,
+    phase_num, plat_num] (1-based) of the rows of the big dataframe that are
+    alternatives (PLATPROCTIME >= 0), so that a dataframe pruned another way
+    (KC_kinematics.apply_windows) can be checked with unserved_phases."""
+    t, i, p = (df[c].to_numpy() for c in ("Target_num", "Phase_num", "Plat_num"))
+    alternative = np.zeros((t.max() + 1, i.max() + 1, p.max() + 1), dtype=bool)
+    alternative[t, i, p] = df["PLATPROCTIME"].to_numpy() >= 0
+    return alternative
+
+
+def unserved_phases(df, mask):
+    """This function returns the (target_num, phase_num) that have alternatives
+    in the big dataframe but none left in the mask, so the model would have no
+    platform for them."""
+    feasible = df[df["PLATPROCTIME"] >= 0]
+    t, i, p = (feasible[c].to_numpy() for c in ("Target_num", "Phase_num", "Plat_num"))
+    served = np.zeros(mask.shape[:2], dtype=bool)
+    np.logical_or.at(served, (t, i), mask[t, i, p])
+    return sorted(set(zip(t.tolist(), i.tolist())) - set(zip(*np.nonzero(served))))
+
+
+def benchmark(sizes=((100, 100), (1000, 1000), (3000, 3000)), num_phases=14,
+              num_types=10, seed=0):
+    """This function times the distance matrix and the in_range mask on random
+    positions for a list of (targets, platforms) sizes and returns a list of
+    dictionaries of results."""
+    rng = np.random.default_rng(seed)
+    results = []
+    for num_targets, num_platforms in sizes:
+        targets = (rng.uniform(20, 35, num_targets), rng.uniform(-85, -70, num_targets),
+                   rng.uniform(0, 10, num_targets))
+        platforms = (rng.uniform(20, 35, num_platforms), rng.uniform(-85, -70, num_platforms),
+                     rng.choice([0.005, 6.096, 1000.0], num_platforms))
+        range_by_type = rng.uniform(100, 3000, (num_types, num_phases, num_types))
+        target_type = rng.integers(num_types, size=num_targets)
+        plat_type = rng.integers(num_types, size=num_platforms)
+
+        result = {"targets": num_targets, "platforms": num_platforms}
+        for method in distance_methods:
+            start_time = time.time()
+            distance = distance_matrix(targets, platforms, method)
+            result[method + "_time"] = time.time() - start_time
+        start_time = time.time()
+        in_range = type_in_range(distance, range_by_type, target_type, plat_type)
+        result["mask_time"] = time.time() - start_time
+        result["in_range"] = in_range.mean()
+        start_time = time.time()
+        visible = line_of_sight(targets, platforms)
+        result["los_time"] = time.time() - start_time
+        result["visible"] = visible.mean()
+        results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    import KC_data_stack
+    import KC_model
+
+    f = "small_inputs_gmuV5.xlsx"  # enter the filename (path) for the data
+    df = KC_data_stack.create_big_dataframe(f)
+
+    for method in distance_methods:
+        distance = platform_target_distance(df, method)
+        print('%s distance, targets x platforms (km):' % method)
+        print(np.round(distance[1:6, 1:], 1))
+
+    alternatives = KC_model.phase_alternatives(df)
+    print('alternatives: %i' % sum(len(a) for a in alternatives.values()))
+    for name, mask in (("in range", in_range_mask(df)), ("in line of sight", los_mask(df)),
+                       ("in line of sight (k = 4/3)", los_mask(df, refraction=4 / 3)),
+                       ("feasible", feasibility_mask(df))):
+        pruned = KC_model.phase_alternatives(prune_alternatives(df, mask))
+        print('  %s: %i, phases left without alternative: %s' %
+              (name, sum(len(a) for a in pruned.values()), unserved_phases(df, mask)))
+
+    for result in benchmark():
+        print('%5i targets x %5i platforms: ground %.3f s, slant %.3f s, in_range mask %.3f s '
+              '(%.0f%% in range), line of sight %.3f s (%.0f%% visible)' %
+              (result["targets"], result["platforms"], result["ground_time"],
+               result["slant_time"], result["mask_time"], 100 * result["in_range"],
+               result["los_time"], 100 * result["visible"]))
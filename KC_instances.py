@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 21:30:00 2026
+
+Readers for the standard job shop and flexible job shop instance formats, and
+a regression benchmark on a fixed corpus of instance files.
+
+Three text formats are read, line by line, straight into the arrays of
+KC_job_shop.operation_arrays, so every instance is built by the same model
+builder (KC_job_shop.job_shop_model):
+    "jsp": the OR-Library job shop format. A line "n m" followed by one line
+        per job of m (machine, duration) pairs, machines numbered from 0.
+        Lines before the sizes (instance name, description) are skipped.
+    "taillard": the format of Taillard's files. A header line "Nb of jobs,
+        Nb of Machines, Time seed, Machine seed, Upper bound, Lower bound"
+        and its values, then "Times" and n lines of durations, then
+        "Machines" and n lines of machines numbered from 1. A file may hold
+        several instances.
+    "fjs": the flexible job shop format of Brandimarte. A line "n m
+        [average alternatives]" followed by one line per job: the number of
+        operations, then for every operation the number of alternatives k and
+        k (machine, duration) pairs, machines numbered from 1.
+"""
+
+import os
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from ortools.sat.python import cp_model
+import KC_job_shop
+
+# best known makespans, used when the instance file gives no upper bound
+known_best = {"ft06": 55, "ft10": 930, "ft20": 1165,
+              "mk01": 40, "mk02": 26, "mk03": 204, "mk04": 60, "mk05": 172, "mk08": 523}
+# extensions of the instance files read from a corpus directory
+instance_extensions = (".txt", ".jsp", ".tai", ".fjs")
+
+
+def instance_format(path):
+    """Returns the format of an instance file: "fjs" or "taillard" from its
+    extension (".fjs", ".tai"), "taillard" if it has a "Times" line, "jsp"
+    otherwise."""
+    if path.lower().endswith(".fjs"):
+        return "fjs"
+    if path.lower().endswith(".tai"):
+        return "taillard"
+    with open(path) as file:
+        for line in file:
+            if line.strip().lower() == "times":
+                return "taillard"
+    return "jsp"
+
+
+def _number_lines(file):
+    """Yields the lines of an open file as lists of ints, and the lines that
+    are not all numbers (headers, names, descriptions) as their text."""
+    for line in file:
+        tokens = line.split()
+        if not tokens or tokens[0].startswith("#"):
+            continue
+        try:
+            yield [int(float(token)) for token in tokens]
+        except ValueError:
+            yield line.strip()
+
+
+def read_jsp(path):
+    """This function reads a job shop instance in the OR-Library format and
+    returns its instance dictionary (see read_instances). Raises ValueError if
+    the file has no "n m" line."""
+    with open(path) as file:
+        lines = _number_lines(file)
+        for line in lines:
+            if isinstance(line, list) and len(line) == 2:
+                n, m = line
+                break
+        else:
+            raise ValueError("no job shop instance (no 'n m' line) in %s" % path)
+        rows = np.array([next(lines) for _ in range(n)], dtype=np.int64).reshape(n, m, 2)
+
+    arrays = KC_job_shop.job_arrays(rows[:, :, 1], rows[:, :, 0])
+    return _instance(_name(path), "jsp", arrays, n, m)
+
+
+def read_taillard(path):
+    """This function reads the instances of a file in Taillard's format and
+    yields their instance dictionaries (see read_instances), with the upper and
+    lower bounds given in the file."""
+    with open(path) as file:
+        lines = _number_lines(file)
+        count = 0
+        for line in lines:
+            if isinstance(line, str) and line.lower().startswith("nb of jobs"):
+                n, m, _, _, upper_bound, lower_bound = next(lines)
+            elif isinstance(line, str) and line.lower() == "times":
+                durations = np.array([next(lines) for _ in range(n)], dtype=np.int64)
+            elif isinstance(line, str) and line.lower() == "machines":
+                machines = np.array([next(lines) for _ in range(n)], dtype=np.int64) - 1
+                count += 1
+                name = "%s#%i" % (_name(path), count)
+                yield _instance(name, "taillard", KC_job_shop.job_arrays(durations, machines),
+                                n, m, upper_bound, lower_bound)
+
+
+def read_fjs(path):
+    """This function reads a flexible job shop instance in Brandimarte's format
+    and returns its instance dictionary (see read_instances). Every job line is
+    decoded into its alternatives without building nested lists."""
+    job, task, machine, duration = [], [], [], []
+    with open(path) as file:
+        lines = _number_lines(file)
+        n, m = next(line for line in lines if isinstance(line, list))[:2]
+        for job_id in range(n):
+            line = next(lines)
+            position = 1
+            for task_id in range(line[0]):
+                k = line[position]
+                pairs = line[position + 1:position + 1 + 2 * k]
+                job.extend([job_id] * k)
+                task.extend([task_id] * k)
+                machine.extend(pairs[0::2])
+                duration.extend(pairs[1::2])
+                position += 1 + 2 * k
+
+    arrays = KC_job_shop.operation_arrays(job, task, np.array(machine) - 1, duration)
+    return _instance(_name(path), "fjs", arrays, n, m)
+
+
+def _name(path):
+    """Returns the instance name of a file: its name without extension."""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _instance(name, file_format, arrays, n, m, upper_bound=None, lower_bound=None):
+    """Returns the instance dictionary of read_instances. A bound of 0 (as
+    written for generated instances) is unknown."""
+    upper_bound = upper_bound or known_best.get(name.lower())
+    lower_bound = lower_bound or None
+    return {"name": name, "format": file_format, "arrays": arrays,
+            "jobs": n, "machines": m, "upper_bound": upper_bound, "lower_bound": lower_bound}
+
+
+def read_instances(path):
+    """This function yields the instances of a file as dictionaries:
+        name, format: instance name (file name) and format
+        arrays: the arrays of KC_job_shop.job_arrays
+        jobs, machines: sizes given in the file
+        upper_bound: best known makespan (from the file, or known_best)
+        lower_bound: lower bound given in the file, or None"""
+    file_format = instance_format(path)
+    if file_format == "taillard":
+        yield from read_taillard(path)
+    elif file_format == "fjs":
+        yield read_fjs(path)
+    else:
+        yield read_jsp(path)
+
+
+def run_corpus(paths, max_time_in_seconds=10.0, num_workers=8, output=None):
+    """This function reads, builds and solves every instance of the corpus and
+    returns a dataframe with one record per instance: sizes, read, build and
+    solve times, status, makespan, bound, gap to the bound and gap to the
+    best known makespan. The gaps are relative to the makespan found and to
+    the best known makespan. If output is given the records are appended to
+    that CSV file, so successive runs of the builder can be compared.
+    Arguments:
+        paths: instance files, or directories whose files with an extension of
+            instance_extensions are read; a file that holds no instance is
+            skipped with a warning
+        max_time_in_seconds, num_workers: solver parameters"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                if name.lower().endswith(instance_extensions)))
+        else:
+            files.append(path)
+
+    records = []
+    for path in files:
+        read_start = time.time()
+        try:
+            instances = list(read_instances(path))
+        except ValueError as error:
+            warnings.warn("%s skipped: %s" % (path, error))
+            continue
+        if not instances:
+            warnings.warn("%s skipped: no instance in the file" % path)
+            continue
+        read_time = (time.time() - read_start) / len(instances)
+        for instance in instances:
+            build_start = time.time()
+            model, handles = KC_job_shop.job_shop_model(instance["arrays"])
+            build_time = time.time() - build_start
+
+            solver = cp_model.CpSolver()
+            solver.parameters.max_time_in_seconds = max_time_in_seconds
+            solver.parameters.num_workers = num_workers
+            status = solver.Solve(model)
+            solved = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+            makespan = solver.ObjectiveValue() if solved else None
+            bound = solver.BestObjectiveBound()
+            best = instance["upper_bound"]
+
+            records.append({"instance": instance["name"],
+                            "format": instance["format"],
+                            "jobs": instance["jobs"],
+                            "machines": instance["machines"],
+                            "operations": len(instance["arrays"]["job"]),
+                            "alternatives": len(instance["arrays"]["op"]),
+                            "read_time": read_time,
+                            "build_time": build_time,
+                            "solve_time": solver.WallTime(),
+                            "status": solver.StatusName(status),
+                            "makespan": makespan,
+                            "bound": bound,
+                            "gap": (makespan - bound) / makespan if solved else None,
+                            "best_known": best,
+                            "gap_to_best": (makespan - best) / best if solved and best else None})
+
+    results = pd.DataFrame(records)
+    if output is not None:
+        results.insert(0, "run", time.strftime("%Y-%m-%d %H:%M:%S"))
+        results.to_csv(output, mode="a", index=False, header=not os.path.exists(output))
+    return results
+
+
+def write_taillard(path, instances):
+    """This function writes instances in Taillard's format. instances is a list
+    of (machines, durations) pairs of jobs x machines arrays, machines
+    numbered from 0 (as returned by KC_job_shop.random_instance)."""
+    with open(path, "w") as file:
+        for machines, durations in instances:
+            n, m = durations.shape
+            file.write("Nb of jobs, Nb of Machines, Time seed, Machine seed, "
+                       "Upper bound, Lower bound\n")
+            file.write(" %i %i 0 0 0 0\n" % (n, m))
+            file.write("Times\n")
+            file.writelines(" ".join("%i" % d for d in row) + "\n" for row in durations)
+            file.write("Machines\n")
+            file.writelines(" ".join("%i" % (k + 1) for k in row) + "\n" for row in machines)
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    # a small corpus: ft06 (OR-Library), the flexible example of
+    # flexible_job_shop.py in Brandimarte's format and a Taillard-format file
+    corpus = tempfile.mkdtemp()
+    with open(os.path.join(corpus, "ft06.txt"), "w") as file:
+        file.write("instance ft06\n"
+                   " Fisher and Thompson 6x6 instance, alternate name (mt06)\n"
+                   " 6 6\n"
+                   " 2 1 0 3 1 6 3 7 5 3 4 6\n"
+                   " 1 8 2 5 4 10 5 10 0 10 3 4\n"
+                   " 2 5 3 4 5 8 0 9 1 1 4 7\n"
+                   " 1 5 0 5 2 5 3 3 4 8 5 9\n"
+                   " 2 9 1 3 4 5 5 4 0 3 3 1\n"
+                   " 1 3 3 3 5 9 0 10 4 4 2 1\n")
+    with open(os.path.join(corpus, "toy.fjs"), "w") as file:
+        file.write("3 3 3\n"
+                   "3 3 1 3 2 1 3 5 3 1 2 2 4 3 6 3 1 2 2 3 3 1\n"
+                   "3 3 1 2 2 3 3 4 3 1 1 2 5 3 4 3 1 2 2 1 3 4\n"
+                   "3 3 1 2 2 1 3 4 3 1 2 2 3 3 4 3 1 3 2 1 3 5\n")
+    write_taillard(os.path.join(corpus, "random_10_10.txt"),
+                   [KC_job_shop.random_instance(10, 10, seed, seed + 1) for seed in (1, 3)])
+
+    results = run_corpus([corpus], max_time_in_seconds=10.0,
+                         output=os.path.join(tempfile.gettempdir(), "job_shop_runs.csv"))
+    print(results.to_string(index=False))
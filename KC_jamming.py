@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 16:40:00 2026
+
+Jamming-state scenarios for the flexible targetshop model.
+
+Only the communication data (link latency and range, KC_link_graph) depends on
+the jamming state of the platforms; the (t,i,p) index, the durations and the
+model skeleton do not. The big dataframe and the skeleton are therefore built
+once, and a scenario only adds its handoff gaps:
+    "parallel": the skeleton is copied once per scenario, the copy gets the
+        scenario's gaps and all scenarios are solved concurrently.
+    "two_stage": one stochastic model in which the platform assignment is
+        shared by all scenarios (first stage) and each scenario gets its own
+        start times (second stage). The weighted sum of the scenario makespans
+        is minimized, so the assignment is robust to the jamming state.
+"""
+
+from ortools.sat.python import cp_model
+import concurrent.futures
+import KC_model
+import KC_link_graph
+
+
+def default_scenarios(df, tables):
+    """Returns one scenario per jamming state in the link tables, with every
+    platform in that state, as a dictionary of jam_states dictionaries."""
+    platforms = sorted(set(df["Plat ID"]))
+    return {state: dict.fromkeys(platforms, state) for state in tables["jam_states"]}
+
+
+def solve_parallel(df, tables, scenarios, formulation="lean", distance=None,
+                   max_time_in_seconds=None, num_workers=8):
+    """This function builds the skeleton model once, copies it for every
+    scenario, adds the scenario's handoff gaps and solves the copies
+    concurrently. The search workers are shared out between the scenarios.
+    Returns a dictionary indexed by scenario name with the solver, status and
+    makespan of every scenario, and the skeleton handles."""
+    skeleton, handles = KC_model.flexible_targetshop_model(df, formulation=formulation)
+    gaps = KC_link_graph.scenario_handoff_gaps(df, tables, scenarios, distance)
+
+    models = {}
+    for name in scenarios:
+        # variable handles index into the proto, so they are valid in the copy
+        models[name] = cp_model.CpModel()
+        models[name].CopyFrom(skeleton)
+        KC_link_graph.add_handoff_gaps(models[name], handles, gaps[name])
+
+    def solve(model):
+        solver = cp_model.CpSolver()
+        if max_time_in_seconds is not None:
+            solver.parameters.max_time_in_seconds = max_time_in_seconds
+        solver.parameters.num_workers = max(1, num_workers // len(models))
+        status = solver.Solve(model)
+        return solver, status
+
+    # CpSolver.Solve releases the GIL, so threads solve the copies in parallel
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(models)) as executor:
+        futures = {name: executor.submit(solve, model) for name, model in models.items()}
+
+    results = {}
+    for name, future in futures.items():
+        solver, status = future.result()
+        results[name] = {"solver": solver, "status": solver.StatusName(status),
+                         "makespan": solver.Value(handles["makespan"])
+                         if status in (cp_model.OPTIMAL, cp_model.FEASIBLE) else None}
+    return results, handles
+
+
+def add_scenario_schedule(model, handles, df, name):
+    """This function adds a second-stage copy of the schedule to a model built
+    by KC_model.flexible_targetshop_model: new start variables, intervals,
+    NoOverlap and precedence constraints and a makespan, sharing the presence
+    literals (the platform assignment) of handles. Returns the scenario handles
+    with the same keys as the handles of KC_model."""
+    horizon = handles["horizon"]
+    scenario = {"horizon": horizon,
+                "presences": handles["presences"],
+                "starts": {}, "ends": {}, "intervals": {}, "target_ends": {},
+                "intervals_per_resources": {}}
+
+    for (t, i), phase in sorted(KC_model.phase_alternatives(df).items()):
+        suffix_name = '_%s_tgt%i_phase%i' % (name, t, i)
+        start = model.NewIntVar(0, horizon, 'start' + suffix_name)
+        duration = sum(d * handles["presences"][(t, i, p)] for p, d in phase)
+        for p, d in phase:
+            interval = model.NewOptionalFixedSizeIntervalVar(
+                start, d, handles["presences"][(t, i, p)], 'interval%s_plat%i' % (suffix_name, p))
+            scenario["intervals"][(t, i, p)] = interval
+            scenario["intervals_per_resources"].setdefault(p, []).append(interval)
+
+        # Add precedence with previous phase in the same target.
+        if (t, i - 1) in scenario["ends"]:
+            model.Add(start >= scenario["ends"][(t, i - 1)])
+        scenario["starts"][(t, i)] = start
+        scenario["ends"][(t, i)] = start + duration
+        scenario["target_ends"][t] = scenario["ends"][(t, i)]
+
+    for intervals in scenario["intervals_per_resources"].values():
+        if len(intervals) > 1:
+            model.AddNoOverlap(intervals)
+
+    scenario["makespan"] = model.NewIntVar(0, horizon, 'makespan_%s' % name)
+    model.AddMaxEquality(scenario["makespan"], list(scenario["target_ends"].values()))
+    return scenario
+
+
+def two_stage_model(df, tables, scenarios, weights=None, formulation="lean", distance=None):
+    """This function builds the stochastic two-stage model. The first scenario
+    uses the skeleton's own start variables, every other scenario gets a
+    second-stage schedule from add_scenario_schedule, and each scenario gets
+    its own handoff gaps.
+    Arguments:
+        weights: integer weight (e.g. probability in percent) per scenario,
+            default 1 for every scenario
+    Returns the model, the skeleton handles and a dictionary of scenario
+    handles indexed by scenario name."""
+    model, handles = KC_model.flexible_targetshop_model(df, formulation=formulation)
+    gaps = KC_link_graph.scenario_handoff_gaps(df, tables, scenarios, distance)
+    if weights is None:
+        weights = dict.fromkeys(scenarios, 1)
+
+    scenario_handles = {}
+    for k, name in enumerate(scenarios):
+        scenario_handles[name] = handles if k == 0 else add_scenario_schedule(model, handles, df, name)
+        KC_link_graph.add_handoff_gaps(model, scenario_handles[name], gaps[name])
+
+    model.Minimize(sum(weights[name] * scenario_handles[name]["makespan"] for name in scenarios))
+    return model, handles, scenario_handles
+
+
+def solve_two_stage(df, tables, scenarios, weights=None, formulation="lean", distance=None,
+                    max_time_in_seconds=None, num_workers=8):
+    """This function builds and solves the two-stage model and returns a
+    dictionary indexed by scenario name with the status and the makespan of
+    every scenario under the shared platform assignment, and the skeleton
+    handles."""
+    model, handles, scenario_handles = two_stage_model(
+        df, tables, scenarios, weights, formulation, distance)
+
+    solver = cp_model.CpSolver()
+    if max_time_in_seconds is not None:
+        solver.parameters.max_time_in_seconds = max_time_in_seconds
+    solver.parameters.num_workers = num_workers
+    status = solver.Solve(model)
+
+    results = {}
+    for name, scenario in scenario_handles.items():
+        results[name] = {"solver": solver, "status": solver.StatusName(status),
+                         "makespan": solver.Value(scenario["makespan"])
+                         if status in (cp_model.OPTIMAL, cp_model.FEASIBLE) else None}
+    return results, handles
+
+
+if __name__ == "__main__":
+    import KC_data_melt
+    import KC_geo
+    import time
+
+    f = "small_inputs_gmuV5.xlsx"  # enter the filename (path) for the data
+    df = KC_data_melt.create_big_dataframe(f)
+    tables = KC_link_graph.import_link_tables(f)
+    scenarios = default_scenarios(df, tables)
+    distance = KC_geo.platform_distance(df)  # link ranges are cut against it
+
+    for mode, solve_scenarios in (("parallel", solve_parallel), ("two_stage", solve_two_stage)):
+        start_time = time.time()
+        results, handles = solve_scenarios(df, tables, scenarios, distance=distance,
+                                           max_time_in_seconds=30)
+        print('%s (%.2f s):' % (mode, time.time() - start_time))
+        for name in scenarios:
+            print('  %-10s %-10s makespan %s' % (name, results[name]["status"], results[name]["makespan"]))
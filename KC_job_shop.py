@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 20:40:00 2026
+
+Data-driven job shop engine. The jobs are given as data (a list of jobs of
+(machine, duration) tasks as in the OR-Tools example, a pair of jobs x tasks
+arrays of machines and durations, or a dataframe with one row per task) and
+are flattened into parallel arrays. Everything the model needs (machine codes,
+release dates, tails, the precedence pairs and the alternatives of each
+machine) is computed on those arrays in one pass with numpy; the model is then
+built from them.
+
+A task may also be a list of (machine, duration) alternatives, as in the
+flexible job shop: the alternatives share the start of the task and exactly
+one of them is performed. A job shop is the case of a single alternative per
+task.
+
+The machines are coded 0..m-1 from their labels, so machines named by a
+string ("fighter_4th") get their NoOverlap constraint like integer machines.
+"""
+
+from ortools.sat.python import cp_model
+import numpy as np
+import pandas as pd
+import time
+
+
+def job_arrays(jobs, machines=None):
+    """This function flattens the jobs into a dictionary of parallel arrays.
+    Indexed by operation (in job order, then task order):
+        job, task: job and task numbers
+    Indexed by alternative (sorted on operation; for a job shop the
+    alternatives are the operations):
+        op: operation of the alternative
+        machine: machine code, 0..m-1
+        duration: processing time
+    and machine_labels, the label of every machine code.
+    Arguments:
+        jobs: a list of jobs, each a list of tasks, a task being a (machine,
+            duration) tuple or a list of such alternatives; or a jobs x tasks
+            array of durations when machines is given; or a dataframe with
+            the columns "job", "machine" and "duration" and optionally "task"
+            (rows with the same job and task are alternatives; without it,
+            every row is a task and the row order gives the task order)
+        machines: jobs x tasks array of machines, used with an array of
+            durations"""
+    task = None
+    if isinstance(jobs, pd.DataFrame):
+        df = jobs.sort_values(["job", "task"] if "task" in jobs else ["job"], kind="stable")
+        job = pd.factorize(df["job"], sort=True)[0]
+        task = df["task"].to_numpy() if "task" in df else None
+        machine_values = df["machine"].to_numpy()
+        duration = df["duration"].to_numpy()
+    elif machines is not None:
+        duration = np.asarray(jobs)
+        machine_values = np.asarray(machines).ravel()
+        job = np.repeat(np.arange(duration.shape[0]), duration.shape[1])
+        duration = duration.ravel()
+    else:
+        alternatives = [(job_id, task_id, alternative)
+                        for job_id, tasks in enumerate(jobs)
+                        for task_id, alternatives in enumerate(tasks)
+                        for alternative in (alternatives if isinstance(alternatives, list)
+                                            else [alternatives])]
+        job = np.array([a[0] for a in alternatives])
+        task = np.array([a[1] for a in alternatives])
+        machine_values = np.array([a[2][0] for a in alternatives])
+        duration = np.array([a[2][1] for a in alternatives])
+
+    return operation_arrays(job, task, machine_values, duration)
+
+
+def operation_arrays(job, task, machine_values, duration):
+    """This function returns the arrays of job_arrays from one entry per
+    alternative, sorted on job and task: job and task numbers (task None if
+    every alternative is a task of its own), machine labels and durations."""
+    job = np.asarray(job, dtype=np.int64)
+    if task is None:
+        new_op = np.ones(len(job), dtype=bool)
+    else:
+        task = np.asarray(task)
+        new_op = np.r_[True, (job[1:] != job[:-1]) | (task[1:] != task[:-1])]
+    op_start = np.flatnonzero(new_op)
+    op_job = job[op_start]
+    job_start = np.flatnonzero(np.r_[True, op_job[1:] != op_job[:-1]])
+    machine_labels, machine = np.unique(machine_values, return_inverse=True)
+
+    return {"job": op_job,
+            "task": np.arange(len(op_job)) - np.repeat(job_start, np.diff(np.r_[job_start, len(op_job)])),
+            "op": np.cumsum(new_op) - 1,
+            "machine": machine.astype(np.int64),
+            "duration": np.asarray(duration, dtype=np.int64),
+            "machine_labels": machine_labels}
+
+
+def job_shop_model(jobs, machines=None, horizon=None):
+    """This function builds the (flexible) job shop model (precedences inside
+    every job, one NoOverlap per machine, minimize the makespan) and returns
+    the model together with a dictionary holding its handles:
+        arrays: the arrays of job_arrays
+        horizon: upper bound of the makespan
+        starts: start variable of every operation, indexed by operation
+        ends: end expression of every operation
+        intervals: interval variable of every alternative
+        presences: presence literal of every alternative (None for the only
+            alternative of an operation)
+        makespan: makespan variable
+    An operation with several alternatives gets one optional interval per
+    alternative on its start variable, exactly one of them present, and its
+    end is its start plus the duration of the present alternative. The start
+    of an operation is bounded below by the shortest work of its job before it
+    and above by the horizon minus the shortest work of its job from it on.
+    Arguments:
+        jobs, machines: the jobs, see job_arrays (or the arrays it returns)
+        horizon: defaults to the sum of the longest alternative of every
+            operation"""
+    arrays = jobs if isinstance(jobs, dict) else job_arrays(jobs, machines)
+    job, op, machine, duration = arrays["job"], arrays["op"], arrays["machine"], arrays["duration"]
+
+    # shortest and longest alternative of every operation
+    alt_start = np.flatnonzero(np.r_[True, op[1:] != op[:-1]])
+    alt_count = np.diff(np.r_[alt_start, len(op)])
+    min_duration = np.minimum.reduceat(duration, alt_start)
+    if horizon is None:
+        horizon = int(np.maximum.reduceat(duration, alt_start).sum())
+
+    # heads and tails of the operations from the cumulative work of each job
+    job_start = np.flatnonzero(np.r_[True, job[1:] != job[:-1]])
+    job_size = np.diff(np.r_[job_start, len(job)])
+    job_work = np.add.reduceat(min_duration, job_start)
+    work_before = np.cumsum(min_duration) - min_duration
+    lower = work_before - np.repeat(work_before[job_start], job_size)
+    upper = horizon - np.repeat(job_work, job_size) + lower
+
+    # precedence pairs (op, next op of the same job) and alternatives per machine
+    successor = np.flatnonzero(job[1:] == job[:-1])
+    by_machine = np.argsort(machine, kind="stable")
+    machine_alternatives = np.split(by_machine, np.flatnonzero(np.diff(machine[by_machine])) + 1)
+    last_ops = job_start + job_size - 1
+
+    model = cp_model.CpModel()
+    starts = [model.NewIntVar(int(lb), int(ub), "start_%i_%i" % (j, k))
+              for lb, ub, j, k in zip(lower, upper, job, arrays["task"])]
+    intervals = [None] * len(op)
+    presences = [None] * len(op)
+    ends = []
+    for o, (first, count) in enumerate(zip(alt_start, alt_count)):
+        suffix = "_%i_%i" % (job[o], arrays["task"][o])
+        if count == 1:
+            d = int(duration[first])
+            intervals[first] = model.NewFixedSizeIntervalVar(starts[o], d, "interval" + suffix)
+            ends.append(starts[o] + d)
+            continue
+        for a in range(first, first + count):
+            presences[a] = model.NewBoolVar("presence%s_%i" % (suffix, a - first))
+            intervals[a] = model.NewOptionalFixedSizeIntervalVar(
+                starts[o], int(duration[a]), presences[a], "interval%s_%i" % (suffix, a - first))
+        model.AddExactlyOne(presences[first:first + count])
+        ends.append(starts[o] + cp_model.LinearExpr.WeightedSum(
+            presences[first:first + count], [int(d) for d in duration[first:first + count]]))
+
+    for o in successor:
+        model.Add(starts[o + 1] >= ends[o])
+    for alternatives in machine_alternatives:
+        if len(alternatives) > 1:
+            model.AddNoOverlap([intervals[a] for a in alternatives])
+
+    makespan = model.NewIntVar(int(job_work.max()), horizon, "makespan")
+    model.AddMaxEquality(makespan, [ends[o] for o in last_ops])
+    model.Minimize(makespan)
+
+    return model, {"arrays": arrays, "horizon": horizon, "starts": starts, "ends": ends,
+                   "intervals": intervals, "presences": presences, "makespan": makespan}
+
+
+def job_shop_solution(solver, handles):
+    """This function returns the schedule found by the solver as a dataframe
+    with one row per operation (job, task, machine label and duration of the
+    performed alternative, start, end), sorted by machine and start."""
+    arrays = handles["arrays"]
+    performed = np.array([p is None or solver.BooleanValue(p) for p in handles["presences"]])
+    start = np.array([solver.Value(s) for s in handles["starts"]], dtype=np.int64)
+    op = arrays["op"][performed]
+    duration = arrays["duration"][performed]
+    schedule = pd.DataFrame({"job": arrays["job"][op],
+                             "task": arrays["task"][op],
+                             "machine": arrays["machine_labels"][arrays["machine"][performed]],
+                             "start": start[op],
+                             "duration": duration,
+                             "end": start[op] + duration})
+    return schedule.sort_values(["machine", "start"], kind="stable").reset_index(drop=True)
+
+
+def random_instance(n_jobs, n_machines, time_seed, machine_seed):
+    """This function generates a job shop instance in the manner of Taillard
+    (1993): durations uniform in 1..99 and each job visiting every machine
+    once in a random order, both drawn from the linear congruential generator of the paper.
+    Returns (machines, durations), two n_jobs x n_machines arrays."""
+    def unif(seed, low, high):
+        k = seed[0] // 127773
+        seed[0] = 16807 * (seed[0] % 127773) - k * 2836
+        if seed[0] < 0:
+            seed[0] += 2147483647
+        return low + int(seed[0] / 2147483647 * (high - low + 1))
+
+    time_seed, machine_seed = [time_seed], [machine_seed]
+    durations = np.array([[unif(time_seed, 1, 99) for _ in range(n_machines)]
+                          for _ in range(n_jobs)], dtype=np.int64)
+    machines = np.tile(np.arange(n_machines), (n_jobs, 1))
+    for j in range(n_jobs):
+        for i in range(n_machines):
+            k = unif(machine_seed, i, n_machines - 1)
+            machines[j, i], machines[j, k] = machines[j, k], machines[j, i]
+    return machines, durations
+
+
+def benchmark(sizes=((15, 15), (20, 20), (30, 20), (50, 20)), max_time_in_seconds=10.0,
+              num_workers=8, seed=1):
+    """This function generates one random instance per (jobs, machines) size,
+    builds and solves it and returns a list with one dictionary of results per
+    instance: preparation and build time, model size, solve time, status,
+    makespan and best bound."""
+    results = []
+    for n_jobs, n_machines in sizes:
+        machines, durations = random_instance(n_jobs, n_machines, seed, seed + 1)
+
+        prepare_start = time.time()
+        arrays = job_arrays(durations, machines)
+        prepare_time = time.time() - prepare_start
+        build_start = time.time()
+        model, handles = job_shop_model(arrays)
+        build_time = time.time() - build_start
+
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = max_time_in_seconds
+        solver.parameters.num_workers = num_workers
+        status = solver.Solve(model)
+        solved = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+
+        results.append({"size": "%ix%i" % (n_jobs, n_machines),
+                        "operations": len(arrays["job"]),
+                        "prepare_time": prepare_time,
+                        "build_time": build_time,
+                        "constraints": len(model.Proto().constraints),
+                        "solve_time": solver.WallTime(),
+                        "status": solver.StatusName(status),
+                        "makespan": solver.ObjectiveValue() if solved else None,
+                        "best_bound": solver.BestObjectiveBound()})
+    return results
+
+
+if __name__ == "__main__":
+    # the OR-Tools example
+    jobs_data = [[(0, 3), (1, 2), (2, 2)],
+                 [(0, 2), (2, 1), (1, 4)],
+                 [(1, 4), (2, 3)]]
+    model, handles = job_shop_model(jobs_data)
+    solver = cp_model.CpSolver()
+    status = solver.Solve(model)
+    print('%s, makespan %i' % (solver.StatusName(status), solver.ObjectiveValue()))
+    print(job_shop_solution(solver, handles))
+
+    for result in benchmark():
+        print('%-6s %5i ops | prepare %6.4f s | build %6.3f s | cons %6i | solve %6.2f s | '
+              '%-8s | makespan %6s | bound %6i' %
+              (result["size"], result["operations"], result["prepare_time"],
+               result["build_time"], result["constraints"], result["solve_time"],
+               result["status"], result["makespan"], result["best_bound"]))
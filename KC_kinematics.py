@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 20 01:40:00 2026
+
+Weapon kinematics of the Engage -> IFTU -> Assess phases.
+
+A weapon launched at the end of the Engage phase flies from the shooter to
+the target at the speed of its type (inp_WpnType, m/s) and cannot be fired
+beyond its range (km). While it flies it needs in-flight target updates
+(IFTU) from a platform that can guide it, until it is within LASTIFTUDIST km
+of the target:
+    flyout: minutes from launch to impact, distance / speed
+    guidance: minutes of IFTU needed, (distance - LASTIFTUDIST) / speed
+    latest IFTU start: MAXTIMEBEFOREFIRSTIFTU minutes after launch
+    IFTU duration: at least MINIFTUDURATION minutes for the guiding platform
+        type (-1 if it cannot guide the weapon), and at least the guidance
+        time left after the latest IFTU start
+The IFTU alternatives are fixed-size intervals and the model does not know
+the shooter when it sizes them, so their duration covers the longest
+guidance that any shooter of the target may need.
+The minutes are computed for every (target, shooter, weapon type) in one
+numpy pass over the platform-target distances (KC_geo), rounded to whole
+minutes (lower bounds up, the latest start down), and given to the model as
+constants: the IFTU durations and the alternatives that no weapon can serve
+are written into the big dataframe (apply_windows), and the time lags are
+added per Engage alternative (add_iftu_windows). No division or scaling is
+left in the model.
+"""
+
+import numpy as np
+import KC_data_melt
+import KC_geo
+import KC_weapons
+
+km_per_minute = 60.0 / 1000.0  # times the speed in m/s
+
+
+def _phase_num(name):
+    """Returns the phase_num of a phase name of KC_data_melt.phase_dict."""
+    return {phase: num for num, phase in KC_data_melt.phase_dict.items()}[name]
+
+
+def kinematics_arrays(df, df_wt, distance=None, candidates=None):
+    """This function returns the kinematics of every (target, shooter, weapon
+    type) as a dictionary of arrays (target_num and plat_num are 1-based, so
+    index 0 is unused):
+        weapon_types: the weapon types of the last axis
+        flyout[t, p, w]: minutes from launch to impact, inf if platform p
+            cannot fire weapon w at target t (not carried, not usable against
+            the target type or out of range)
+        guidance[t, p, w]: minutes of IFTU the weapon needs
+        latest_iftu[t, w]: latest IFTU start, in minutes after launch
+        min_iftu[p, w]: minimum IFTU duration when platform p guides weapon w,
+            inf if it cannot guide it
+    Arguments:
+        df: the big dataframe
+        df_wt: the weapon dataframe from KC_data_melt.import_weapon_data
+        distance: optional [target_num, plat_num] distances in km
+            (KC_geo.platform_target_distance)
+        candidates: optional [pt, wt, tt] array of KC_weapons.weapon_candidates
+            (default: every usable weapon, without pruning dominated ones)"""
+    arrays = KC_weapons.weapon_arrays(df, df_wt)
+    weapon_types = arrays["weapon_types"]
+    if candidates is None:
+        candidates = KC_weapons.weapon_candidates(arrays, prune_dominated=False)
+    if distance is None:
+        distance = KC_geo.platform_target_distance(df)
+
+    targets = df[["Target_num", "Target Type"]].drop_duplicates()
+    platforms = df.drop_duplicates("Plat_num")
+    t, p = targets["Target_num"].to_numpy(), platforms["Plat_num"].to_numpy()
+    tt = np.searchsorted(arrays["target_types"], targets["Target Type"].to_numpy())
+    pt = np.searchsorted(arrays["plat_types"], platforms["Plat Type"].to_numpy())
+
+    wt_data = df_wt.set_index("Weapon Type").loc[list(weapon_types)]
+    speed = wt_data["Speed (m/s)"].to_numpy(dtype=float) * km_per_minute
+    weapon_range = wt_data["Range (km)"].to_numpy(dtype=float)
+    target_types = targets["Target Type"]
+    last_dist = wt_data[["LASTIFTUDIST_" + x for x in target_types]].to_numpy(dtype=float).T
+    latest = wt_data[["MAXTIMEBEFOREFIRSTIFTU_" + x for x in target_types]].to_numpy(dtype=float).T
+
+    # [t, p, w] over the targets and platforms of the dataframe
+    d = distance[np.ix_(t, p)][:, :, None]
+    usable = candidates[pt[None, :], :, tt[:, None]] & (d <= weapon_range)
+    flyout = np.where(usable, d / speed, np.inf)
+    guidance = np.where(usable, np.maximum(d - last_dist[:, None, :], 0) / speed, np.inf)
+
+    min_duration = platforms[["MINIFTUDURATION_" + w for w in weapon_types]].to_numpy(dtype=float)
+    capacity = platforms[["IFTUCAPACITY_" + w for w in weapon_types]].to_numpy(dtype=float)
+    min_duration = np.where((min_duration >= 0) & (capacity > 0), min_duration, np.inf)
+
+    shape = (t.max() + 1, p.max() + 1, len(weapon_types))
+    result = {"weapon_types": weapon_types,
+              "flyout": np.full(shape, np.inf),
+              "guidance": np.full(shape, np.inf),
+              "latest_iftu": np.full((shape[0], shape[2]), np.nan),
+              "min_iftu": np.full((shape[1], shape[2]), np.inf)}
+    result["flyout"][np.ix_(t, p)] = flyout
+    result["guidance"][np.ix_(t, p)] = guidance
+    result["latest_iftu"][t] = latest
+    result["min_iftu"][p] = min_duration
+    return result
+
+
+def iftu_windows(kinematics):
+    """This function reduces the kinematics over the weapon types that every
+    shooter can use and returns the time windows of the phases, in whole
+    minutes after the end of Engage on shooter p:
+        assess_lag[t, p]: earliest start of Assess (impact), inf if p cannot
+            fire at t
+        iftu_lag[t, p]: earliest end of IFTU (end of guidance)
+        iftu_latest[t, p]: latest start of IFTU
+        iftu_duration[t, q]: IFTU duration on guiding platform q, inf if q
+            can guide no weapon that can be fired at t
+    A shooter that carries several usable weapons may fire any of them, so the
+    lags are the smallest (and the latest start the largest) over them. The
+    IFTU duration is the largest over the shooters and weapons that q can
+    guide, so whichever is chosen can be guided. The per-weapon values are
+    kept for the weapon allocation layer."""
+    flyout, guidance = kinematics["flyout"], kinematics["guidance"]
+    latest, min_iftu = kinematics["latest_iftu"], kinematics["min_iftu"]
+    usable = np.isfinite(flyout)  # [t, p, w]
+
+    # guidance time left after the latest IFTU start (the largest over the
+    # shooters), for the weapons that can be fired at t and guided by q
+    guidance_left = np.where(usable, guidance - latest[:, None, :], -np.inf).max(axis=1)  # [t, w]
+    guided = usable.any(axis=1)[:, None, :] & np.isfinite(min_iftu)[None, :, :]  # [t, q, w]
+    needed = np.where(guided, np.maximum(min_iftu[None, :, :], guidance_left[:, None, :]), -np.inf)
+    needed = needed.max(axis=2)
+    needed[needed == -np.inf] = np.inf
+
+    windows = {"assess_lag": np.ceil(flyout.min(axis=2)),
+               "iftu_lag": np.ceil(guidance.min(axis=2)),
+               "iftu_latest": np.floor(np.where(usable, latest[:, None, :], -np.inf).max(axis=2)),
+               "iftu_duration": np.ceil(needed),
+               "weapon_types": kinematics["weapon_types"],
+               "weapon_assess_lag": np.ceil(flyout),
+               "weapon_iftu_lag": np.ceil(guidance),
+               "weapon_iftu_latest": np.floor(latest),
+               "engage": _phase_num("Engage"),
+               "iftu": _phase_num("IFTU"),
+               "assess": _phase_num("Assess")}
+    windows["iftu_latest"][~usable.any(axis=2)] = np.inf
+    return windows
+
+
+def apply_windows(df, windows):
+    """This function returns a copy of the big dataframe with the kinematics
+    applied: the Engage alternatives that cannot fire at their target and the
+    IFTU alternatives that cannot guide any weapon get PLATPROCTIME -1, and
+    the PLATPROCTIME of the other IFTU alternatives is raised to the minimum
+    IFTU duration."""
+    windowed = df.copy()
+    t, i, p = (df[c].to_numpy() for c in ("Target_num", "Phase_num", "Plat_num"))
+    proc_time = df["PLATPROCTIME"].to_numpy()
+
+    engage = (i == windows["engage"]) & np.isinf(windows["assess_lag"][t, p])
+    iftu = i == windows["iftu"]
+    duration = windows["iftu_duration"][t, p]
+    raised = np.where(np.isinf(duration), -1, np.maximum(proc_time, np.nan_to_num(duration, posinf=0)))
+    proc_time = np.where(iftu & (proc_time >= 0), raised, proc_time)
+    windowed["PLATPROCTIME"] = np.where(engage, -1, proc_time).astype(df["PLATPROCTIME"].dtype)
+    return windowed
+
+
+def add_iftu_windows(model, handles, windows):
+    """This function adds the Engage -> IFTU -> Assess time lags to a model
+    built by KC_model.flexible_targetshop_model (from a dataframe passed
+    through apply_windows). For every Engage alternative (t, p), enforced by
+    its presence literal:
+        IFTU start <= Engage end + iftu_latest[t, p]
+        IFTU end >= Engage end + iftu_lag[t, p]
+        Assess start >= Engage end + assess_lag[t, p]
+    When the weapon allocation layer (KC_weapons) is in the model, the lags of
+    the weapon chosen are used instead, enforced by the weapon choice
+    literals. Returns the number of constraints added."""
+    engage, iftu, assess = windows["engage"], windows["iftu"], windows["assess"]
+    starts, ends = handles["starts"], handles["ends"]
+
+    if "weapon_choices" in handles:
+        w_index = {wt: k for k, wt in enumerate(windows["weapon_types"])}
+        lags = [((t, p), literal, windows["weapon_iftu_latest"][t, w_index[wt]],
+                 windows["weapon_iftu_lag"][t, p, w_index[wt]],
+                 windows["weapon_assess_lag"][t, p, w_index[wt]])
+                for (t, p, wt), literal in handles["weapon_choices"].items()]
+    else:
+        lags = [((t, p), presence, windows["iftu_latest"][t, p],
+                 windows["iftu_lag"][t, p], windows["assess_lag"][t, p])
+                for (t, i, p), presence in handles["presences"].items() if i == engage]
+
+    num_constraints = 0
+    for (t, p), literal, latest, iftu_lag, assess_lag in lags:
+        if np.isinf(assess_lag):
+            model.Add(literal == 0)  # the shooter cannot fire at the target
+            num_constraints += 1
+            continue
+        engage_end = ends[(t, engage)]
+        model.Add(starts[(t, iftu)] <= engage_end + int(latest)).OnlyEnforceIf(literal)
+        model.Add(ends[(t, iftu)] >= engage_end + int(iftu_lag)).OnlyEnforceIf(literal)
+        model.Add(starts[(t, assess)] >= engage_end + int(assess_lag)).OnlyEnforceIf(literal)
+        num_constraints += 3
+    return num_constraints
+
+
+if __name__ == "__main__":
+    import time
+    from ortools.sat.python import cp_model
+    import KC_data_stack
+    import KC_model
+
+    f = "small_inputs_gmuV5.xlsx"  # enter the filename (path) for the data
+    df = KC_data_stack.create_big_dataframe(f)
+    df_wt = KC_data_melt.import_weapon_data(f)
+
+    start_time = time.time()
+    windows = iftu_windows(kinematics_arrays(df, df_wt))
+    windowed = apply_windows(df, windows)
+    print('kinematics in %.3f s' % (time.time() - start_time))
+
+    shooters = np.isfinite(windows["assess_lag"])
+    print('Engage alternatives that can fire: %i, fly-out %i..%i min, guidance %i..%i min' %
+          (shooters.sum(), windows["assess_lag"][shooters].min(), windows["assess_lag"][shooters].max(),
+           windows["iftu_lag"][shooters].min(), windows["iftu_lag"][shooters].max()))
+    iftu = windowed[(windowed["Phase_num"] == windows["iftu"]) & (windowed["PLATPROCTIME"] >= 0)]
+    print('IFTU alternatives: %i of %i, duration %i..%i min' %
+          (len(iftu), (df["Phase_num"] == windows["iftu"]).sum(),
+           iftu["PLATPROCTIME"].min(), iftu["PLATPROCTIME"].max()))
+
+    for apply in (False, True):
+        model, handles = KC_model.flexible_targetshop_model(windowed if apply else df, formulation="lean")
+        if apply:
+            add_iftu_windows(model, handles, windows)
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = 10.0
+        status = solver.Solve(model)
+        print('IFTU windows %s: %s, makespan %s' %
+              (apply, solver.StatusName(status),
+               solver.ObjectiveValue() if status in (cp_model.OPTIMAL, cp_model.FEASIBLE) else '-'))
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 15:10:00 2026
+
+Communication link graph between platforms.
+
+inp_PlatLinks, inp_PlatLinksLatency and inp_PlatLinksRange give, for a sender
+platform type doing phase i, which receiver platform types it can talk to, the
+latency in minutes and the range in km, for each pair of sender/receiver
+jamming states. These sheets are turned into arrays indexed
+[sender state, receiver state, phase, sender pt, receiver pt], expanded to a
+platform-to-platform matrix per phase for given platform jamming states, and
+closed with a vectorized Floyd-Warshall so that a handoff may be relayed
+through other platforms. Missing links have an infinite latency.
+
+The minimum handoff latency from the platform doing phase i to the platform
+doing phase i+1 is then added to the model as a setup gap between the two
+phases, so no path variables are needed in the CP model.
+"""
+
+import pandas as pd
+import numpy as np
+import warnings
+import KC_data_melt
+
+link_keys = ["Plat Type", "Phase", "Sender Jamming State", "Receiver Jamming State"]
+
+
+def _read_link_sheet(f, sheet_name):
+    """Reads one link sheet and strips the "PLATLINKS(pt')_" style prefix from
+    the receiver platform type columns."""
+    sheet = pd.read_excel(f, sheet_name=sheet_name, skiprows=1, usecols="A:N")
+    sheet.columns = [c.rsplit('"', 1)[-1] for c in sheet.columns]
+    return sheet
+
+
+def import_link_tables(f):
+    """This function imports the link, link latency and link range sheets and
+    returns a dictionary of arrays indexed [sender state, receiver state, phase,
+    sender pt, receiver pt]:
+        links: True if the sender can communicate with the receiver
+        latency: latency in minutes (inf where there is no link)
+        range: link range in km (inf where the sheet has no value)
+    together with the index tuples jam_states, phases and plat_types.
+    Argument: filename (path) of the excel file from which we import the data"""
+    warnings.simplefilter(action="ignore", category=UserWarning)
+
+    inp_PlatLinks = _read_link_sheet(f, "inp_PlatLinks")
+    inp_PlatLinksLatency = _read_link_sheet(f, "inp_PlatLinksLatency")
+    inp_PlatLinksRange = _read_link_sheet(f, "inp_PlatLinksRange")
+
+    plat_types = tuple(c for c in inp_PlatLinks.columns if c not in link_keys)
+    phases = tuple(KC_data_melt.phase_dict.values())
+    jam_states = tuple(sorted(set(inp_PlatLinks["Sender Jamming State"])
+                              | set(inp_PlatLinks["Receiver Jamming State"])))
+    shape = (len(jam_states), len(jam_states), len(phases), len(plat_types), len(plat_types))
+
+    def to_array(sheet, fill):
+        array = np.full(shape, fill, dtype=float)
+        index = (sheet["Sender Jamming State"].map(jam_states.index).to_numpy(),
+                 sheet["Receiver Jamming State"].map(jam_states.index).to_numpy(),
+                 sheet["Phase"].map(phases.index).to_numpy(),
+                 sheet["Plat Type"].map(plat_types.index).to_numpy())
+        array[index] = sheet[list(plat_types)].to_numpy(dtype=float)
+        return array
+
+    links = to_array(inp_PlatLinks, 0) > 0
+    latency = np.where(links, to_array(inp_PlatLinksLatency, 0), np.inf)
+    link_range = to_array(inp_PlatLinksRange, np.inf)
+
+    return {"jam_states": jam_states,
+            "phases": phases,
+            "plat_types": plat_types,
+            "links": links,
+            "latency": latency,
+            "range": link_range}
+
+
+def import_platform_jamming_states(f):
+    """Returns a dictionary of the Jamming State of each platform indexed by
+    Plat ID (inp_PlatformDetail)."""
+    warnings.simplefilter(action="ignore", category=UserWarning)
+    inp_PlatformDetail = pd.read_excel(f, sheet_name="inp_PlatformDetail", skiprows=1, usecols="A:N")
+    return dict(zip(inp_PlatformDetail["Plat ID"], inp_PlatformDetail["Jamming State"]))
+
+
+def platform_latency(tables, plat_types, jam_states, distance=None):
+    """This function expands the platform type link tables to the platforms.
+    Arguments:
+        tables: dictionary from import_link_tables
+        plat_types: platform type of each platform, in plat_num order
+        jam_states: jamming state of each platform, in plat_num order
+        distance: optional [p, p'] matrix in km; links shorter than the
+            distance are dropped
+    Returns the direct latency array [phase, p, p'] with inf where p cannot
+    send to p' and 0 on the diagonal (a platform keeps its own track)."""
+    pt = np.array([tables["plat_types"].index(x) for x in plat_types])
+    js = np.array([tables["jam_states"].index(x) for x in jam_states])
+
+    # advanced indices on both sides of the phase slice come first: [p, p', phase]
+    sender, receiver = np.ix_(np.arange(len(pt)), np.arange(len(pt)))
+    latency = tables["latency"][js[sender], js[receiver], :, pt[sender], pt[receiver]]
+    if distance is not None:
+        link_range = tables["range"][js[sender], js[receiver], :, pt[sender], pt[receiver]]
+        latency = np.where(link_range >= np.asarray(distance)[:, :, None], latency, np.inf)
+
+    latency = np.moveaxis(latency, 2, 0).copy()
+    diagonal = np.arange(len(pt))
+    latency[:, diagonal, diagonal] = 0
+    return latency
+
+
+def all_pairs_latency(latency):
+    """This function returns the minimum latency over all relay paths with a
+    Floyd-Warshall pass over the last two axes; any leading axes (phases,
+    jamming scenarios) are processed together."""
+    closure = np.array(latency, dtype=float, copy=True)
+    for k in range(closure.shape[-1]):
+        np.minimum(closure, closure[..., :, k, None] + closure[..., None, k, :], out=closure)
+    return closure
+
+
+def handoff_gaps(df, tables, jam_states=None, distance=None):
+    """This function returns the minimum handoff latency between consecutive
+    phases as an array gaps[phase_num, p, p'] (plat_num is 1-based, so row and
+    column 0 are unused): the time needed after phase_num ends on platform p
+    before phase_num + 1 can start on platform p'.
+    Arguments:
+        df: the big dataframe from KC_data_melt.create_big_dataframe
+        tables: dictionary from import_link_tables
+        jam_states: dictionary of jamming state indexed by Plat ID (default:
+            every platform permissive)
+        distance: optional [p, p'] matrix in km, in plat_num order"""
+    return scenario_handoff_gaps(df, tables, {None: jam_states}, distance)[None]
+
+
+def scenario_handoff_gaps(df, tables, scenarios, distance=None):
+    """This function computes handoff_gaps for several jamming scenarios at
+    once: the Floyd-Warshall pass runs over the stacked [scenario, phase, p, p']
+    array. scenarios is a dictionary of jam_states dictionaries (see
+    handoff_gaps) and the result is a dictionary of gaps arrays with the same
+    keys."""
+    platforms = df[["Plat_num", "Plat ID", "Plat Type"]].drop_duplicates().sort_values("Plat_num")
+    latency = []
+    for jam_states in scenarios.values():
+        if jam_states is None:
+            jam_states = {}
+        states = [jam_states.get(p, "permissive") for p in platforms["Plat ID"]]
+        latency.append(platform_latency(tables, list(platforms["Plat Type"]), states, distance))
+    closure = all_pairs_latency(np.stack(latency))
+
+    # reindex on phase_num and plat_num
+    num_platforms = int(platforms["Plat_num"].max())
+    gaps = np.full((len(scenarios), len(tables["phases"]) + 1, num_platforms + 1, num_platforms + 1), np.inf)
+    p = platforms["Plat_num"].to_numpy()
+    gaps[:, 1:, p[:, None], p[None, :]] = closure
+    return dict(zip(scenarios, gaps))
+
+
+def add_handoff_gaps(model, handles, gaps):
+    """This function adds the handoff latencies to a model built by
+    KC_model.flexible_targetshop_model. For every pair of consecutive phases of
+    a target and every alternative p of the first phase, the second phase
+    starts at least gaps[i, p, p'] after the first ends, where p' is the
+    platform selected for the second phase. Pairs of alternatives that cannot
+    communicate are forbidden. Returns the number of constraints added."""
+    alternatives = {}
+    for (t, i, p), presence in handles["presences"].items():
+        alternatives.setdefault((t, i), []).append((p, presence))
+
+    num_constraints = 0
+    for (t, i), senders in alternatives.items():
+        receivers = alternatives.get((t, i + 1))
+        if receivers is None:
+            continue
+        for p, x in senders:
+            latency = [gaps[i, p, q] for q, _ in receivers]
+            for (q, y), gap in zip(receivers, latency):
+                if np.isinf(gap):
+                    model.AddBoolOr([x.Not(), y.Not()])
+                    num_constraints += 1
+            if max((g for g in latency if not np.isinf(g)), default=0) <= 0:
+                continue  # the precedence constraint already covers it
+            setup = sum(int(np.ceil(g)) * y for (q, y), g in zip(receivers, latency)
+                        if not np.isinf(g) and g > 0)
+            model.Add(handles["starts"][(t, i + 1)] >= handles["ends"][(t, i)] + setup).OnlyEnforceIf(x)
+            num_constraints += 1
+
+    return num_constraints
+
+
+if __name__ == "__main__":
+    import time
+
+    f = "small_inputs_gmuV5.xlsx"  # enter the filename (path) for the data
+    df = KC_data_melt.create_big_dataframe(f)
+    tables = import_link_tables(f)
+
+    for state in tables["jam_states"]:
+        start_time = time.time()
+        jam_states = dict.fromkeys(df["Plat ID"], state)
+        gaps = handoff_gaps(df, tables, jam_states)
+        print('%-10s all-pairs latency in %.4f s, %i unreachable (phase, p, p\') pairs' %
+              (state, time.time() - start_time, np.isinf(gaps[1:, 1:, 1:]).sum()))
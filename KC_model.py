@@ -0,0 +1,427 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:30:00 2026
+
+Builds the CP-SAT flexible targetshop model from the big dataframe returned by
+KC_data_melt.create_big_dataframe. Each (target, phase) is a job shop task and
+each platform with a non-negative PLATPROCTIME is an alternative for it.
+
+Two encodings of the alternatives are available:
+    "reified": the encoding from the OR-Tools flexible_job_shop_sat example.
+        Every phase gets a start, duration and end variable and every
+        alternative gets its own start and end variables, linked to the phase
+        by three reified equalities.
+    "lean": every alternative shares the phase start variable, its end is the
+        affine expression start + duration, and the phase duration is picked
+        from the alternative durations with an element constraint. No reified
+        linking constraints are needed.
+
+With optional_targets, every target gets a "prosecuted" literal and each of
+its phases selects exactly one alternative when the target is prosecuted and
+none otherwise, so the solver may leave targets out of the plan (see
+KC_parameters for the target coverage constraint).
+"""
+
+from ortools.sat.python import cp_model
+import collections
+import collections.abc
+import operator
+import time
+import numpy as np
+
+formulations = ("reified", "lean")
+
+
+def compute_horizon(df):
+    """This function returns the scheduling horizon used for the domains of the
+    start and end variables: the sum over targets and platforms of the longest
+    phase processing time. Argument: df: the big dataframe"""
+    max_phase_duration = df.groupby(["Target_num", "Plat_num"])["PLATPROCTIME"].max()
+    return int(max_phase_duration.clip(lower=0).sum())
+
+
+def phase_alternatives(df):
+    """This function groups the rows of the big dataframe that can be scheduled
+    (PLATPROCTIME >= 0) by (target, phase). It returns a dictionary indexed by
+    (target_num, phase_num) whose values are tuples of (plat_num, duration)
+    sorted on plat_num."""
+    feasible = df[df["PLATPROCTIME"] >= 0]
+    feasible = feasible.sort_values(by=["Target_num", "Phase_num", "Plat_num"])
+
+    alternatives = collections.defaultdict(list)
+    for t, i, p, d in zip(feasible["Target_num"], feasible["Phase_num"],
+                          feasible["Plat_num"], feasible["PLATPROCTIME"]):
+        alternatives[(int(t), int(i))].append((int(p), int(d)))
+
+    return {key: tuple(value) for key, value in alternatives.items()}
+
+
+def operation_table(df):
+    """This function returns the operation table of the big dataframe: the
+    rows that can be scheduled (PLATPROCTIME >= 0) as a dictionary of parallel
+    int32 arrays, sorted on target_num, phase_num and plat_num.
+    Indexed by operation (a (target, phase) with its alternatives):
+        target, phase: target_num and phase_num
+        first, count: id of its first alternative and number of alternatives
+            (the alternatives of an operation are consecutive)
+        lb, ub: shortest and longest alternative duration
+    Indexed by alternative:
+        op: operation id
+        platform, duration: plat_num and PLATPROCTIME"""
+    feasible = df["PLATPROCTIME"].to_numpy() >= 0
+    t, i, p, d = (df[c].to_numpy()[feasible].astype(np.int32)
+                  for c in ("Target_num", "Phase_num", "Plat_num", "PLATPROCTIME"))
+    order = np.lexsort((p, i, t))
+    t, i, p, d = t[order], i[order], p[order], d[order]
+
+    new_op = np.r_[True, (t[1:] != t[:-1]) | (i[1:] != i[:-1])]
+    first = np.flatnonzero(new_op).astype(np.int32)
+    return {"target": t[first], "phase": i[first], "first": first,
+            "count": np.diff(np.r_[first, len(t)]).astype(np.int32),
+            "lb": np.minimum.reduceat(d, first) if len(d) else d,
+            "ub": np.maximum.reduceat(d, first) if len(d) else d,
+            "op": (np.cumsum(new_op) - 1).astype(np.int32),
+            "platform": p, "duration": d}
+
+
+class OperationView(collections.abc.Mapping):
+    """Read-only mapping from (target_num, phase_num) or (target_num,
+    phase_num, plat_num) keys to the entries of a flat list indexed by
+    operation or alternative id. The keys are kept as one sorted int64 code per
+    entry rather than as a tuple each."""
+
+    __slots__ = ("dims", "codes", "_values")
+
+    def __init__(self, columns, values):
+        self.dims = tuple(int(c.max()) + 1 if len(c) else 1 for c in columns)
+        self.codes = np.ravel_multi_index(tuple(np.asarray(c, dtype=np.int64) for c in columns),
+                                          self.dims)
+        self._values = values
+
+    def _position(self, key):
+        """Returns the position of key in the flat list, or raises KeyError."""
+        if not isinstance(key, tuple) or len(key) != len(self.dims):
+            raise KeyError(key)
+        code = 0
+        for k, n in zip(key, self.dims):
+            try:
+                k = operator.index(k)
+            except TypeError:
+                raise KeyError(key) from None
+            if not 0 <= k < n:
+                raise KeyError(key)
+            code = code * n + k
+        position = int(np.searchsorted(self.codes, code))
+        if position == len(self.codes) or self.codes[position] != code:
+            raise KeyError(key)
+        return position
+
+    def __getitem__(self, key):
+        return self._values[self._position(key)]
+
+    def __iter__(self):
+        return zip(*(c.tolist() for c in np.unravel_index(self.codes, self.dims)))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def items(self):
+        return zip(iter(self), self._values)
+
+
+def flexible_targetshop_model(df, formulation="reified", optional_targets=False):
+    """This function builds the flexible targetshop model and returns the model
+    together with a dictionary holding the handles to its variables.
+    Arguments:
+        df: the big dataframe from KC_data_melt.create_big_dataframe
+        formulation: "reified" or "lean" (see the module docstring)
+        optional_targets: if True, the targets may be left unprosecuted (see
+            the module docstring); a target that a phase cannot be scheduled
+            for is then left out instead of raising ValueError
+    The model is built from the int32 arrays of operation_table and its
+    variables are kept in flat lists indexed by operation or alternative id:
+        operations: the operation table
+        op_starts, op_durations, op_ends: start variable, duration variable
+            (or constant) and end variable or expression of every operation
+        alt_presences, alt_intervals: presence literal and interval variable
+            of every alternative
+    The same variables are available by key through OperationView mappings:
+        starts, durations, ends: indexed by (target_num, phase_num)
+        presences, intervals: indexed by (target_num, phase_num, plat_num)
+    and the handles dictionary also contains:
+        horizon: upper bound used for the start and end variables
+        intervals_per_resources: list of intervals indexed by plat_num
+        target_ends: end of the last phase indexed by target_num
+        makespan: the makespan variable, which is minimized (the latest end of
+            the prosecuted targets with optional_targets)
+        prosecuted: with optional_targets, the prosecuted literal indexed by
+            target_num
+        unserved: with optional_targets, the (target_num, phase_num) that no
+            platform can do"""
+    if formulation not in formulations:
+        raise ValueError("formulation must be one of %s, not %r" % (formulations, formulation))
+
+    model = cp_model.CpModel()
+    horizon = compute_horizon(df)
+    table = operation_table(df)
+
+    all_targets = sorted(set(int(t) for t in df["Target_num"]))
+    all_phases = sorted(set(int(i) for i in df["Phase_num"]))
+    present = set(zip(table["target"].tolist(), table["phase"].tolist()))
+    missing = [(t, i) for t in all_targets for i in all_phases if (t, i) not in present]
+    if missing and not optional_targets:
+        raise ValueError("no platform can do the (target_num, phase_num) %s" % missing)
+
+    # Global storage of variables, indexed by operation or alternative id.
+    num_ops, num_alts = len(table["target"]), len(table["op"])
+    handles = {"horizon": horizon,
+               "operations": table,
+               "op_starts": [None] * num_ops,
+               "op_durations": [None] * num_ops,
+               "op_ends": [None] * num_ops,
+               "alt_presences": [None] * num_alts,
+               "alt_intervals": [None] * num_alts,
+               "intervals_per_resources": collections.defaultdict(list),
+               "target_ends": {}}  # indexed by target_id.
+    prosecuted = {}
+    if optional_targets:
+        prosecuted = {t: model.NewBoolVar('prosecuted_tgt%i' % t) for t in all_targets}
+        for t in sorted(set(t for t, _ in missing)):
+            model.Add(prosecuted[t] == 0)
+        handles["prosecuted"] = prosecuted
+        handles["unserved"] = missing
+
+    add_phase = _add_phase_reified if formulation == "reified" else _add_phase_lean
+
+    # Scan the operations (sorted on target and phase) and create the
+    # relevant variables and intervals.
+    platform, duration = table["platform"].tolist(), table["duration"].tolist()
+    previous_target, previous_end = None, None
+    for op, (target_id, phase_id, first, count) in enumerate(zip(
+            table["target"].tolist(), table["phase"].tolist(),
+            table["first"].tolist(), table["count"].tolist())):
+        alts = range(first, first + count)
+        phase = [(platform[a], duration[a]) for a in alts]
+        start, end = add_phase(model, handles, op, alts, target_id, phase_id, phase,
+                               prosecuted.get(target_id))
+
+        # Add precedence with previous phase in the same target.
+        if target_id == previous_target:
+            model.Add(start >= previous_end)
+        previous_target, previous_end = target_id, end
+        handles["target_ends"][target_id] = end
+
+    handles["starts"] = OperationView((table["target"], table["phase"]), handles["op_starts"])
+    handles["durations"] = OperationView((table["target"], table["phase"]), handles["op_durations"])
+    handles["ends"] = OperationView((table["target"], table["phase"]), handles["op_ends"])
+    alt_keys = (table["target"][table["op"]], table["phase"][table["op"]], table["platform"])
+    handles["presences"] = OperationView(alt_keys, handles["alt_presences"])
+    handles["intervals"] = OperationView(alt_keys, handles["alt_intervals"])
+
+    # Create platforms constraints.
+    for intervals in handles["intervals_per_resources"].values():
+        if len(intervals) > 1:
+            model.AddNoOverlap(intervals)
+
+    # Makespan objective
+    makespan = model.NewIntVar(0, horizon, 'makespan')
+    if optional_targets:
+        for target_id, end in handles["target_ends"].items():
+            model.Add(makespan >= end).OnlyEnforceIf(prosecuted[target_id])
+    else:
+        model.AddMaxEquality(makespan, list(handles["target_ends"].values()))
+    model.Minimize(makespan)
+    handles["makespan"] = makespan
+
+    return model, handles
+
+
+def solution_schedule(solver, handles):
+    """Returns the schedule of a solution (solver, or solution callback) as a
+    sorted list of (target_num, phase_num, plat_num, start, end) rows, read
+    from the flat handles of flexible_targetshop_model (or from the mappings,
+    for handles imported from a model exported without them)."""
+    if "operations" not in handles:
+        return sorted((t, i, p, solver.Value(handles["starts"][(t, i)]),
+                       solver.Value(handles["ends"][(t, i)]))
+                      for (t, i, p), presence in handles["presences"].items()
+                      if solver.BooleanValue(presence))
+    table = handles["operations"]
+    op_starts, op_ends = handles["op_starts"], handles["op_ends"]
+    rows = []
+    for alt, (op, p, presence) in enumerate(zip(table["op"].tolist(), table["platform"].tolist(),
+                                                 handles["alt_presences"])):
+        if solver.BooleanValue(presence):
+            rows.append((int(table["target"][op]), int(table["phase"][op]), p,
+                         solver.Value(op_starts[op]), solver.Value(op_ends[op])))
+    return rows
+
+
+def _add_phase_reified(model, handles, op, alts, target_id, phase_id, phase, prosecuted=None):
+    """Adds one phase with the alternative encoding of the OR-Tools example and
+    returns its (start, end) variables. With a prosecuted literal, the phase
+    is only scheduled when the literal is true."""
+    horizon = handles["horizon"]
+
+    # Create main interval for the phase.
+    domain = cp_model.Domain.FromValues([d for _, d in phase])
+    suffix_name = '_tgt%i_phase%i' % (target_id, phase_id)
+    start = model.NewIntVar(0, horizon, 'start' + suffix_name)
+    duration = model.NewIntVarFromDomain(domain, 'duration' + suffix_name)
+    end = model.NewIntVar(0, horizon, 'end' + suffix_name)
+    if prosecuted is None:
+        interval = model.NewIntervalVar(start, duration, end, 'interval' + suffix_name)
+    else:
+        interval = model.NewOptionalIntervalVar(start, duration, end, prosecuted,
+                                                'interval' + suffix_name)
+
+    handles["op_starts"][op] = start
+    handles["op_durations"][op] = duration
+    handles["op_ends"][op] = end
+
+    # Create alternative intervals.
+    if len(phase) > 1:
+        l_presences = []
+        for alt, (alt_id, l_duration) in zip(alts, phase):
+            alt_suffix = '_tgt%i_phase%i_plat%i' % (target_id, phase_id, alt_id)
+            l_presence = model.NewBoolVar('presence' + alt_suffix)
+            l_start = model.NewIntVar(0, horizon, 'start' + alt_suffix)
+            l_end = model.NewIntVar(0, horizon, 'end' + alt_suffix)
+            l_interval = model.NewOptionalIntervalVar(
+                l_start, l_duration, l_end, l_presence, 'interval' + alt_suffix)
+            l_presences.append(l_presence)
+
+            # Link the primary/global variables with the local ones.
+            model.Add(start == l_start).OnlyEnforceIf(l_presence)
+            model.Add(duration == l_duration).OnlyEnforceIf(l_presence)
+            model.Add(end == l_end).OnlyEnforceIf(l_presence)
+
+            # Add the local interval to the right platform.
+            handles["intervals_per_resources"][alt_id].append(l_interval)
+            handles["alt_presences"][alt] = l_presence
+            handles["alt_intervals"][alt] = l_interval
+
+        # Select exactly one presence variable (if prosecuted).
+        _add_selection(model, l_presences, prosecuted)
+    elif len(phase) == 1:
+        alt_id = phase[0][0]
+        handles["intervals_per_resources"][alt_id].append(interval)
+        handles["alt_presences"][alts[0]] = model.NewConstant(1) if prosecuted is None else prosecuted
+        handles["alt_intervals"][alts[0]] = interval
+
+    return start, end
+
+
+def _add_phase_lean(model, handles, op, alts, target_id, phase_id, phase, prosecuted=None):
+    """Adds one phase with the lean alternative encoding and returns its
+    (start, end). The end is the expression start + duration. With a
+    prosecuted literal, the phase is only scheduled when the literal is true."""
+    horizon = handles["horizon"]
+    suffix_name = '_tgt%i_phase%i' % (target_id, phase_id)
+    start = model.NewIntVar(0, horizon, 'start' + suffix_name)
+    handles["op_starts"][op] = start
+
+    if len(phase) == 1:
+        alt_id, duration = phase[0]
+        if prosecuted is None:
+            presence = model.NewConstant(1)
+            interval = model.NewFixedSizeIntervalVar(start, duration, 'interval' + suffix_name)
+        else:
+            presence = prosecuted
+            interval = model.NewOptionalFixedSizeIntervalVar(start, duration, prosecuted,
+                                                             'interval' + suffix_name)
+        handles["intervals_per_resources"][alt_id].append(interval)
+        handles["alt_presences"][alts[0]] = presence
+        handles["alt_intervals"][alts[0]] = interval
+    else:
+        # The chosen alternative is the index into the list of durations.
+        l_durations = [d for _, d in phase]
+        alt_index = model.NewIntVar(0, max(len(phase) - 1, 0), 'alt' + suffix_name)
+        duration = model.NewIntVarFromDomain(
+            cp_model.Domain.FromValues(l_durations), 'duration' + suffix_name)
+        model.AddElement(alt_index, l_durations, duration)
+
+        l_presences = []
+        for alt, (alt_id, l_duration) in zip(alts, phase):
+            alt_suffix = '_tgt%i_phase%i_plat%i' % (target_id, phase_id, alt_id)
+            l_presence = model.NewBoolVar('presence' + alt_suffix)
+            l_interval = model.NewOptionalFixedSizeIntervalVar(
+                start, l_duration, l_presence, 'interval' + alt_suffix)
+            l_presences.append(l_presence)
+
+            handles["intervals_per_resources"][alt_id].append(l_interval)
+            handles["alt_presences"][alt] = l_presence
+            handles["alt_intervals"][alt] = l_interval
+
+        # Select exactly one presence variable (if prosecuted) and tie it to
+        # the element index.
+        _add_selection(model, l_presences, prosecuted)
+        model.Add(alt_index == sum(k * l for k, l in enumerate(l_presences)))
+
+    end = start + duration
+    handles["op_durations"][op] = duration
+    handles["op_ends"][op] = end
+
+    return start, end
+
+
+def _add_selection(model, l_presences, prosecuted):
+    """Selects exactly one of the alternative presences, or, with a prosecuted
+    literal, one if the target is prosecuted and none otherwise."""
+    if prosecuted is None:
+        model.AddExactlyOne(l_presences)
+    else:
+        model.Add(sum(l_presences) == prosecuted)
+
+
+def model_size(model):
+    """This function returns a dictionary with the number of variables,
+    constraints and intervals of a model, and its size in bytes when serialized."""
+    proto = model.Proto()
+    num_intervals = sum(1 for c in proto.constraints if c.WhichOneof("constraint") == "interval")
+
+    return {"variables": len(proto.variables),
+            "constraints": len(proto.constraints) - num_intervals,
+            "intervals": num_intervals,
+            "bytes": proto.ByteSize()}
+
+
+def benchmark_formulations(df, max_time_in_seconds=30.0, num_workers=8):
+    """This function builds and solves the model once per formulation and
+    returns a list with one dictionary of results per formulation: build time,
+    model size, solve time, status, makespan and best bound."""
+    results = []
+    for formulation in formulations:
+        build_start = time.time()
+        model, handles = flexible_targetshop_model(df, formulation=formulation)
+        build_time = time.time() - build_start
+
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = max_time_in_seconds
+        solver.parameters.num_workers = num_workers
+        status = solver.Solve(model)
+
+        result = {"formulation": formulation, "build_time": build_time}
+        result.update(model_size(model))
+        result.update({"solve_time": solver.WallTime(),
+                       "status": solver.StatusName(status),
+                       "makespan": solver.ObjectiveValue(),
+                       "best_bound": solver.BestObjectiveBound()})
+        results.append(result)
+
+    return results
+
+
+if __name__ == "__main__":
+    import KC_data_melt
+
+    f = "small_inputs_gmuV5.xlsx"  # enter the filename (path) for the data
+    df = KC_data_melt.create_big_dataframe(f)
+
+    for result in benchmark_formulations(df):
+        print('%-8s build %6.3f s | vars %6i | cons %6i | intervals %6i | %8i bytes | '
+              'solve %6.2f s | %-8s | makespan %6i | bound %6i' %
+              (result["formulation"], result["build_time"], result["variables"],
+               result["constraints"], result["intervals"], result["bytes"],
+               result["solve_time"], result["status"], result["makespan"],
+               result["best_bound"]))
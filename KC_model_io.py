@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 19:10:00 2026
+
+Export and import of built CP-SAT models.
+
+A model is written as its CpModelProto, binary by default or in text format
+when the file name ends with ".txt" (as CpModel.ExportToFile does; a binary
+proto opened in an editor looks like gibberish, which is why queens.lp is not
+readable). Next to it a JSON manifest is written that maps the handles of the
+model (the dictionaries of variables returned by the model builders) to
+variable and constraint indices in the proto, together with the variable
+names and any metadata. A later solve imports both files and gets the model
+and its handles back without loading the data or building the model;
+load_or_build only does so when the stored metadata matches, and rebuilds a
+model exported for other options or data.
+"""
+
+import hashlib
+import json
+import os
+import numpy as np
+from google.protobuf import text_format
+from ortools.sat.python import cp_model
+import KC_model
+
+
+def manifest_path(path):
+    """Returns the name of the manifest written next to a model file."""
+    return os.path.splitext(path)[0] + ".manifest.json"
+
+
+def _proto_digest(proto):
+    """Returns a hash of the serialized proto, stored in the manifest to
+    check that the model and manifest files belong together."""
+    return hashlib.sha1(proto.SerializeToString(deterministic=True)).hexdigest()
+
+
+def _encode(value):
+    """Encodes a handle (variable, interval, linear expression, number,
+    string, numpy array, or a dict/list/tuple/KC_model.OperationView of those)
+    into JSON-compatible values."""
+    if isinstance(value, cp_model.IntervalVar):
+        return {"interval": value.Index()}
+    if isinstance(value, cp_model.IntVar):
+        return {"var": value.Index()}
+    if isinstance(value, cp_model._NotBooleanVariable):
+        return {"not": value.Not().Index()}
+    if isinstance(value, cp_model.LinearExpr):
+        coeffs, offset = value.GetIntegerVarValueMap()
+        return {"expr": [[var.Index(), int(coeff)] for var, coeff in coeffs.items()],
+                "offset": int(offset)}
+    if isinstance(value, KC_model.OperationView):
+        return {"view": [list(value.dims), value.codes.tolist(), _encode(value._values)]}
+    if isinstance(value, dict):
+        return {"dict": [[_encode(k), _encode(v)] for k, v in value.items()]}
+    if isinstance(value, np.ndarray):
+        return {"array": value.tolist(), "dtype": value.dtype.str}
+    if isinstance(value, (list, tuple)):
+        return {"tuple" if isinstance(value, tuple) else "list": [_encode(v) for v in value]}
+    if hasattr(value, "item"):  # numpy scalar
+        return value.item()
+    return value
+
+
+def _decode(model, value):
+    """Rebuilds a handle encoded by _encode on the variables of model."""
+    if not isinstance(value, dict):
+        return value
+    if "var" in value:
+        return model.GetIntVarFromProtoIndex(value["var"])
+    if "not" in value:
+        return model.GetBoolVarFromProtoIndex(value["not"]).Not()
+    if "interval" in value:
+        return model.GetIntervalVarFromProtoIndex(value["interval"])
+    if "expr" in value:
+        terms = value["expr"]
+        return cp_model.LinearExpr.WeightedSum(
+            [model.GetIntVarFromProtoIndex(index) for index, _ in terms],
+            [coeff for _, coeff in terms]) + value["offset"]
+    if "view" in value:
+        dims, codes, values = value["view"]
+        return KC_model.OperationView(np.unravel_index(np.array(codes, dtype=np.int64), dims),
+                                      _decode(model, values))
+    if "dict" in value:
+        return {_decode(model, k): _decode(model, v) for k, v in value["dict"]}
+    if "array" in value:
+        return np.array(value["array"], dtype=value["dtype"])
+    if "tuple" in value:
+        return tuple(_decode(model, v) for v in value["tuple"])
+    return [_decode(model, v) for v in value["list"]]
+
+
+def export_model(model, handles, path, metadata=None):
+    """This function writes the model proto to path (text format if path ends
+    with ".txt", binary otherwise) and the manifest of its handles to
+    manifest_path(path).
+    Arguments:
+        model: the CpModel
+        handles: dictionary of variable handles returned with the model
+        path: file name of the model
+        metadata: optional JSON-compatible dictionary stored in the manifest"""
+    proto = model.Proto()
+    if path.endswith(".txt"):
+        with open(path, "w") as file:
+            file.write(text_format.MessageToString(proto))
+    else:
+        with open(path, "wb") as file:
+            file.write(proto.SerializeToString(deterministic=True))
+
+    manifest = {"model": os.path.basename(path),
+                "digest": _proto_digest(proto),
+                "num_variables": len(proto.variables),
+                "num_constraints": len(proto.constraints),
+                "variables": {v.name: k for k, v in enumerate(proto.variables) if v.name},
+                "handles": _encode(handles),
+                "metadata": metadata or {}}
+    with open(manifest_path(path), "w") as file:
+        json.dump(manifest, file)
+
+
+def import_model(path):
+    """This function reads a model written by export_model and returns the
+    CpModel, the handles dictionary and the metadata. Raises ValueError if the
+    manifest does not belong to the model file."""
+    model = cp_model.CpModel()
+    if path.endswith(".txt"):
+        with open(path) as file:
+            text_format.Parse(file.read(), model.Proto())
+    else:
+        with open(path, "rb") as file:
+            model.Proto().ParseFromString(file.read())
+
+    with open(manifest_path(path)) as file:
+        manifest = json.load(file)
+    if manifest["digest"] != _proto_digest(model.Proto()):
+        raise ValueError("the manifest %s does not match the model %s" % (manifest_path(path), path))
+
+    return model, _decode(model, manifest["handles"]), manifest["metadata"]
+
+
+def load_or_build(path, build, metadata=None):
+    """Imports the model from path if it exists and was exported with the same
+    metadata (the options and data it was built from); otherwise calls build(),
+    which returns (model, handles), exports the result to path (replacing a
+    stale file) and returns it. Returns the model, the handles and True if the
+    model was imported."""
+    if path is not None and os.path.exists(path) and os.path.exists(manifest_path(path)):
+        with open(manifest_path(path)) as file:
+            stored = json.load(file).get("metadata")
+        # compared through JSON, as stored (tuples become lists)
+        if stored == json.loads(json.dumps(metadata or {})):
+            model, handles, _ = import_model(path)
+            return model, handles, True
+    model, handles = build()
+    if path is not None:
+        export_model(model, handles, path, metadata)
+    return model, handles, False
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    # solve an exported flexible targetshop model without the data:
+    # python KC_model_io.py model.pb [max_time_in_seconds]
+    path = sys.argv[1] if len(sys.argv) > 1 else "flexible_targetshop.pb"
+    if not os.path.exists(path):
+        import KC_data_stack
+        df = KC_data_stack.create_big_dataframe("small_inputs_gmuV5.xlsx")
+        model, handles = KC_model.flexible_targetshop_model(df, formulation="lean")
+        export_model(model, handles, path, {"formulation": "lean"})
+        print('exported %s (%i bytes) and %s' % (path, os.path.getsize(path), manifest_path(path)))
+
+    start_time = time.time()
+    model, handles, metadata = import_model(path)
+    print('imported %s in %.3f s: %s' % (path, time.time() - start_time, metadata))
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+    status = solver.Solve(model)
+    print('Solve status: %s, makespan %s' % (solver.StatusName(status),
+          solver.Value(handles["makespan"]) if status in (cp_model.OPTIMAL, cp_model.FEASIBLE) else None))
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:05:00 2026
+
+Multi-objective solves of the flexible targetshop model built by KC_model.
+
+Besides the makespan, the following objectives can be added to the model:
+    uncovered: with optional targets (KC_model optional_targets), the sum of
+        the Target Priority of the targets that are not prosecuted
+    weighted_completion: sum over targets of Target Priority * end of the
+        last phase (priority defaults to 1 when the workbook has no
+        "Target Priority" column)
+    platforms: number of platforms that perform at least one phase
+    weapons: weapons expended in the Engage phase. When the weapon allocation
+        layer of KC_weapons is in the model these are the shots of the chosen
+        weapons; otherwise each (target, platform) costs the fewest shots
+        required by any weapon type the platform type carries
+        (inp_WpnLoadout, wpns_shots_reqd)
+
+In lexicographic mode the objectives are solved in sequence. Each stage is
+warm started with the previous stage's solution as a hint and the previous
+objectives are bounded by the values reached, so no stage starts from scratch.
+In weighted mode the weighted sum of the objectives is minimized in one solve.
+
+add_coverage_objective gives the optional target mode its objective for a
+single solve: the priority-weighted prosecuted targets are maximized, then the
+makespan is minimized. Both are folded into one integer objective whose weight
+on the uncovered priority exceeds any makespan, so the order is exact, and the
+plan that prosecutes no target is feasible: an overloaded scenario returns
+partial plans from the first seconds instead of an infeasibility proof.
+"""
+
+from ortools.sat.python import cp_model
+import numpy as np
+import KC_weapons
+
+objective_names = ("uncovered", "makespan", "weighted_completion", "platforms", "weapons")
+
+
+def engage_weapon_cost(df, df_wt):
+    """This function returns the number of weapons expended when a platform
+    engages a target, as a dictionary indexed by (target_num, plat_num). The
+    cost is the smallest number of shots required against the target type over
+    the weapon types with a positive loadout on the platform type; it is 0 when
+    the platform carries no weapon with a shots-required value.
+    Arguments:
+        df: the big dataframe from KC_data_melt.create_big_dataframe
+        df_wt: the weapon dataframe from KC_data_melt.import_weapon_data"""
+    engage = df[df["Phase"] == "Engage"]
+    weapon_types = list(df_wt["Weapon Type"])
+    target_types = sorted(set(engage["Target Type"]))
+
+    # shots[wt, tt] and loadout[row, wt], NaN where a weapon cannot be used
+    shots = df_wt.set_index("Weapon Type")[target_types].to_numpy(dtype=float)
+    tt_index = np.array([target_types.index(tt) for tt in engage["Target Type"]], dtype=int)
+    loadout = engage[weapon_types].to_numpy(dtype=float)
+
+    shots_per_row = shots[:, tt_index].T  # one row per (t, p), one column per wt
+    usable = (loadout > 0) & ~np.isnan(shots_per_row)
+    cost = np.where(usable, shots_per_row, np.inf).min(axis=1)
+    cost[np.isinf(cost)] = 0
+
+    return {(int(t), int(p)): int(c) for t, p, c in
+            zip(engage["Target_num"], engage["Plat_num"], cost)}
+
+
+def add_objective_terms(model, handles, df, df_wt):
+    """This function adds the variables needed by the secondary objectives to
+    the model and returns a dictionary of linear expressions indexed by the
+    names in objective_names. The platform usage literals are stored in
+    handles["platform_used"], indexed by plat_num."""
+    terms = {"makespan": handles["makespan"]}
+    priority = target_priorities(df)
+
+    # priority of the targets left out, with optional targets
+    if "prosecuted" in handles:
+        terms["uncovered"] = uncovered_priority(handles, priority)
+
+    # weighted completion of the targets
+    terms["weighted_completion"] = sum(
+        int(priority[t]) * end for t, end in handles["target_ends"].items())
+
+    # platforms committed: used[p] is true if any alternative on p is selected
+    used = {}
+    for (t, i, p), presence in handles["presences"].items():
+        if p not in used:
+            used[p] = model.NewBoolVar('used_plat%i' % p)
+        model.AddImplication(presence, used[p])
+    handles["platform_used"] = used
+    terms["platforms"] = sum(used.values())
+
+    # weapons expended in the Engage phase, from the weapon allocation layer
+    # (KC_weapons) when it was added to the model
+    if "weapon_choices" in handles:
+        terms["weapons"] = KC_weapons.weapons_expended(handles)
+    else:
+        engage_id = next(i for i, name in _phase_names(df).items() if name == "Engage")
+        cost = engage_weapon_cost(df, df_wt)
+        terms["weapons"] = sum(
+            cost[(t, p)] * presence for (t, i, p), presence in handles["presences"].items()
+            if i == engage_id and cost.get((t, p), 0) > 0)
+
+    return terms
+
+
+def target_priorities(df):
+    """This function returns the Target Priority of every target as a
+    dictionary of integers indexed by target_num (1 when the workbook has no
+    "Target Priority" column)."""
+    priority = dict.fromkeys((int(t) for t in df["Target_num"].unique()), 1)
+    if "Target Priority" in df.columns:
+        priority.update((int(t), int(p)) for t, p in
+                        df.groupby("Target_num")["Target Priority"].first().items())
+    return priority
+
+
+def uncovered_priority(handles, priority):
+    """Returns the linear expression of the priority of the targets that are
+    not prosecuted, for a model built with optional_targets."""
+    prosecuted = handles["prosecuted"]
+    return (sum(priority[t] for t in prosecuted) -
+            sum(priority[t] * literal for t, literal in prosecuted.items()))
+
+
+def add_coverage_objective(model, handles, priority):
+    """This function sets the objective of a model built with optional_targets
+    (see the module docstring): minimize weight * uncovered + makespan, with
+    weight = horizon + 1 > makespan. The prosecuted literals are hinted true,
+    so the search starts from the plan that covers every target. The
+    uncovered expression and the weight are stored in handles["uncovered"]
+    and handles["coverage_weight"].
+    Arguments:
+        priority: Target Priority indexed by target_num (target_priorities)"""
+    uncovered = uncovered_priority(handles, priority)
+    weight = handles["horizon"] + 1
+    model.Minimize(weight * uncovered + handles["makespan"])
+    for literal in handles["prosecuted"].values():
+        model.AddHint(literal, 1)
+    handles["uncovered"] = uncovered
+    handles["coverage_weight"] = weight
+    return uncovered
+
+
+def split_coverage_objective(objective, handles):
+    """Returns the (uncovered priority, makespan) of an objective value of
+    add_coverage_objective."""
+    return divmod(int(round(objective)), handles["coverage_weight"])
+
+
+def _phase_names(df):
+    """Returns a dictionary of phase names indexed by phase number."""
+    phases = df[["Phase_num", "Phase"]].drop_duplicates()
+    return dict(zip(phases["Phase_num"], phases["Phase"]))
+
+
+def _new_solver(max_time_in_seconds, num_workers):
+    """Returns a CpSolver with the given limits (None leaves the default)."""
+    solver = cp_model.CpSolver()
+    if max_time_in_seconds is not None:
+        solver.parameters.max_time_in_seconds = max_time_in_seconds
+    if num_workers is not None:
+        solver.parameters.num_workers = num_workers
+    return solver
+
+
+def _hint_solution(model, solution):
+    """Replaces the hints of the model with a full solution (one value per
+    variable, as in CpSolverResponse.solution)."""
+    model.ClearHints()
+    hint = model.Proto().solution_hint
+    hint.vars.extend(range(len(solution)))
+    hint.values.extend(solution)
+
+
+def solve_lexicographic(model, terms, order=objective_names,
+                        max_time_in_seconds=None, num_workers=8):
+    """This function minimizes the objectives in the given order. After each
+    stage the objective is bounded by the value reached and the solution is
+    passed to the next stage as a hint. It stops at the first stage that finds
+    no solution. The objectives that are not in terms are skipped.
+    Arguments:
+        model: the CpModel (bound constraints are added to it)
+        terms: dictionary of objective expressions from add_objective_terms
+        order: names of the objectives, most important first
+        max_time_in_seconds: time limit per stage
+        num_workers: number of search workers
+    Returns the solver of the last stage that found a solution (None if the
+    first stage fails) and a list with one dictionary per stage holding the
+    stage name, status, wall time and the value of every objective."""
+    best_solver = None
+    results = []
+    for name in order:
+        if name not in terms:
+            continue
+        model.Minimize(terms[name])
+        solver = _new_solver(max_time_in_seconds, num_workers)
+        status = solver.Solve(model)
+
+        result = {"stage": name, "status": solver.StatusName(status),
+                  "wall_time": solver.WallTime()}
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            results.append(result)
+            break
+        result.update({n: solver.Value(terms[n]) for n in terms})
+        results.append(result)
+        best_solver = solver
+
+        # keep the value reached and start the next stage from this solution
+        model.Add(terms[name] <= result[name])
+        _hint_solution(model, solver.ResponseProto().solution)
+
+    return best_solver, results
+
+
+def solve_weighted(model, terms, weights=None, max_time_in_seconds=None, num_workers=8):
+    """This function minimizes the weighted sum of the objectives in one solve.
+    Arguments:
+        weights: dictionary of integer weights indexed by objective name;
+            objectives that are not listed are ignored (default: 1 for all)
+    Returns the solver and a list with one result dictionary, in the same
+    format as solve_lexicographic."""
+    if weights is None:
+        weights = {name: 1 for name in terms}
+    model.Minimize(sum(w * terms[name] for name, w in weights.items()))
+    solver = _new_solver(max_time_in_seconds, num_workers)
+    status = solver.Solve(model)
+
+    result = {"stage": "weighted", "status": solver.StatusName(status),
+              "wall_time": solver.WallTime()}
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        result.update({n: solver.Value(terms[n]) for n in terms})
+        return solver, [result]
+    return None, [result]
+
+
+def print_tradeoff(results):
+    """Prints one line per stage with the value of every objective."""
+    names = [n for n in objective_names if any(n in r for r in results)]
+    print('%-20s %-10s %8s ' % ("stage", "status", "time (s)") +
+          ' '.join('%20s' % n for n in names))
+    for r in results:
+        print('%-20s %-10s %8.2f ' % (r["stage"], r["status"], r["wall_time"]) +
+              ' '.join('%20s' % r.get(n, "-") for n in names))
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 20 05:00:00 2026
+
+Model parameters read from the workbook, and the limits they put on the model.
+
+KC_data_melt.define_parameters gives three parameters, set by hand, and the
+other limits of the workbook are not used. Here the Control sheet is read into
+a typed config (read_control):
+    max_horizon_days (float) and max_horizon_min (int): Max Time Horizon
+    same_plat_for_Track_phases, max_eng_wins_btw_find_engage (int): as in
+        define_parameters
+and completed with the limits of the other sheets (model_limits), as arrays:
+    max_loadouts[plat_num]: Max loadouts expended per platform
+        (inp_PlatformDetail), -1 for no limit; a loadout is the weapons of
+        inp_WpnLoadout, so the limit scales the weapons a platform may expend
+        in KC_weapons.add_weapon_allocation
+    min_fraction[w], max_fraction[w]: Min and Max Fraction of Targets of the
+        weapon types (inp_WpnType), the targets engaged with each of them
+    target_coverage: the fraction of the targets that must be prosecuted
+add_limits compiles the others into linear constraints on a model built by
+KC_model.flexible_targetshop_model: a bound on the makespan, one count of
+weapon choice literals per weapon type with a fraction of targets, and the
+count of prosecuted targets for the target coverage.
+Two limits of the workbook are not read, since the model already enforces
+them: the "shared capacity phases" of the Control sheet (the model puts all
+the phases of a platform in one NoOverlap, so any group of them shares its
+capacity) and the Max Plats Engage of inp_TargetType (the model selects one
+platform per phase).
+A target coverage below 1 needs a model built with optional_targets: the
+targets to prosecute are then picked by the solver, so a scenario that cannot
+be served in full is still solved quickly instead of being infeasible.
+"""
+
+import fractions
+import math
+import warnings
+import numpy as np
+import pandas as pd
+
+# Control sheet label: (config key, type)
+control_labels = {
+    "Max Time Horizon (days)": ("max_horizon_days", float),
+    "Use same plat for Track Phases?": ("same_plat_for_Track_phases", int),
+    "Max eng wins btw Find & Engagement": ("max_eng_wins_btw_find_engage", int)}
+minutes_per_day = 1440
+
+
+def read_control(f):
+    """This function reads the Control sheet into the typed config described
+    in the module docstring. It holds the keys of
+    KC_data_melt.define_parameters, so it can be used in its place.
+    Argument: filename (path) of the excel file"""
+    warnings.simplefilter(action="ignore", category=UserWarning)
+    sheet = pd.read_excel(f, sheet_name="Control", header=None, usecols="A:B")
+    labels = [str(label).strip() if isinstance(label, str) else None for label in sheet[0]]
+
+    control = {}
+    for label, (key, kind) in control_labels.items():
+        if label not in labels or pd.isna(sheet.iat[labels.index(label), 1]):
+            raise ValueError("no value for %r in the Control sheet of %s" % (label, f))
+        control[key] = kind(sheet.iat[labels.index(label), 1])
+    control["max_horizon_min"] = int(round(control["max_horizon_days"] * minutes_per_day))
+    return control
+
+
+def model_limits(control, df, df_wt=None, target_coverage=1.0):
+    """This function returns the limits of a scenario (see the module
+    docstring): the config of read_control completed with the limit arrays.
+    Arguments:
+        control: the config of read_control
+        df: the big dataframe
+        df_wt: the weapon dataframe from KC_data_melt.import_weapon_data, for
+            the fractions of targets per weapon type (optional)
+        target_coverage: fraction of the targets that must be prosecuted"""
+    limits = dict(control)
+    limits["target_coverage"] = float(target_coverage)
+
+    plats = df.drop_duplicates("Plat_num")
+    limits["max_loadouts"] = np.full(int(df["Plat_num"].max()) + 1, -1, dtype=np.int32)
+    limits["max_loadouts"][plats["Plat_num"].to_numpy()] = \
+        plats["Max loadouts expended per platform"].fillna(-1).to_numpy(dtype=np.int32)
+
+    if df_wt is not None:
+        limits["weapon_types"] = tuple(df_wt["Weapon Type"])
+        limits["min_fraction"] = df_wt["Min Fraction of Targets"].fillna(0).to_numpy(dtype=float)
+        limits["max_fraction"] = df_wt["Max Fraction of Targets"].fillna(1).to_numpy(dtype=float)
+    return limits
+
+
+def add_limits(model, handles, limits):
+    """This function adds the limits of model_limits to a model built by
+    KC_model.flexible_targetshop_model (with its weapon allocation layer for
+    the fractions of targets per weapon type) and returns the number of
+    constraints added per limit. The constraints are:
+        horizon: the makespan is at most max_horizon_min
+        weapon_fractions: the number of targets engaged with each weapon type
+            is between min_fraction and max_fraction of the (prosecuted)
+            targets
+        coverage: see add_target_coverage
+    The loadouts expended per platform are metered in weapons, so they are
+    passed to the weapon allocation layer instead
+    (KC_weapons.add_weapon_allocation with max_loadouts)."""
+    added = {}
+
+    added["horizon"] = 0
+    if limits["max_horizon_min"] < handles["horizon"]:
+        model.Add(handles["makespan"] <= limits["max_horizon_min"])
+        added["horizon"] = 1
+
+    added["weapon_fractions"] = _add_weapon_fractions(model, handles, limits)
+    added["coverage"] = add_target_coverage(model, handles, limits["target_coverage"])
+    return added
+
+
+def _add_weapon_fractions(model, handles, limits):
+    """Adds the Min and Max Fraction of Targets of the weapon types and returns
+    the number of constraints added. A fraction is kept exact as a ratio of
+    integers (den * engaged >= num * targets)."""
+    if "weapon_types" not in limits:
+        return 0
+    active = (limits["min_fraction"] > 0) | (limits["max_fraction"] < 1)
+    if not active.any():
+        return 0
+    if "weapon_choices" not in handles:
+        raise ValueError("the fractions of targets of %s need the weapon allocation layer "
+                         "(KC_weapons.add_weapon_allocation)" %
+                         [wt for wt, a in zip(limits["weapon_types"], active) if a])
+
+    keys = list(handles["weapon_choices"])
+    choices = list(handles["weapon_choices"].values())
+    weapon = np.array([limits["weapon_types"].index(wt) for _, _, wt in keys], dtype=np.int32)
+    if "prosecuted" in handles:
+        targets = sum(handles["prosecuted"].values())
+    else:
+        targets = len(handles["target_ends"])
+
+    added = 0
+    for w in np.flatnonzero(active).tolist():
+        engaged = sum(choices[k] for k in np.flatnonzero(weapon == w).tolist())
+        low = fractions.Fraction(float(limits["min_fraction"][w])).limit_denominator(1000)
+        high = fractions.Fraction(float(limits["max_fraction"][w])).limit_denominator(1000)
+        if low > 0:
+            model.Add(low.denominator * engaged >= low.numerator * targets)
+            added += 1
+        if high < 1:
+            model.Add(high.denominator * engaged <= high.numerator * targets)
+            added += 1
+    return added
+
+
+def add_target_coverage(model, handles, target_coverage):
+    """This function requires at least ceil(target_coverage * targets) of the
+    targets of a model built with optional_targets to be prosecuted, and
+    returns the number of constraints added (1, or 0 for a model whose targets
+    are all required). Raises ValueError for a target coverage below 1 on such
+    a model."""
+    if "prosecuted" not in handles:
+        if target_coverage < 1:
+            raise ValueError("a target coverage below 1 needs a model built with optional_targets")
+        return 0
+    prosecuted = list(handles["prosecuted"].values())
+    model.Add(sum(prosecuted) >= math.ceil(target_coverage * len(prosecuted) - 1e-9))
+    return 1
+
+
+if __name__ == "__main__":
+    import time
+    from ortools.sat.python import cp_model
+    import KC_data_melt
+    import KC_data_stack
+    import KC_model
+    import KC_weapons
+
+    f = "small_inputs_gmuV5.xlsx"  # enter the filename (path) for the data
+    control = read_control(f)
+    print(control)
+    df = KC_data_stack.create_big_dataframe(f)
+    df_wt = KC_data_melt.import_weapon_data(f)
+
+    # with the weapons and the loadouts expended per platform: every target,
+    # then 60% of them (the solver drops the targets that lengthen the
+    # makespan most)
+    for target_coverage in (1.0, 0.6):
+        limits = model_limits(control, df, df_wt, target_coverage)
+        model, handles = KC_model.flexible_targetshop_model(df, formulation="lean",
+                                                            optional_targets=target_coverage < 1)
+        KC_weapons.add_weapon_allocation(model, handles, df, KC_weapons.weapon_arrays(df, df_wt),
+                                         max_loadouts=limits["max_loadouts"])
+        start_time = time.time()
+        added = add_limits(model, handles, limits)
+        print('target_coverage=%.1f: %s added in %.4f s' % (target_coverage, added,
+                                                            time.time() - start_time))
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = 20.0
+        status = solver.Solve(model)
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            prosecuted = handles.get("prosecuted", handles["target_ends"])
+            print('  %s, makespan %i, %i of %i targets prosecuted' %
+                  (solver.StatusName(status), solver.ObjectiveValue(),
+                   sum(solver.BooleanValue(v) for v in handles["prosecuted"].values())
+                   if "prosecuted" in handles else len(prosecuted), len(prosecuted)))
+        else:
+            print('  %s after %.2f s' % (solver.StatusName(status), solver.WallTime()))
@@ -0,0 +1,501 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 20 03:20:00 2026
+
+A long-lived local solve service for the flexible targetshop model.
+
+Running flexible_job_shop_mod1.5.py once per scenario imports OR-Tools and
+reads the workbook again every time. The service pays for that once and keeps
+the work in memory:
+    scenarios: an LRU cache of the scenarios read (KC_data_cache), indexed by
+        workbook path. A cached scenario is brought up to date with the file
+        (only the changed sheets are read again) before it is used; the update
+        is made on a copy, so the jobs using the old one are not disturbed.
+    models: an LRU cache of the models built, indexed by the sheet hashes of
+        the scenario and the build options, so a scenario that did not change
+        is not built again.
+    jobs: the solves wait in a bounded queue and are run by a fixed number of
+        workers, each with its share of the cores, instead of fighting over
+        them. The caches are locked only to look up and insert entries: the
+        workbooks are read and the models built outside the lock, and the
+        requests that miss the same entry at the same time wait for the one
+        that reads or builds it.
+Clients connect over TCP (127.0.0.1) or a Unix socket and send one JSON
+request per line; the service answers with JSON events, one per line, until
+the job is done. A workbook is referenced by its path or uploaded (base64);
+an uploaded workbook is removed once its scenario leaves the cache and no job
+uses it.
+A client that disconnects cancels its job: a queued job is not run, and a
+running solve is stopped.
+
+Requests:
+    {"op": "solve", "workbook": path | "upload": base64, "formulation",
+        "weapons", "links", "range_pruning", "kinematics", "control",
+        "target_coverage", "optional_targets", "max_time_in_seconds", "num_workers", "deadline", "gap"}
+        deadline (time.time()) and gap stop the solve early (KC_solve);
+        max_time_in_seconds can only lower the time limit of the service
+        events: queued, started, solution (every incumbent, streamed as
+        found), done (status, makespan, prosecuted targets with optional
+        targets, bound and the schedule as
+        [target_num, phase_num, plat_num, start, end] rows) or error
+    {"op": "status"}: sizes of the caches and of the queue
+"""
+
+import asyncio
+import base64
+import collections
+import concurrent.futures
+import copy
+import hashlib
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from ortools.sat.python import cp_model
+import KC_data_cache
+import KC_model
+import KC_weapons
+import KC_link_graph
+import KC_geo
+import KC_kinematics
+import KC_solve
+import KC_parameters
+import KC_multiobjective
+
+build_options = ("formulation", "weapons", "links", "range_pruning", "kinematics", "control",
+                 "target_coverage", "optional_targets")
+request_limit = 256 * 2**20  # longest request line in bytes (uploaded workbooks)
+disconnect_poll = 1.0  # seconds between the checks of a silent connection
+
+
+class LRUCache:
+    """A dictionary that keeps its size most recently used entries.
+    on_evict, if given, is called with the key and the value of every entry
+    dropped."""
+
+    def __init__(self, size, on_evict=None):
+        self.size = size
+        self.on_evict = on_evict
+        self.entries = collections.OrderedDict()
+
+    def get(self, key):
+        """Returns the entry of key (None if missing) and marks it as used."""
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, value):
+        """Stores an entry, dropping the least recently used one if full."""
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            key, value = self.entries.popitem(last=False)
+            if self.on_evict is not None:
+                self.on_evict(key, value)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def build_model(scenario, options):
+    """This function builds the model of a scenario (from
+    KC_data_cache.load_scenario) with the build options of a solve request,
+    as flexible_targetshop does, and returns the model and its handles.
+    Raises ValueError if the pruning leaves a phase of a required target
+    with no platform."""
+    df, df_wt = scenario["df"], scenario["df_wt"]
+    optional_targets = bool(options.get("optional_targets"))
+    target_coverage = options.get("target_coverage", 0.0 if optional_targets else 1.0)
+    optional = optional_targets or target_coverage < 1
+    model_df = df
+    if options.get("range_pruning"):
+        mask = KC_geo.feasibility_mask(df)
+        unserved = KC_geo.unserved_phases(df, mask)
+        if unserved and not optional:
+            raise ValueError("no platform in range and line of sight for (target, phase) %s" % unserved)
+        model_df = KC_geo.prune_alternatives(df, mask)
+    if options.get("kinematics"):
+        windows = KC_kinematics.iftu_windows(KC_kinematics.kinematics_arrays(df, df_wt))
+        windowed = KC_kinematics.apply_windows(model_df, windows)
+        unserved = KC_geo.unserved_phases(model_df, KC_geo.alternative_mask(windowed))
+        if unserved and not optional:
+            raise ValueError("no platform within the weapon and IFTU windows for (target, phase) %s"
+                             % unserved)
+        model_df = windowed
+    if options.get("weapons"):
+        armed = KC_weapons.armed_mask(model_df, KC_weapons.weapon_arrays(df, df_wt))
+        unserved = KC_geo.unserved_phases(model_df, armed)
+        if unserved and not optional:
+            raise ValueError("no platform with a usable weapon for (target, phase) %s" % unserved)
+        model_df = KC_geo.prune_alternatives(model_df, armed)
+
+    model, handles = KC_model.flexible_targetshop_model(
+        model_df, formulation=options.get("formulation", "lean"), optional_targets=optional)
+    limits = None
+    if options.get("control"):
+        limits = KC_parameters.model_limits(KC_parameters.read_control(scenario["f"]), df, df_wt,
+                                            target_coverage)
+    if options.get("weapons"):
+        KC_weapons.add_weapon_allocation(model, handles, df, KC_weapons.weapon_arrays(df, df_wt),
+                                         max_loadouts=None if limits is None else limits["max_loadouts"])
+    if options.get("links"):
+        gaps = KC_link_graph.handoff_gaps(df, KC_link_graph.import_link_tables(scenario["f"]),
+                                          KC_link_graph.import_platform_jamming_states(scenario["f"]),
+                                          KC_geo.platform_distance(df))
+        KC_link_graph.add_handoff_gaps(model, handles, gaps)
+    if options.get("kinematics"):
+        KC_kinematics.add_iftu_windows(model, handles, windows)
+    if limits is not None:
+        KC_parameters.add_limits(model, handles, limits)
+    else:
+        KC_parameters.add_target_coverage(model, handles, target_coverage)
+    if optional_targets:
+        KC_multiobjective.add_coverage_objective(model, handles,
+                                                 KC_multiobjective.target_priorities(df))
+    handles["model_df"] = model_df
+    return model, handles
+
+
+class SolveService:
+    """The solve service: the caches, the job queue and its workers (see the
+    module docstring).
+    Arguments:
+        workers: number of solves run at the same time
+        scenarios, models: sizes of the LRU caches
+        queue: maximum number of waiting jobs; more are refused
+        upload_dir: directory of the uploaded workbooks; a workbook is removed
+            once its scenario leaves the cache and no job uses it
+        max_time_in_seconds: time limit of a solve, that a request may lower"""
+
+    def __init__(self, workers=2, scenarios=4, models=8, queue=16, upload_dir=None,
+                 max_time_in_seconds=600.0):
+        self.workers = workers
+        self.scenarios = LRUCache(scenarios, on_evict=self._evict_scenario)
+        self.models = LRUCache(models)
+        self.queue_size = queue
+        self.upload_dir = upload_dir or tempfile.mkdtemp(prefix="kc_service_")
+        self.max_time_in_seconds = max_time_in_seconds
+        self.cores_per_solve = max(1, (os.cpu_count() or 1) // workers)
+        self._lock = threading.Lock()  # guards the caches, _pending, _cancelled, _handles and _uploads
+        self._pending = {}  # cache key: future of the read or build in progress
+        self._cancelled = set()  # jobs cancelled by their client
+        self._handles = {}  # job: KC_solve handle of the running solve
+        self._uploads = collections.Counter()  # uploaded workbook path: jobs using it
+        self._jobs = None
+        self._next_job = 0
+
+    async def start(self):
+        """Creates the job queue and starts the workers (in the running loop)."""
+        self._jobs = asyncio.Queue(self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _worker(self):
+        """Runs the queued jobs one at a time, the solve in a thread."""
+        loop = asyncio.get_running_loop()
+        while True:
+            request, events = await self._jobs.get()
+            send = lambda event, job=request["job"]: loop.call_soon_threadsafe(
+                events.put_nowait, dict(event, job=job))
+            try:
+                await loop.run_in_executor(None, self.run_job, request, send)
+            except Exception as error:  # reported to the client, the service goes on
+                send({"event": "error", "message": "%s: %s" % (type(error).__name__, error)})
+            loop.call_soon_threadsafe(events.put_nowait, None)
+            self._jobs.task_done()
+
+    def submit(self, request):
+        """Queues a solve request and returns its job number and the asyncio
+        queue of its events (None marks the end). Raises asyncio.QueueFull if
+        the queue is full."""
+        self._next_job += 1
+        request = dict(request, job=self._next_job)
+        events = asyncio.Queue()
+        self._jobs.put_nowait((request, events))
+        events.put_nowait({"event": "queued", "job": request["job"], "position": self._jobs.qsize()})
+        return request["job"], events
+
+    def cancel(self, job):
+        """Cancels a job: it is skipped if still queued, and its solve is
+        stopped (KC_solve.SolveHandle.cancel) if running."""
+        with self._lock:
+            self._cancelled.add(job)
+            handle = self._handles.get(job)
+        if handle is not None:
+            handle.cancel()
+
+    def _shared(self, key, compute):
+        """Returns compute(), or, if another thread is already computing the
+        same key, waits for its result instead: the requests that miss the same
+        cache entry at the same time read or build it once. The lock is only
+        held to find or register the future of the key."""
+        with self._lock:
+            future = self._pending.get(key)
+            running = future is not None
+            if not running:
+                future = self._pending[key] = concurrent.futures.Future()
+        if running:
+            return future.result()
+        try:
+            future.set_result(compute())
+        except BaseException as error:
+            future.set_exception(error)
+        finally:
+            with self._lock:
+                del self._pending[key]
+        return future.result()
+
+    def workbook(self, request):
+        """Returns the workbook path of a request. An uploaded workbook is saved
+        under its content hash, and kept until the job releases it (see
+        release)."""
+        if request.get("upload") is None:
+            return os.path.abspath(request["workbook"])
+        content = base64.b64decode(request["upload"])
+        path = os.path.join(self.upload_dir, hashlib.sha1(content).hexdigest() + ".xlsx")
+        with self._lock:
+            self._uploads[path] += 1
+        if not os.path.exists(path):
+            partial = "%s.%i" % (path, threading.get_ident())
+            with open(partial, "wb") as file:
+                file.write(content)
+            os.replace(partial, path)
+        return path
+
+    def release(self, path):
+        """Ends the use of a workbook by a job. An uploaded workbook whose
+        scenario is no longer cached is removed."""
+        with self._lock:
+            if path not in self._uploads:
+                return
+            self._uploads[path] -= 1
+            if self._uploads[path] == 0:
+                del self._uploads[path]
+                if path not in self.scenarios.entries:
+                    _remove(path)
+
+    def _evict_scenario(self, path, scenario):
+        """Removes the uploaded workbook of a scenario dropped from the cache,
+        unless a job still uses it (it is then removed by release). Called
+        with the lock held."""
+        if os.path.dirname(path) == self.upload_dir and path not in self._uploads:
+            _remove(path)
+
+    def scenario(self, path):
+        """Returns the scenario of a workbook path and whether it was cached."""
+        def load():
+            with self._lock:
+                scenario = self.scenarios.get(path)
+            if scenario is None:
+                scenario = KC_data_cache.load_scenario(path)
+                cached = False
+            elif KC_data_cache.sheet_hashes(path) != scenario["hashes"]:
+                scenario = copy.deepcopy(scenario)
+                KC_data_cache.update_scenario(scenario)
+                cached = True
+            else:
+                return scenario, True
+            with self._lock:
+                self.scenarios.put(path, scenario)
+            return scenario, cached
+
+        return self._shared(("scenario", path), load)
+
+    def model(self, scenario, options):
+        """Returns the model and handles of a scenario and build options, and
+        whether they were cached."""
+        key = (scenario["f"], json.dumps(scenario["hashes"], sort_keys=True),
+               json.dumps(options, sort_keys=True))
+        def build():
+            with self._lock:
+                entry = self.models.get(key)
+            if entry is not None:
+                return entry, True
+            entry = build_model(scenario, options)
+            with self._lock:
+                self.models.put(key, entry)
+            return entry, False
+
+        return self._shared(("model",) + key, build)
+
+    def run_job(self, request, send):
+        """Reads (or updates) the scenario, builds (or reuses) the model and
+        solves it, sending the events of the job. Runs in a worker thread.
+        A job cancelled by its client (cancel) ends without a done event."""
+        job = request["job"]
+        with self._lock:
+            if job in self._cancelled:
+                self._cancelled.discard(job)
+                return
+        path = self.workbook(request)
+        try:
+            self._run_job(request, path, send)
+        finally:
+            self.release(path)
+            with self._lock:
+                self._cancelled.discard(job)
+                self._handles.pop(job, None)
+
+    def _run_job(self, request, path, send):
+        """The body of run_job."""
+        job = request["job"]
+        start_time = time.time()
+        scenario, cached_scenario = self.scenario(path)
+        options = {key: request[key] for key in build_options if key in request}
+        (model, handles), cached_model = self.model(scenario, options)
+        send({"event": "started", "cached_scenario": cached_scenario,
+              "cached_model": cached_model, "prepare_time": time.time() - start_time})
+
+        solver = cp_model.CpSolver()
+        solver.parameters.num_workers = request.get("num_workers", self.cores_per_solve)
+        max_time_in_seconds = request.get("max_time_in_seconds")
+        solver.parameters.max_time_in_seconds = (
+            self.max_time_in_seconds if max_time_in_seconds is None
+            else min(max_time_in_seconds, self.max_time_in_seconds))
+        handle = KC_solve.start_solve(
+            model, handles, solver, deadline=request.get("deadline"), gap=request.get("gap", 0.0),
+            on_solution=lambda incumbent: send({"event": "solution",
+                                                "objective": incumbent["objective"],
+                                                "bound": incumbent["bound"],
+                                                "time": incumbent["time"]}))
+        with self._lock:
+            self._handles[job] = handle
+            cancelled = job in self._cancelled
+        if cancelled:
+            handle.cancel()
+        handle.wait()
+        if handle.cancelled.is_set():
+            return
+        status = handle.status
+        solved = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+        send({"event": "done", "status": solver.StatusName(status),
+              "makespan": solver.Value(handles["makespan"]) if solved else None,
+              "prosecuted": sum(solver.BooleanValue(literal) for literal in
+                                handles["prosecuted"].values())
+              if solved and "prosecuted" in handles else None,
+              "bound": solver.BestObjectiveBound(), "wall_time": solver.WallTime(),
+              "schedule": KC_model.solution_schedule(solver, handles) if solved else []})
+
+    def status(self):
+        """Returns the sizes of the caches and of the queue."""
+        return {"event": "status", "scenarios": len(self.scenarios), "models": len(self.models),
+                "queued": self._jobs.qsize(), "workers": self.workers,
+                "cores_per_solve": self.cores_per_solve}
+
+    async def handle_client(self, reader, writer):
+        """Serves one connection: one JSON request per line, the events of
+        every request written back as JSON lines. The job of the request
+        being answered is cancelled if the client goes away."""
+        job = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    op = request.get("op", "solve")
+                    if op == "status":
+                        await _write(writer, self.status())
+                        continue
+                    if op != "solve":
+                        raise ValueError("unknown op %r" % op)
+                    job, events = self.submit(request)
+                except asyncio.QueueFull:
+                    await _write(writer, {"event": "error", "message": "queue full"})
+                    continue
+                except ValueError as error:  # bad JSON or request
+                    await _write(writer, {"event": "error", "message": str(error)})
+                    continue
+                while True:
+                    try:
+                        event = await asyncio.wait_for(events.get(), disconnect_poll)
+                    except asyncio.TimeoutError:
+                        # no event to write: check that the client is still there
+                        if reader.at_eof() or writer.is_closing():
+                            raise ConnectionResetError("client disconnected")
+                        continue
+                    if event is None:
+                        break
+                    await _write(writer, event)
+                job = None
+        except ConnectionError:
+            pass
+        finally:
+            if job is not None:
+                self.cancel(job)
+            writer.close()
+
+
+def _remove(path):
+    """This function removes a file, if it still exists."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def _write(writer, event):
+    """Writes one event as a JSON line."""
+    writer.write(json.dumps(event).encode() + b"\n")
+    await writer.drain()
+
+
+async def serve(port=8765, host="127.0.0.1", path=None, ready=None, **kwargs):
+    """This function runs the service until it is cancelled, on a TCP port of
+    host, or on the Unix socket path if it is given. The other arguments are
+    those of SolveService. ready, if given, is a threading.Event set once
+    the service accepts connections."""
+    service = SolveService(**kwargs)
+    await service.start()
+    if path is not None:
+        server = await asyncio.start_unix_server(service.handle_client, path=path,
+                                                 limit=request_limit)
+    else:
+        server = await asyncio.start_server(service.handle_client, host, port, limit=request_limit)
+    if ready is not None:
+        ready.set()
+    async with server:
+        await server.serve_forever()
+
+
+def request_events(request, port=8765, host="127.0.0.1", path=None):
+    """This function sends a request to the service and yields its events as
+    they arrive (the client side, for the tools that submit scenarios)."""
+    if path is not None:
+        connection = socket.socket(socket.AF_UNIX)
+        connection.connect(path)
+    else:
+        connection = socket.create_connection((host, port))
+    with connection, connection.makefile("rwb") as stream:
+        stream.write(json.dumps(request).encode() + b"\n")
+        stream.flush()
+        for line in stream:
+            event = json.loads(line)
+            yield event
+            if event["event"] in ("done", "error", "status"):
+                break
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":  # python KC_service.py serve [port]
+        asyncio.run(serve(port=int(sys.argv[2]) if len(sys.argv) > 2 else 8765))
+        sys.exit()
+
+    f = "small_inputs_gmuV5.xlsx"  # enter the filename (path) for the data
+    ready = threading.Event()
+    threading.Thread(target=asyncio.run, args=(serve(ready=ready, workers=1),), daemon=True).start()
+    ready.wait()
+
+    # the second request reuses the scenario and the model of the first one
+    for n in range(2):
+        start_time = time.time()
+        for event in request_events({"workbook": f, "formulation": "lean", "max_time_in_seconds": 5.0}):
+            if event["event"] == "done":
+                event["schedule"] = "%i rows" % len(event["schedule"])
+            print('%.2f s %s' % (time.time() - start_time, event))
+    print(next(request_events({"op": "status"})))
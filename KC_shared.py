@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 20 02:30:00 2026
+
+Scenario arrays shared between solver processes.
+
+Fanning out solves (seed portfolios, jamming variants, parameter grids) to
+worker processes used to mean reading the workbook and building the big
+dataframe again in every worker. Instead, the arrays the model builders need
+are prepared once in the parent:
+    target_num, phase_num, plat_num, proc_time, capacity, range: one entry
+        per (t,i,p) row of the big dataframe
+    target_position, plat_position: [num, (latitude, longitude, altitude)],
+        1-based like target_num and plat_num
+    target_id, plat_id: the ids of target_num and plat_num
+    gaps: optional handoff gaps [scenario, phase_num, p, p'] (KC_link_graph)
+and published in one block, a multiprocessing.shared_memory segment or a
+memory-mapped file. A block is described by a small picklable handle (segment
+name or path, and the dtype, shape and offset of every array), and a worker
+attaches to it as numpy views, without copying. Every worker then holds the
+CP model and its solver, and not its own copy of the data.
+"""
+
+import multiprocessing
+import os
+import resource
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from ortools.sat.python import cp_model
+import KC_model
+import KC_link_graph
+
+_alignment = 64
+_attached = {}  # blocks attached by this process, kept open while it runs
+
+
+def scenario_arrays(df, gaps=None):
+    """This function returns the dictionary of arrays of the big dataframe that
+    is published for the workers (see the module docstring).
+    Arguments:
+        df: the big dataframe
+        gaps: optional handoff gaps, one [phase_num, p, p'] array or a
+            dictionary of them indexed by scenario (KC_link_graph)"""
+    arrays = {"target_num": df["Target_num"].to_numpy(dtype=np.int32),
+              "phase_num": df["Phase_num"].to_numpy(dtype=np.int32),
+              "plat_num": df["Plat_num"].to_numpy(dtype=np.int32),
+              "proc_time": df["PLATPROCTIME"].to_numpy(dtype=np.int32),
+              "capacity": df["PLATCAPACITY"].to_numpy(dtype=np.int32),
+              "range": df["PLATRANGE"].to_numpy(dtype=np.float64)}
+    for side, num, name in (("target", "Target_num", "Target ID"), ("plat", "Plat_num", "Plat ID")):
+        rows = df.drop_duplicates(num).sort_values(num)
+        index = rows[num].to_numpy()
+        position = np.full((index.max() + 1, 3), np.nan)
+        position[index] = rows[["Latitude_" + side, "Longitude_" + side,
+                                "Altitude_" + side + " (km)"]].to_numpy(dtype=float)
+        ids = np.full(index.max() + 1, "", dtype=rows[name].to_numpy(dtype=str).dtype)
+        ids[index] = rows[name].to_numpy(dtype=str)
+        arrays[side + "_position"] = position
+        arrays[side + "_id"] = ids
+    if gaps is not None:
+        if isinstance(gaps, dict):
+            arrays["gaps"] = np.stack(list(gaps.values()))
+            arrays["scenarios"] = np.array([str(name) for name in gaps])
+        else:
+            arrays["gaps"] = np.asarray(gaps)[None]
+    return arrays
+
+
+def publish(arrays, path=None):
+    """This function copies the arrays into one shared block and returns its
+    handle. The block is a shared memory segment, or the memory-mapped file
+    path if it is given. The segment lives until release is called."""
+    layout = {}
+    size = 0
+    for key, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        layout[key] = (size, array.dtype.str, array.shape)
+        size += -(-array.nbytes // _alignment) * _alignment
+    size = max(size, 1)
+
+    if path is None:
+        block = shared_memory.SharedMemory(create=True, size=size)
+        handle = {"name": block.name, "path": None, "size": size, "layout": layout}
+        _attached[block.name] = block
+        buffer = block.buf
+    else:
+        buffer = np.memmap(path, dtype=np.uint8, mode="w+", shape=(size,))
+        handle = {"name": None, "path": path, "size": size, "layout": layout}
+
+    for key, array in arrays.items():
+        _view(buffer, layout[key])[...] = array
+    if path is not None:
+        buffer.flush()
+    return handle
+
+
+def attach(handle):
+    """This function attaches to a published block and returns its arrays as
+    read-only numpy views of the shared memory (no copy is made)."""
+    if handle["path"] is not None:
+        buffer = np.memmap(handle["path"], dtype=np.uint8, mode="r", shape=(handle["size"],))
+    else:
+        if handle["name"] not in _attached:
+            _attached[handle["name"]] = shared_memory.SharedMemory(name=handle["name"])
+        buffer = _attached[handle["name"]].buf
+    arrays = {}
+    for key, entry in handle["layout"].items():
+        arrays[key] = _view(buffer, entry)
+        arrays[key].flags.writeable = False
+    return arrays
+
+
+def _view(buffer, entry):
+    """Returns the array of a layout entry (offset, dtype, shape) in a buffer."""
+    offset, dtype, shape = entry
+    dtype = np.dtype(dtype)
+    count = int(np.prod(shape, dtype=np.int64))
+    return np.frombuffer(buffer, dtype=dtype, count=count, offset=offset).reshape(shape)
+
+
+def release(handle):
+    """This function frees a published block: the shared memory segment is
+    unlinked (the memory-mapped file is removed)."""
+    if handle["path"] is not None:
+        os.remove(handle["path"])
+        return
+    block = _attached.pop(handle["name"], None) or shared_memory.SharedMemory(name=handle["name"])
+    block.unlink()
+    try:
+        block.close()
+    except BufferError:
+        pass  # arrays of this process still point to it, unmapped when collected
+
+
+def model_dataframe(arrays):
+    """This function returns the columns of the big dataframe used by
+    KC_model.flexible_targetshop_model, built on the shared arrays."""
+    return pd.DataFrame({"Target_num": arrays["target_num"], "Phase_num": arrays["phase_num"],
+                         "Plat_num": arrays["plat_num"], "PLATPROCTIME": arrays["proc_time"]},
+                        copy=False)
+
+
+_worker_arrays = None
+
+
+def _init_worker(handle):
+    """Attaches a worker process to the published block once."""
+    global _worker_arrays
+    _worker_arrays = attach(handle)
+
+
+def _solve_task(task):
+    """Builds and solves the model of one task in a worker process and returns
+    its result (see solve_tasks)."""
+    model, handles = KC_model.flexible_targetshop_model(model_dataframe(_worker_arrays),
+                                                        formulation=task.get("formulation", "lean"))
+    if task.get("scenario") is not None:
+        KC_link_graph.add_handoff_gaps(model, handles, _worker_arrays["gaps"][task["scenario"]])
+
+    solver = cp_model.CpSolver()
+    for key, value in task.get("parameters", {}).items():
+        setattr(solver.parameters, key, value)
+    status = solver.Solve(model)
+    solved = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    return {"name": task.get("name"),
+            "status": solver.StatusName(status),
+            "makespan": solver.ObjectiveValue() if solved else None,
+            "bound": solver.BestObjectiveBound(),
+            "wall_time": solver.WallTime(),
+            "pid": os.getpid(),
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+
+def solve_tasks(handle, tasks, processes=None):
+    """This function solves a list of tasks in a pool of worker processes that
+    attach to the published block once, and returns the list of results
+    (name, status, makespan, bound, wall_time, pid and peak resident memory of
+    the worker in MB). A task is a dictionary with:
+        name: label of the task
+        formulation: "reified" or "lean" (default)
+        scenario: index of the handoff gaps scenario to add, or None
+        parameters: dictionary of CP-SAT parameters (random_seed,
+            max_time_in_seconds, num_workers, ...)"""
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(handle,)) as pool:
+        return pool.map(_solve_task, tasks, chunksize=1)
+
+
+def seed_portfolio(seeds, max_time_in_seconds=10.0, num_workers=None, formulation="lean"):
+    """Returns the tasks of a portfolio of solves that differ by their random
+    seed only (see solve_tasks). num_workers=None keeps the CP-SAT default."""
+    parameters = {"max_time_in_seconds": max_time_in_seconds}
+    if num_workers is not None:
+        parameters["num_workers"] = num_workers
+    return [{"name": "seed_%i" % seed, "formulation": formulation,
+             "parameters": dict(parameters, random_seed=seed)}
+            for seed in seeds]
+
+
+if __name__ == "__main__":
+    import time
+    import KC_data_stack
+
+    f = "small_inputs_gmuV5.xlsx"  # enter the filename (path) for the data
+    start_time = time.time()
+    df = KC_data_stack.create_big_dataframe(f)
+    tables = KC_link_graph.import_link_tables(f)
+    gaps = KC_link_graph.scenario_handoff_gaps(
+        df, tables, {state: dict.fromkeys(set(df["Plat ID"]), state) for state in tables["jam_states"]})
+    arrays = scenario_arrays(df, gaps)
+    print('data prepared in %.2f s, %.2f MB of arrays' %
+          (time.time() - start_time, sum(a.nbytes for a in arrays.values()) / 2**20))
+
+    handle = publish(arrays)
+    try:
+        tasks = seed_portfolio(range(1, 4), max_time_in_seconds=10.0)
+        tasks += [{"name": "jamming_%s" % name, "scenario": k,
+                   "parameters": {"max_time_in_seconds": 10.0}}
+                  for k, name in enumerate(arrays["scenarios"])]
+        start_time = time.time()
+        results = solve_tasks(handle, tasks, processes=2)
+        print('%i tasks in %.2f s' % (len(tasks), time.time() - start_time))
+        for result in results:
+            print('  %-25s %-8s makespan %6s  worker %i  peak RSS %.0f MB' %
+                  (result["name"], result["status"], result["makespan"], result["pid"],
+                   result["max_rss_mb"]))
+    finally:
+        release(handle)
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 20 04:10:00 2026
+
+Anytime solves: a handle on a CP-SAT solve running in a background thread.
+
+solver.Solve blocks until CP-SAT proves optimality or reaches its limits. A
+solve started with start_solve returns at once a SolveHandle, and the solve
+stops at the first of:
+    deadline: a wall-clock time (time.time()), given to CP-SAT as its time
+        limit, so the answer comes within a fixed latency budget
+    gap: a "good enough" relative gap between the incumbent and the best
+        lower bound (the solver's, or KC_bounds' when given)
+    cancel(): an external request, from any thread
+While it runs, best() returns the best incumbent found so far as a schedule,
+so a caller with a latency budget always has something to use. The search is
+stopped through the solution callback, whose StopSearch is honoured at any
+time (CpSolver.StopSearch does nothing in the OR-Tools 9.6 Python wrapper).
+"""
+
+import threading
+import time
+from ortools.sat.python import cp_model
+import KC_bounds
+import KC_model
+
+
+class _AnytimeCallback(cp_model.CpSolverSolutionCallback):
+    """Records every incumbent of the solve of a SolveHandle and stops the
+    search when the gap threshold is reached."""
+
+    def __init__(self, handle):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.handle = handle
+
+    def on_solution_callback(self):
+        """Called at each new solution."""
+        handle = self.handle
+        objective = self.ObjectiveValue()
+        bound = KC_bounds.best_bound(self.BestObjectiveBound(), handle.bounds)
+        incumbent = {"solution": handle.solutions, "objective": objective, "bound": bound,
+                     "gap": (objective - bound) / objective if objective > 0 else 0.0,
+                     "time": self.WallTime(),
+                     "schedule": KC_model.solution_schedule(self, handle.handles)}
+        with handle._lock:
+            handle.incumbent = incumbent
+            handle.solutions += 1
+        for on_solution in handle.on_solution:
+            on_solution(incumbent)
+        if incumbent["gap"] <= handle.gap or handle.cancelled.is_set():
+            self.StopSearch()
+
+
+class SolveHandle:
+    """A solve running in a background thread (see start_solve). The solver
+    and its final response are available once done() is True."""
+
+    def __init__(self, model, handles, solver, gap, bounds, on_solution, solve):
+        self.model = model
+        self.handles = handles
+        self.solver = solver
+        self.gap = gap
+        self.bounds = bounds
+        self.on_solution = [on_solution] if callable(on_solution) else list(on_solution or ())
+        self.incumbent = None
+        self.solutions = 0
+        self.status = None
+        self.error = None
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._callback = _AnytimeCallback(self)
+        self._solve = solve or (lambda solver, model, callback: solver.Solve(model, callback))
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """Runs the solve (in the background thread)."""
+        try:
+            self.status = self._solve(self.solver, self.model, self._callback)
+        except Exception as error:  # raised again by wait
+            self.error = error
+
+    def cancel(self):
+        """Stops the search as soon as possible; the best incumbent is kept."""
+        self.cancelled.set()
+        self._callback.StopSearch()
+        self.solver.StopSearch()
+
+    def done(self):
+        """Returns True once the solve is over."""
+        return not self._thread.is_alive()
+
+    def wait(self, timeout=None):
+        """Waits for the end of the solve (at most timeout seconds) and returns
+        its status name, or None if it is still running."""
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            return None
+        if self.error is not None:
+            raise self.error
+        return self.solver.StatusName(self.status)
+
+    def best(self):
+        """Returns the best incumbent found so far, or None: a dictionary with
+        the solution number, objective (makespan), bound, gap, time and
+        schedule (a list of (target_num, phase_num, plat_num, start, end)
+        sorted on target and phase)."""
+        with self._lock:
+            return self.incumbent
+
+
+def start_solve(model, handles, solver=None, deadline=None, gap=0.0, bounds=None,
+                on_solution=None, solve=None):
+    """This function starts the solve of a model built by
+    KC_model.flexible_targetshop_model in a background thread and returns its
+    SolveHandle at once.
+    Arguments:
+        solver: the CpSolver, with its parameters set (default: a new one)
+        deadline: wall-clock time (time.time()) by which the solve must end
+        gap: relative gap at which an incumbent is good enough (0 waits for
+            optimality)
+        bounds: optional lower bounds of KC_bounds (dictionary or Future)
+            used with the solver's bound for the gap
+        on_solution: function (or list of functions) called with every
+            incumbent (see SolveHandle.best)
+        solve: optional function (solver, model, callback) -> status that
+            runs the solve instead of solver.Solve (e.g. with telemetry)"""
+    if solver is None:
+        solver = cp_model.CpSolver()
+    if deadline is not None:
+        remaining = max(deadline - time.time(), 0.0)
+        if solver.parameters.max_time_in_seconds > remaining:
+            solver.parameters.max_time_in_seconds = remaining
+    return SolveHandle(model, handles, solver, gap, bounds, on_solution, solve)
+
+
+if __name__ == "__main__":
+    import KC_data_stack
+
+    f = "small_inputs_gmuV5.xlsx"  # enter the filename (path) for the data
+    df = KC_data_stack.create_big_dataframe(f)
+    model, handles = KC_model.flexible_targetshop_model(df, formulation="lean")
+    bounds = KC_bounds.start_bounds(df)
+
+    # a latency budget of 8 s, polled while the solve runs
+    handle = start_solve(model, handles, deadline=time.time() + 8.0, bounds=bounds)
+    while handle.wait(timeout=2.0) is None:
+        best = handle.best()
+        print('running: %s' % ('no incumbent yet' if best is None else
+                               'makespan %i, gap %.3f' % (best["objective"], best["gap"])))
+    print('deadline: %s, makespan %i, %i phases scheduled' %
+          (handle.wait(), handle.best()["objective"], len(handle.best()["schedule"])))
+
+    # good enough at 90% gap to the bounds
+    handle = start_solve(model, handles, gap=0.9, bounds=bounds)
+    print('gap: %s after %.2f s, gap %.3f' %
+          (handle.wait(), handle.solver.WallTime(), handle.best()["gap"]))
+
+    # cancelled from outside, before any solution
+    handle = start_solve(model, handles)
+    time.sleep(1.0)
+    start_time = time.time()
+    handle.cancel()
+    print('cancel: %s, stopped %.2f s after the request, incumbent %s' %
+          (handle.wait(), time.time() - start_time, handle.best()))
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 22:20:00 2026
+
+Solver telemetry: a machine-readable record of every solve.
+
+The search log of CP-SAT is sent to a log callback instead of stdout and
+parsed as it arrives. From it, and from the response, a run record is built:
+    response: the fields of ResponseStats() (status, objective, bound,
+        conflicts, branches, propagations, times, ...)
+    model: the model sizes before and after presolve (#Variables and the
+        count of every constraint type)
+    presolve: the presolve reductions (affine relations and the number of
+        times every presolve rule was applied)
+    workers: per search worker (subsolver), the solutions and objective bounds
+        it found, the variable bounds it shared and its search statistics
+    trajectory: every improvement of the objective or of the bound (event,
+        time, best objective, bound, worker that found it)
+A record is written as JSON, or as Parquet (one row per trajectory event with
+the run fields, needs pyarrow). For long solves the live values can be served
+locally as a Prometheus-style text page.
+"""
+
+import http.server
+import json
+import re
+import threading
+import time
+import pandas as pd
+
+_trajectory_line = re.compile(r"^#(\d+|Bound|Done|Model)\s+([\d.]+)s\s+best:(\S+)\s+"
+                              r"next:\[(\S*?),(\S*?)\]\s*([^\s(]*)")
+_rule_line = re.compile(r"^\s*- rule '(.+)' was applied (\d+) times?")
+_count_line = re.compile(r"^#(\w+): (\d+)")
+_worker_line = re.compile(r"^\s+'(.+)': (\d+)$")
+_stat_line = re.compile(r"^\s+(\w[\w ]*): ([\d']+)$")
+_worker_sections = {"Solutions found per subsolver:": "solutions",
+                    "Objective bounds found per subsolver:": "bounds",
+                    "Improving variable bounds shared per subsolver:": "shared_bounds"}
+
+
+class Telemetry:
+    """Collects the telemetry of one solve from the search log lines (see
+    attach) and the response (see finish), and keeps the live metrics served
+    by MetricsServer."""
+
+    def __init__(self, name=""):
+        self.name = name
+        self.start_time = time.time()
+        self.model = {"initial": {}, "presolved": {}}
+        self.presolve = {"affine_relations": 0, "rules": {}}
+        self.workers = {}
+        self.trajectory = []
+        self.response = {}
+        self.metrics = {"objective": float("nan"), "best_bound": float("nan"),
+                        "solutions": 0, "wall_time_seconds": 0.0, "done": 0}
+        self._section = None
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def attach(self, solver):
+        """Sends the search log of the solver to this collector (and not to
+        stdout). Call before solver.Solve."""
+        solver.parameters.log_search_progress = True
+        solver.parameters.log_to_stdout = False
+        solver.log_callback = self.log
+
+    def log(self, message):
+        """Parses a message of the search log (one or more lines)."""
+        for line in message.split("\n"):
+            self.log_line(line)
+
+    def log_line(self, line):
+        """Parses one line of the search log."""
+        match = _trajectory_line.match(line)
+        if match:
+            self._trajectory_event(*match.groups())
+            return
+        if line.startswith("Initial optimization model"):
+            self._section = "initial"
+        elif line.startswith("Presolved optimization model"):
+            self._section = "presolved"
+        elif line.startswith("Sub-solver search statistics:"):
+            self._section = "search"
+        elif line in _worker_sections:
+            self._section = _worker_sections[line]
+        elif not line.strip():
+            if self._section in ("initial", "presolved") or self._section in _worker_sections.values():
+                self._section = None
+        elif self._section in ("initial", "presolved"):
+            match = _count_line.match(line)
+            if match:
+                self.model[self._section][match.group(1)] = int(match.group(2))
+        elif self._section == "search":
+            self._search_statistics(line)
+        elif self._section is not None:
+            match = _worker_line.match(line)
+            if match:
+                self._worker_entry(match.group(1))[self._section] = int(match.group(2))
+        else:
+            match = _rule_line.match(line)
+            if match:
+                self.presolve["rules"][match.group(1)] = int(match.group(2))
+            elif "affine relations were detected" in line:
+                self.presolve["affine_relations"] = int(line.split()[1])
+
+    def _trajectory_event(self, event, wall_time, best, lower, upper, worker):
+        """Records a line of the search progress and updates the metrics."""
+        best = float(best) if best not in ("inf", "-inf") else None
+        bound = float(lower) if lower not in ("", "inf", "-inf") else None
+        self.trajectory.append({"event": event, "time": float(wall_time), "objective": best,
+                                "bound": bound, "worker": worker})
+        with self._lock:
+            if best is not None:
+                self.metrics["objective"] = best
+            if bound is not None:
+                self.metrics["best_bound"] = bound
+            if event.isdigit():
+                self.metrics["solutions"] = int(event)
+            self.metrics["wall_time_seconds"] = float(wall_time)
+
+    def _worker_entry(self, worker):
+        """Returns the dictionary of a worker, created if needed."""
+        return self.workers.setdefault(worker, {"solutions": 0, "bounds": 0, "shared_bounds": 0})
+
+    def _search_statistics(self, line):
+        """Parses a line of the sub-solver search statistics."""
+        match = re.match(r"^  '(.+)':$", line)
+        if match:
+            self._worker = self._worker_entry(match.group(1))
+            return
+        match = _stat_line.match(line)
+        if match and self._worker is not None:
+            self._worker[match.group(1).replace(" ", "_")] = int(match.group(2).replace("'", ""))
+
+    def finish(self, solver):
+        """Reads the response of the solver once the solve is over and returns
+        the run record (see the module docstring)."""
+        for line in solver.ResponseStats().splitlines():
+            key, _, value = line.partition(": ")
+            if value:
+                self.response[key] = _number(value)
+        with self._lock:
+            self.metrics.update({"conflicts": solver.NumConflicts(),
+                                 "branches": solver.NumBranches(),
+                                 "wall_time_seconds": solver.WallTime(),
+                                 "done": 1})
+        return self.record()
+
+    def record(self):
+        """Returns the run record as a dictionary of JSON-compatible values."""
+        return {"name": self.name,
+                "date": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.start_time)),
+                "response": self.response,
+                "model": self.model,
+                "presolve": self.presolve,
+                "workers": self.workers,
+                "trajectory": self.trajectory}
+
+    def prometheus_text(self):
+        """Returns the live metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = dict(self.metrics)
+        objective, bound = metrics["objective"], metrics["best_bound"]
+        metrics["gap"] = abs(objective - bound) / max(abs(objective), 1) if objective == objective else float("nan")
+        label = '{instance="%s"}' % self.name.replace('"', "'")
+        return "".join("# TYPE cpsat_%s gauge\ncpsat_%s%s %s\n" % (key, key, label, value)
+                       for key, value in sorted(metrics.items()))
+
+
+def _number(value):
+    """Converts a ResponseStats value to an int or float when it is one."""
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
+
+
+def write_record(record, path):
+    """This function writes a run record to path: JSON, or Parquet if the name
+    ends with ".parquet" (one row per trajectory event, with the response
+    fields and the presolved model sizes as columns; the presolve rules and
+    workers are stored as JSON strings)."""
+    if not path.endswith(".parquet"):
+        with open(path, "w") as file:
+            json.dump(record, file, indent=1)
+        return
+    rows = pd.DataFrame(record["trajectory"] or [{}])
+    rows.insert(0, "name", record["name"])
+    rows.insert(1, "date", record["date"])
+    for key, value in record["response"].items():
+        rows["response_" + key] = value
+    for key, value in record["model"]["presolved"].items():
+        rows["presolved_" + key] = value
+    rows["presolve"] = json.dumps(record["presolve"])
+    rows["workers"] = json.dumps(record["workers"])
+    rows.to_parquet(path, index=False)
+
+
+class MetricsServer:
+    """Serves the live metrics of a Telemetry collector on
+    http://host:port/metrics from a background thread."""
+
+    def __init__(self, telemetry, port=9464, host="127.0.0.1"):
+        collector = telemetry
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = collector.prometheus_text().encode()
+                self.send_response(200 if self.path.startswith("/metrics") else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        """Stops the server."""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def solve_with_telemetry(solver, model, callback=None, name="", record_path=None, metrics_port=None):
+    """This function solves the model with the telemetry attached and returns
+    the status and the run record.
+    Arguments:
+        solver: the CpSolver, with its parameters set
+        model: the CpModel
+        callback: optional solution callback
+        name: name of the run (instance) in the record and the metrics
+        record_path: if given, the record is written there (see write_record)
+        metrics_port: if given, the live metrics are served on this local port
+            for the duration of the solve"""
+    telemetry = Telemetry(name)
+    telemetry.attach(solver)
+    server = MetricsServer(telemetry, metrics_port) if metrics_port is not None else None
+    try:
+        status = solver.Solve(model, callback)
+    finally:
+        if server is not None:
+            server.close()
+    record = telemetry.finish(solver)
+    if record_path is not None:
+        write_record(record, record_path)
+    return status, record
+
+
+if __name__ == "__main__":
+    import urllib.request
+    from ortools.sat.python import cp_model
+    import KC_job_shop
+
+    machines, durations = KC_job_shop.random_instance(15, 15, 1, 2)
+    model, handles = KC_job_shop.job_shop_model(KC_job_shop.job_arrays(durations, machines))
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = 5.0
+    solver.parameters.num_workers = 8
+
+    # poll the metrics page while solving
+    def poll():
+        time.sleep(2.0)
+        print(urllib.request.urlopen("http://127.0.0.1:9464/metrics").read().decode())
+
+    threading.Thread(target=poll, daemon=True).start()
+    status, record = solve_with_telemetry(solver, model, name="random_15_15",
+                                          record_path="random_15_15.telemetry.json",
+                                          metrics_port=9464)
+    print('%s: objective %s, bound %s, %i trajectory events, %i presolve rules' %
+          (record["response"]["status"], record["response"]["objective"],
+           record["response"]["best_bound"], len(record["trajectory"]),
+           len(record["presolve"]["rules"])))
+    for worker, stats in sorted(record["workers"].items(), key=lambda w: -w[1]["solutions"]):
+        print('  %-45s solutions %3i  bounds %3i  shared bounds %6i  conflicts %s' %
+              (worker, stats["solutions"], stats["bounds"], stats["shared_bounds"],
+               stats.get("conflicts", "-")))
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 13:20:00 2026
+
+Weapon allocation for the Engage phase of the flexible targetshop model.
+
+The weapon data from KC_data_melt.import_weapon_data and the loadouts in the
+big dataframe are turned into dense arrays indexed by weapon type (wt),
+target type (tt) and platform type (pt):
+    sspk[wt, tt]: single shot probability of kill (inp_SSPK)
+    shots[wt, tt]: shots required (wpns_shots_reqd), NaN if not usable
+    loadout[pt, wt]: weapons carried per platform (inp_WpnLoadout)
+    inventory[wt]: theater inventory (Available Inventory)
+The (pt, wt, tt) choices that can never be used are removed before the model
+is built (optionally with the choices dominated by another weapon carried by
+the same platform type), so only the remaining pairings become CP variables.
+"""
+
+import numpy as np
+
+
+def weapon_arrays(df, df_wt):
+    """This function builds the dense weapon arrays and returns them in a
+    dictionary together with the index tuples (weapon_types, target_types,
+    plat_types) that give the meaning of each axis.
+    Arguments:
+        df: the big dataframe from KC_data_melt.create_big_dataframe
+        df_wt: the weapon dataframe from KC_data_melt.import_weapon_data"""
+    weapon_types = tuple(df_wt["Weapon Type"])
+    target_types = tuple(sorted(set(df["Target Type"])))
+    plat_types = tuple(sorted(set(df["Plat Type"])))
+
+    wt_data = df_wt.set_index("Weapon Type")
+    sspk = wt_data[["SSPk_" + tt for tt in target_types]].to_numpy(dtype=float)
+    shots = wt_data[list(target_types)].to_numpy(dtype=float)
+    inventory = wt_data["Available Inventory"].to_numpy(dtype=float)
+
+    pt_data = df.drop_duplicates("Plat Type").set_index("Plat Type")
+    loadout = pt_data.loc[list(plat_types), list(weapon_types)].to_numpy(dtype=float)
+
+    return {"weapon_types": weapon_types,
+            "target_types": target_types,
+            "plat_types": plat_types,
+            "sspk": np.nan_to_num(sspk),
+            "shots": shots,
+            "loadout": loadout,
+            "inventory": inventory}
+
+
+def weapon_candidates(arrays, prune_dominated=False):
+    """This function returns a boolean array candidates[pt, wt, tt] that is
+    True when platform type pt may engage target type tt with weapon type wt.
+    A choice is removed when the weapon has no shots-required value or a zero
+    SSPk against the target type, or when the platform type does not carry
+    enough of it for one engagement.
+    With prune_dominated, a choice is also removed when the platform type
+    carries another usable weapon that needs no more shots, has at least the
+    same SSPk (one of the two strictly better) and of which it carries at least
+    as many. This is a heuristic, off by default: it can cut schedules that
+    would mix weapon types to stretch a platform's loadout over more targets."""
+    shots = arrays["shots"]
+    sspk = arrays["sspk"]
+    loadout = arrays["loadout"]
+
+    # usable[pt, wt, tt]
+    valid = ~np.isnan(shots) & (np.nan_to_num(shots) > 0) & (sspk > 0)
+    usable = valid[None, :, :] & (loadout[:, :, None] >= np.nan_to_num(shots)[None, :, :])
+    if not prune_dominated:
+        return usable
+
+    # compare every pair of weapons (w1 dominates w2) for every (pt, tt)
+    s = np.where(valid, shots, np.inf)
+    no_more_shots = s[:, None, :] <= s[None, :, :]  # [w1, w2, tt]
+    no_less_sspk = sspk[:, None, :] >= sspk[None, :, :]
+    strictly = (s[:, None, :] < s[None, :, :]) | (sspk[:, None, :] > sspk[None, :, :])
+    better = no_more_shots & no_less_sspk & strictly
+    no_less_loadout = loadout[:, :, None] >= loadout[:, None, :]  # [pt, w1, w2]
+
+    dominates = (usable[:, :, None, :] & better[None, :, :, :]
+                 & no_less_loadout[:, :, :, None])  # [pt, w1, w2, tt]
+    return usable & ~dominates.any(axis=1)
+
+
+def armed_mask(df, arrays, candidates=None, engage_phase="Engage"):
+    """This function returns the boolean array armed[target_num, phase_num,
+    plat_num] (1-based): True where the row of the big dataframe exists and
+    is not an Engage alternative, or its platform type carries a candidate
+    weapon type against the target type. An unarmed platform cannot take the
+    Engage phase, so the alternatives outside the mask are removed before the
+    build with KC_geo.prune_alternatives (and KC_geo.unserved_phases gives the
+    Engage phases left without a platform)."""
+    if candidates is None:
+        candidates = weapon_candidates(arrays)
+    usable = candidates.any(axis=1)  # [pt, tt]
+    pt_index = {pt: k for k, pt in enumerate(arrays["plat_types"])}
+    tt_index = {tt: k for k, tt in enumerate(arrays["target_types"])}
+    pt = df["Plat Type"].map(pt_index).to_numpy()
+    tt = df["Target Type"].map(tt_index).to_numpy()
+
+    t, i, p = (df[c].to_numpy() for c in ("Target_num", "Phase_num", "Plat_num"))
+    armed = np.zeros((t.max() + 1, i.max() + 1, p.max() + 1), dtype=bool)
+    armed[t, i, p] = (df["Phase"] != engage_phase).to_numpy() | usable[pt, tt]
+    return armed
+
+
+def expended_limit(loadout, max_loadouts=None):
+    """Returns the number of weapons of one type a platform may expend: its
+    loadout of the weapon type times its Max loadouts expended per platform
+    (KC_parameters.model_limits), one loadout if max_loadouts is None, and None
+    when max_loadouts is -1 (no limit)."""
+    if max_loadouts is None:
+        return int(loadout)
+    if max_loadouts < 0:
+        return None
+    return int(loadout) * int(max_loadouts)
+
+
+def add_weapon_allocation(model, handles, df, arrays, candidates=None, engage_phase="Engage",
+                          max_loadouts=None):
+    """This function adds the weapon allocation layer to a model built by
+    KC_model.flexible_targetshop_model. Every Engage alternative (t, p) gets
+    one literal per candidate weapon type; exactly one of them is true when the
+    alternative is selected. The weapons expended per platform and weapon type
+    are limited by the loadout (times max_loadouts[plat_num], the Max loadouts
+    expended per platform of KC_parameters.model_limits, if given; see
+    expended_limit), and per weapon type by the inventory.
+    The literals are stored in handles["weapon_choices"] and the number of
+    shots of each choice in handles["weapon_shots"], both indexed by
+    (target_num, plat_num, weapon_type). An Engage alternative with no
+    candidate weapon type is never selected (prune it before the build with
+    armed_mask); ValueError is raised if that leaves an Engage phase of a
+    required target (a model without optional_targets) with no platform."""
+    if candidates is None:
+        candidates = weapon_candidates(arrays)
+    weapon_types = arrays["weapon_types"]
+    tt_index = {tt: k for k, tt in enumerate(arrays["target_types"])}
+    pt_index = {pt: k for k, pt in enumerate(arrays["plat_types"])}
+
+    engage = df[df["Phase"] == engage_phase]
+    engage_id = int(engage["Phase_num"].iloc[0])
+    target_type = dict(zip(engage["Target_num"], engage["Target Type"]))
+    plat_type = dict(zip(engage["Plat_num"], engage["Plat Type"]))
+
+    choices = {}
+    shots = {}
+    armed = set()
+    unarmed = set()
+    for (t, i, p), presence in handles["presences"].items():
+        if i != engage_id:
+            continue
+        pt, tt = pt_index[plat_type[p]], tt_index[target_type[t]]
+        if not candidates[pt, :, tt].any():
+            model.Add(presence == 0)  # an unarmed platform cannot engage
+            unarmed.add(t)
+            continue
+        armed.add(t)
+        l_choices = []
+        for w in np.flatnonzero(candidates[pt, :, tt]):
+            key = (t, p, weapon_types[w])
+            choices[key] = model.NewBoolVar('weapon_tgt%i_plat%i_%s' % key)
+            shots[key] = int(arrays["shots"][w, tt])
+            l_choices.append(choices[key])
+
+        # one weapon type per engagement, none if the platform is not selected
+        model.Add(sum(l_choices) == presence)
+    if "prosecuted" not in handles and unarmed - armed:
+        raise ValueError("no platform with a usable weapon for (target, phase) %s" %
+                         [(t, engage_id) for t in sorted(unarmed - armed)])
+
+    # weapons expended per platform and weapon type, and per weapon type
+    per_platform = {}
+    per_weapon = {}
+    for (t, p, wt), choice in choices.items():
+        per_platform.setdefault((p, wt), []).append(shots[(t, p, wt)] * choice)
+        per_weapon.setdefault(wt, []).append(shots[(t, p, wt)] * choice)
+    for (p, wt), expended in per_platform.items():
+        limit = expended_limit(arrays["loadout"][pt_index[plat_type[p]], weapon_types.index(wt)],
+                               None if max_loadouts is None else max_loadouts[p])
+        if limit is not None:
+            model.Add(sum(expended) <= limit)
+    for wt, expended in per_weapon.items():
+        model.Add(sum(expended) <= int(arrays["inventory"][weapon_types.index(wt)]))
+
+    handles["weapon_choices"] = choices
+    handles["weapon_shots"] = shots
+    return choices
+
+
+def weapons_expended(handles):
+    """Returns the linear expression of the total number of weapons expended
+    by the weapon allocation layer."""
+    return sum(handles["weapon_shots"][key] * choice
+               for key, choice in handles["weapon_choices"].items())
+
+
+def selected_weapons(solver, handles):
+    """Returns the weapon type and shots chosen in a solution, as a dictionary
+    indexed by (target_num, plat_num)."""
+    return {(t, p): (wt, handles["weapon_shots"][(t, p, wt)])
+            for (t, p, wt), choice in handles["weapon_choices"].items()
+            if solver.BooleanValue(choice)}
+
+
+if __name__ == "__main__":
+    import KC_data_melt
+    import time
+
+    f = "small_inputs_gmuV5.xlsx"  # enter the filename (path) for the data
+    df = KC_data_melt.create_big_dataframe(f)
+    df_wt = KC_data_melt.import_weapon_data(f)
+
+    arrays = weapon_arrays(df, df_wt)
+    for prune in (False, True):
+        start_time = time.time()
+        candidates = weapon_candidates(arrays, prune_dominated=prune)
+        print('prune_dominated=%s: %i of %i (pt, wt, tt) choices kept in %.4f s' %
+              (prune, candidates.sum(), candidates.size, time.time() - start_time))
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 23:10:00 2026
+
+Batched what-if evaluation of a fixed schedule, without solving again.
+
+A schedule (the platform chosen for every phase and the phase starts, from the
+starts and presences of a solved model) fixes two orders: the phases of every
+target, and the sequence of the phases on every platform. Keeping both, the
+earliest start of a phase is the latest of the end of the previous phase of
+its target (plus the handoff gap, if any), the end of the previous phase on its
+platform and the release time of its platform. The phases are sorted into
+levels of the precedence graph once, so the forward pass is one numpy step per
+level over the whole batch of perturbed durations and release times.
+
+A perturbation that gives a phase a negative duration (the chosen platform
+can no longer do it) or removes a platform used by the schedule (infinite
+release time) makes the fixed schedule infeasible.
+"""
+
+import numpy as np
+
+
+def proc_time_array(df):
+    """This function returns the PLATPROCTIME of the big dataframe as a dense
+    array proc_time[target_num, phase_num, plat_num] (1-based, so index 0 is
+    unused), -1 where the platform cannot do the phase."""
+    t = df["Target_num"].to_numpy()
+    i = df["Phase_num"].to_numpy()
+    p = df["Plat_num"].to_numpy()
+    proc_time = np.full((t.max() + 1, i.max() + 1, p.max() + 1), -1, dtype=np.int64)
+    proc_time[t, i, p] = df["PLATPROCTIME"].to_numpy()
+    return proc_time
+
+
+def fixed_schedule(solver, handles, proc_time, gaps=None):
+    """This function reads the schedule found by the solver and prepares it for
+    evaluate. It returns a dictionary of arrays indexed by phase, in a
+    topological order of the schedule (sorted on start):
+        target, phase, platform: target_num, phase_num and plat_num
+        start, duration: the start and duration in the schedule
+        target_pred, platform_pred: index of the previous phase of the target
+            and on the platform (n, the number of phases, if none)
+        lag: minimum time between the end of target_pred and the start
+            (the handoff gap, 0 without gaps)
+        levels: list of index arrays, the phases of every level of the
+            precedence graph
+    Arguments:
+        solver, handles: the solver and the handles of a model built by
+            KC_model.flexible_targetshop_model
+        proc_time: array from proc_time_array
+        gaps: optional handoff gaps[phase_num, p, p'] from KC_link_graph"""
+    chosen = [(t, i, p) for (t, i, p), presence in handles["presences"].items()
+              if solver.BooleanValue(presence)]
+    target, phase, platform = (np.array(column, dtype=np.int64) for column in zip(*chosen))
+    start = np.array([solver.Value(handles["starts"][(t, i)]) for t, i, _ in chosen], dtype=np.int64)
+    return schedule_arrays(target, phase, platform, start, proc_time, gaps)
+
+
+def schedule_arrays(target, phase, platform, start, proc_time, gaps=None):
+    """This function returns the schedule dictionary of fixed_schedule from
+    arrays with one entry per scheduled phase: target_num, phase_num, chosen
+    plat_num and start."""
+    duration = proc_time[target, phase, platform]
+    order = np.lexsort((phase, target, start + duration, start))
+    target, phase, platform = target[order], phase[order], platform[order]
+    start, duration = start[order], duration[order]
+    n = len(order)
+
+    target_pred = np.full(n, n, dtype=np.int64)
+    platform_pred = np.full(n, n, dtype=np.int64)
+    by_target = np.lexsort((phase, target))
+    same = target[by_target[1:]] == target[by_target[:-1]]
+    target_pred[by_target[1:][same]] = by_target[:-1][same]
+    by_platform = np.lexsort((np.arange(n), platform))
+    same = platform[by_platform[1:]] == platform[by_platform[:-1]]
+    platform_pred[by_platform[1:][same]] = by_platform[:-1][same]
+
+    lag = np.zeros(n)
+    if gaps is not None:
+        has = target_pred < n
+        lag[has] = gaps[phase[target_pred[has]], platform[target_pred[has]], platform[has]]
+
+    # level of every phase: 1 + the level of its predecessors (sorted on start,
+    # the predecessors come first)
+    level = np.zeros(n + 1, dtype=np.int64)
+    for k in range(n):
+        level[k] = 1 + max(level[target_pred[k]], level[platform_pred[k]])
+    level = level[:n]
+    by_level = np.argsort(level, kind="stable")
+    levels = np.split(by_level, np.flatnonzero(np.diff(level[by_level])) + 1)
+
+    return {"target": target, "phase": phase, "platform": platform, "start": start,
+            "duration": duration, "target_pred": target_pred, "platform_pred": platform_pred,
+            "lag": lag, "levels": levels}
+
+
+def gather_durations(schedule, proc_time):
+    """This function returns the durations of the scheduled phases from one or
+    a batch of proc_time arrays ([..., target_num, phase_num, plat_num]), as an
+    array [..., phase]."""
+    return proc_time[..., schedule["target"], schedule["phase"], schedule["platform"]]
+
+
+def evaluate(schedule, durations=None, release=None, horizon=None):
+    """This function evaluates a batch of what-ifs on the fixed schedule and
+    returns a dictionary:
+        feasible: [batch] True if the schedule is still feasible
+        starts, ends: [batch, phase] earliest starts and ends (inf where a
+            phase waits for a removed platform)
+        makespan: [batch] makespan (inf if infeasible)
+        invalid: [batch, phase] True where the chosen platform cannot do the
+            phase or has been removed
+    Arguments:
+        schedule: dictionary from fixed_schedule
+        durations: [batch, phase] durations (see gather_durations); defaults
+            to the durations of the schedule
+        release: [batch, plat_num] earliest time every platform can be used,
+            inf if it is removed; defaults to 0
+        horizon: if given, a makespan above it is infeasible
+    A single row of durations or release times is used for the whole batch."""
+    n = len(schedule["target"])
+    if durations is None:
+        durations = schedule["duration"]
+    durations = np.atleast_2d(durations).astype(float)
+    if release is None:
+        release = np.zeros((1, schedule["platform"].max() + 1))
+    release = np.atleast_2d(release)
+    batch = max(durations.shape[0], release.shape[0])
+    durations = np.broadcast_to(durations, (batch, n))
+    release_at = np.broadcast_to(release, (batch, release.shape[1]))[:, schedule["platform"]]
+    invalid = (durations < 0) | np.isinf(release_at)
+
+    # ends[:, n] is the end of the missing predecessor
+    ends = np.zeros((batch, n + 1))
+    starts = np.empty((batch, n))
+    target_pred, platform_pred, lag = schedule["target_pred"], schedule["platform_pred"], schedule["lag"]
+    for ops in schedule["levels"]:
+        s = np.maximum(ends[:, target_pred[ops]] + lag[ops], ends[:, platform_pred[ops]])
+        s = np.maximum(s, release_at[:, ops])
+        starts[:, ops] = s
+        ends[:, ops] = s + np.maximum(durations[:, ops], 0)
+
+    makespan = ends[:, :n].max(axis=1)
+    feasible = ~invalid.any(axis=1)
+    if horizon is not None:
+        feasible &= makespan <= horizon
+    makespan[~feasible] = np.inf
+    return {"feasible": feasible, "starts": starts, "ends": ends[:, :n],
+            "makespan": makespan, "invalid": invalid}
+
+
+def platform_removals(num_platforms):
+    """This function returns the release array of the what-ifs that remove one
+    platform each: [num_platforms, plat_num + 1], inf for the removed
+    platform (row k removes plat_num k + 1)."""
+    release = np.zeros((num_platforms, num_platforms + 1))
+    release[np.arange(num_platforms), np.arange(1, num_platforms + 1)] = np.inf
+    return release
+
+
+if __name__ == "__main__":
+    import time
+    from ortools.sat.python import cp_model
+    import KC_data_stack
+    import KC_model
+
+    f = "small_inputs_gmuV5.xlsx"  # enter the filename (path) for the data
+    df = KC_data_stack.create_big_dataframe(f)
+    model, handles = KC_model.flexible_targetshop_model(df, formulation="lean")
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = 10.0
+    status = solver.Solve(model)
+    print('Solve status: %s, makespan %i' % (solver.StatusName(status), solver.ObjectiveValue()))
+
+    proc_time = proc_time_array(df)
+    schedule = fixed_schedule(solver, handles, proc_time)
+    base = evaluate(schedule)
+    print('%i phases in %i levels, left-shifted makespan %i' %
+          (len(schedule["target"]), len(schedule["levels"]), base["makespan"][0]))
+
+    num_platforms = int(df["Plat_num"].max())
+    removed = evaluate(schedule, release=platform_removals(num_platforms))
+    for p in range(num_platforms):
+        print('  without platform %i: feasible %s, %i phases to reassign' %
+              (p + 1, removed["feasible"][p], removed["invalid"][p].sum()))
+
+    # random +-20% changes of the processing times
+    rng = np.random.default_rng(0)
+    batch = 10000
+    factors = rng.uniform(0.8, 1.2, (batch, len(schedule["target"])))
+    start_time = time.time()
+    result = evaluate(schedule, np.round(schedule["duration"] * factors))
+    elapsed = time.time() - start_time
+    print('%i what-ifs in %.3f s (%.0f per second): makespan %i..%i' %
+          (batch, elapsed, batch / elapsed, result["makespan"].min(), result["makespan"].max()))
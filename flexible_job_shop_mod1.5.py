@@ -18,37 +18,48 @@ targets. This is called the makespan.
 from ortools.sat.python import cp_model
 # import pandas as pd
 import KC_data_melt
+import KC_data_stack
+import KC_model
+import KC_multiobjective
+import KC_weapons
+import KC_link_graph
+import KC_jamming
+import KC_model_io
+import KC_telemetry
+import KC_bounds
+import KC_geo
+import KC_kinematics
+import KC_solve
+import KC_parameters
+import KC_diagnosis
+import KC_data_cache
 import time
-import collections
 
 start_time = time.time()
 
-###### Define solution printer class for printing results
-class SolutionPrinter(cp_model.CpSolverSolutionCallback):
-    """Print intermediate solutions."""
-
-    def __init__(self):
-        cp_model.CpSolverSolutionCallback.__init__(self)
-        self.__solution_count = 0
-
-    def on_solution_callback(self):
-        """Called at each new solution."""
-        print('Solution %i, time: %f s, BestBd: %i, Makespan: %i, Gap: %i' %
-              (self.__solution_count, round(self.WallTime(),2), 
-               self.BestObjectiveBound(), self.ObjectiveValue(), 
-               (self.ObjectiveValue()-self.BestObjectiveBound())/self.BestObjectiveBound()))
-        self.__solution_count += 1
+###### Define solution printer for printing results
+def print_solution(incumbent, handles=None):
+    """Print intermediate solutions (incumbents of KC_solve). With the optional
+    targets objective, the targets prosecuted, their uncovered priority and
+    the makespan are printed."""
+    if handles is not None and "coverage_weight" in handles:
+        uncovered, makespan = KC_multiobjective.split_coverage_objective(incumbent["objective"], handles)
+        print('Solution %i, time: %f s, Targets: %i, Uncovered priority: %i, Makespan: %i' %
+              (incumbent["solution"], round(incumbent["time"],2),
+               len(set(row[0] for row in incumbent["schedule"])), uncovered, makespan))
+        return
+    print('Solution %i, time: %f s, BestBd: %i, Makespan: %i, Gap: %.3f' %
+          (incumbent["solution"], round(incumbent["time"],2), 
+           incumbent["bound"], incumbent["objective"], incumbent["gap"]))
 
 ###### Import Data
 
-# define model parameters
-parameters = KC_data_melt.define_parameters(max_horizon_min=7200, 
-                                       same_plat_for_Track_phases=0,
-                                       max_eng_wins_btw_find_engage=1)
-
 f = "small_inputs_gmuV5.xlsx"  # enter the filename (path) for the data
 
-df = KC_data_melt.create_big_dataframe(f)
+# define model parameters (Control sheet)
+parameters = KC_parameters.read_control(f)
+
+df = KC_data_stack.create_big_dataframe(f)  # same dataframe as KC_data_melt, less memory
 df_wt = KC_data_melt.import_weapon_data(f)
 
 print("Data loaded. This operation took", round(time.time() - start_time, 2), "seconds.\n")
@@ -77,144 +88,217 @@ idx_wt = tuple(set(df_wt['Weapon Type']))
 idx_tip = tuple([df["(t,i,p)"][row] for row in range(len(df))])
 idx_tip_num = tuple([df["(t,i,p)_num"][row] for row in range(len(df))])
 
-def flexible_targetshop():
-    """Solve a small flexible targetshop problem."""
-    # Data part.    
-    
-    # targets = [  # phase = (processing_time, platform_id)
-    #     [  # target 0
-    #         [(3, 0), (1, 1), (5, 2)],  # phase 0 with 3 alternatives
-    #         [(2, 0), (4, 1), (6, 2)],  # phase 1 with 3 alternatives
-    #         [(2, 0), (3, 1), (1, 2)],  # phase 2 with 3 alternatives
-    #     ],
-    #     [  # target 1
-    #         [(2, 0), (3, 1), (4, 2)],
-    #         [(1, 0), (5, 1), (4, 2)],
-    #         [(2, 0), (1, 1), (4, 2)],
-    #     ],
-    #     [  # target 2
-    #         [(2, 0), (1, 1), (4, 2)],
-    #         [(2, 0), (3, 1), (4, 2)],
-    #         [(3, 0), (1, 1), (5, 2)],
-    #     ],
-    # ]
-
-    num_targets = len(idx_t)
-    all_targets = range(1,num_targets+1)
-
-    num_platforms = len(idx_p)
-    all_platforms = range(1,num_platforms+1)
+def flexible_targetshop(formulation="reified", multi_objective=None, weights=None,
+                        max_time_in_seconds=None, weapons=False, links=False,
+                        jamming=None, model_file=None, telemetry=None, metrics_port=None,
+                        bounds=False, range_pruning=False, kinematics=False,
+                        deadline=None, gap_limit=0.0, control=False, target_coverage=None,
+                        optional_targets=False, diagnose=False):
+    """Solve the flexible targetshop problem built from the big dataframe.
+    Arguments:
+        formulation: "reified" links each alternative to the phase with
+            reified equalities (OR-Tools example encoding); "lean" shares the
+            phase start across alternatives and picks the duration with an
+            element constraint. See KC_model for details.
+        multi_objective: None minimizes the makespan only. "lexicographic"
+            minimizes makespan, weighted completion, platforms used and weapons
+            expended in that order; "weighted" minimizes their weighted sum.
+            See KC_multiobjective for details.
+        weights: dictionary of objective weights for the "weighted" mode
+        max_time_in_seconds: solver time limit (per stage in lexicographic mode)
+        weapons: if True, add the Engage phase weapon allocation (KC_weapons);
+            the Engage alternatives of platforms that carry no usable weapon
+            against the target are removed before the build
+        links: if True, add the communication handoff latency between
+            consecutive phases as setup gaps (KC_link_graph), over the links
+            whose range covers the distance between the platforms (KC_geo)
+        jamming: None, "parallel" or "two_stage" to solve one scenario per
+            jamming state on a shared model skeleton (KC_jamming); the
+            latencies and link ranges of each jamming state are applied
+        model_file: if given, the built model (with its weapons and links
+            layers) is exported to this file, or imported from it without a
+            build when it exists and was built with the same options and
+            workbook sheets (KC_model_io)
+        telemetry: if given, the run record of the solve (response, presolve
+            reductions, per-worker contributions, objective and bound
+            trajectory) is written to this JSON or Parquet file (KC_telemetry)
+        metrics_port: if given, the live solve metrics are served on
+            http://127.0.0.1:<metrics_port>/metrics during the solve
+        bounds: if True, lower bounds on the makespan are computed without
+            CP-SAT while the model is built (KC_bounds), added to the model as
+            a constraint, and used for the gap of the solution printer
+        range_pruning: if True, the alternatives whose platform is farther
+            from the target than PLATRANGE, or cannot see it over the horizon
+            (LOS limited platform types), are removed before the build
+            (KC_geo)
+        kinematics: if True, the weapon fly-out and IFTU windows computed
+            from the weapon speeds, ranges and distances bound the Engage,
+            IFTU and Assess phases (KC_kinematics); the phases left without
+            a platform are reported as with range_pruning
+        deadline: if given, the wall-clock time (time.time()) by which the
+            solve must return its best schedule (KC_solve)
+        gap_limit: relative gap to the best lower bound at which the search
+            stops with a good enough schedule (0 waits for optimality)
+        control: if True, the limits of the Control sheet and of the
+            platform and weapon type sheets (horizon, Max loadouts expended
+            per platform with weapons, Min and Max Fraction of Targets) are
+            added to the model (KC_parameters)
+        target_coverage: fraction of the targets that must be prosecuted
+            (default: all, none with optional_targets). Below 1, the targets
+            are optional and the solver picks the ones to prosecute, also
+            when some cannot be served at all; the bounds of the full
+            schedule are then not used
+        optional_targets: if True, the targets are optional and the
+            objective maximizes the priority-weighted prosecuted targets,
+            then minimizes the makespan (KC_multiobjective), so an overloaded
+            scenario returns a partial plan instead of being infeasible
+        diagnose: if True and the model is infeasible, a small set of
+            conflicting constraint groups (precedence chains, platform
+            NoOverlap/capacity, time windows, weapon inventories) is reported
+            with the target, platform and weapon IDs (KC_diagnosis)"""
+    if target_coverage is None:
+        target_coverage = 0.0 if optional_targets else 1.0
+    optional = optional_targets or target_coverage < 1
+    if jamming is not None:
+        tables = KC_link_graph.import_link_tables(f)
+        scenarios = KC_jamming.default_scenarios(df, tables)
+        solve_scenarios = KC_jamming.solve_parallel if jamming == "parallel" else KC_jamming.solve_two_stage
+        results, handles = solve_scenarios(df, tables, scenarios, formulation=formulation,
+                                           distance=KC_geo.platform_distance(df),
+                                           max_time_in_seconds=max_time_in_seconds)
+        print(f'Horizon = {handles["horizon"]}')
+        for name in scenarios:
+            print('Scenario %s: status %s, makespan %s' %
+                  (name, results[name]["status"], results[name]["makespan"]))
+        return
+
+    model_df = df
+    if range_pruning:
+        mask = KC_geo.feasibility_mask(df)
+        unserved = KC_geo.unserved_phases(df, mask)
+        if unserved:
+            print('No platform in range and line of sight for (target, phase) %s' % unserved)
+            if not optional:
+                return
+        model_df = KC_geo.prune_alternatives(df, mask)
+    if kinematics:
+        windows = KC_kinematics.iftu_windows(KC_kinematics.kinematics_arrays(df, df_wt))
+        windowed = KC_kinematics.apply_windows(model_df, windows)
+        unserved = KC_geo.unserved_phases(model_df, KC_geo.alternative_mask(windowed))
+        if unserved:
+            print('No platform within the weapon and IFTU windows for (target, phase) %s' % unserved)
+            if not optional:
+                return
+        model_df = windowed
+    if weapons:
+        armed = KC_weapons.armed_mask(model_df, KC_weapons.weapon_arrays(df, df_wt))
+        unserved = KC_geo.unserved_phases(model_df, armed)
+        if unserved:
+            print('No platform with a usable weapon for (target, phase) %s' % unserved)
+            if not optional:
+                return
+        model_df = KC_geo.prune_alternatives(model_df, armed)
+    lower_bounds = KC_bounds.start_bounds(model_df) if bounds and not optional else None
 
     # Model the flexible targetshop problem.
-    model = cp_model.CpModel()
-
-    horizon = 0
-    for t in idx_t_num:
-        for p in idx_p_num:
-            max_phase_duration = 0
-            for i in idx_i_num:
-                duration = df[df["(t,i,p)_num"] == (t,i,p)]["PLATPROCTIME"].item()
-                max_phase_duration = max(max_phase_duration, duration)
-            horizon += max_phase_duration
-
-    print(f'Horizon = {horizon}')
-
-    # Global storage of variables.
-    intervals_per_resources = collections.defaultdict(list)
-    starts = {}  # indexed by (target_id, phase_id).
-    presences = {}  # indexed by (target_id, phase_id, plat_id).
-    target_ends = []
-
-    # Scan the targets and create the relevant variables and intervals.
-    for target_id in all_targets:
-        target = df[df["Target_num"] == target_id]
-        num_phases = len(idx_i)
-        previous_end = None
-        for phase_id in range(1,num_phases+1):
-            phase = target[(target["Phase_num"] == phase_id) & (target["PLATPROCTIME"] >= 0)]
-
-            # min_duration = phase[phase["PLATPROCTIME"] == min(phase["PLATPROCTIME"]) 
-            #                      & (phase["PLATPROCTIME"] >=0)].tolist()[0]
-            # max_duration = phase[phase["PLATPROCTIME"] == max(phase["PLATPROCTIME"])].tolist()[0]
-            
-            num_alternatives = len(set(phase[phase["PLATPROCTIME"] >=0]["Plat_num"]))
-            all_alternatives = tuple(set(phase[phase["PLATPROCTIME"] >=0]["Plat_num"]))
-            
-            # I'm pretty sure we don't have to execute the code below because I selected max and min from df above
-            # for alt_id in range(1, num_alternatives):
-            #     alt_duration = phase[alt_id][0]
-            #     min_duration = min(min_duration, alt_duration)
-            #     max_duration = max(max_duration, alt_duration)
-
-            # Create main interval for the phase.
-            domain = cp_model.Domain.FromValues(phase["PLATPROCTIME"].tolist())
-            suffix_name = '_tgt%i_phase%i' % (target_id, phase_id)
-            start = model.NewIntVar(0, horizon, 'start' + suffix_name) 
-            duration = model.NewIntVarFromDomain(
-                domain=domain, name='duration' + suffix_name)  # I'm skeptical that this will work. Because of the traceability and other rules that will folow from chosing a particular platform
-            end = model.NewIntVar(0, horizon, 'end' + suffix_name)
-            interval = model.NewIntervalVar(start, duration, end,
-                                            'interval' + suffix_name)   # Consider using optional intervals with an x variable
-
-            # Store the start for the solution.
-            starts[(target_id, phase_id)] = start  # I need to visualize this one. Will this work?
-
-            # Add precedence with previous phase in the same target.
-            if previous_end is not None:
-                model.Add(start >= previous_end)
-            previous_end = end
-
-            # Create alternative intervals.
-            if num_alternatives > 1:
-                l_presences = []
-                for alt_id in all_alternatives:
-                    alt_suffix = '_tgt%i_phase%i_plat%i' % (target_id, phase_id, alt_id)
-                    l_presence = model.NewBoolVar('presence' + alt_suffix)
-                    l_start = model.NewIntVar(0, horizon, 'start' + alt_suffix)
-                    l_duration = phase[phase["Plat_num"] == alt_id]["PLATPROCTIME"].item()
-                    l_end = model.NewIntVar(0, horizon, 'end' + alt_suffix)
-                    l_interval = model.NewOptionalIntervalVar(
-                        l_start, l_duration, l_end, l_presence,
-                        'interval' + alt_suffix)
-                    l_presences.append(l_presence)
-
-                    # Link the primary/global variables with the local ones.
-                    model.Add(start == l_start).OnlyEnforceIf(l_presence)
-                    model.Add(duration == l_duration).OnlyEnforceIf(l_presence)
-                    model.Add(end == l_end).OnlyEnforceIf(l_presence)
-
-                    # Add the local interval to the right platform.  # not sure if this is right... what is this?
-                    intervals_per_resources[phase[phase["Plat_num"]==alt_id]["Plat_num"].item()].append(l_interval)
-
-                    # Store the presences for the solution.
-                    presences[(target_id, phase_id, alt_id)] = l_presence
-
-                # Select exactly one presence variable.
-                model.AddExactlyOne(l_presences)
-            # else:  # would only need this portion if there would ever be a case of only one platform that could process the target type
-            #     intervals_per_resources[phase[0][1]].append(interval)
-            #     presences[(target_id, phase_id, 0)] = model.NewConstant(1)
-
-        target_ends.append(previous_end)
-
-    # Create platforms constraints.
-    for platform_id in all_platforms:
-        intervals = intervals_per_resources[platform_id]
-        if len(intervals) > 1:
-            model.AddNoOverlap(intervals)  # modify this later with more logic
-
-    # Makespan objective
-    makespan = model.NewIntVar(0, horizon, 'makespan')
-    model.AddMaxEquality(makespan, target_ends)
-    model.Minimize(makespan)
+    def build():
+        model, handles = KC_model.flexible_targetshop_model(model_df, formulation=formulation,
+                                                            optional_targets=optional)
+        limits = KC_parameters.model_limits(parameters, df, df_wt, target_coverage) if control else None
+        if weapons:
+            KC_weapons.add_weapon_allocation(model, handles, df, KC_weapons.weapon_arrays(df, df_wt),
+                                             max_loadouts=None if limits is None else limits["max_loadouts"])
+        if links:
+            gaps = KC_link_graph.handoff_gaps(df, KC_link_graph.import_link_tables(f),
+                                              KC_link_graph.import_platform_jamming_states(f),
+                                              KC_geo.platform_distance(df))
+            KC_link_graph.add_handoff_gaps(model, handles, gaps)
+        if kinematics:
+            KC_kinematics.add_iftu_windows(model, handles, windows)
+        if control:
+            print('Control limits added: %s' % KC_parameters.add_limits(model, handles, limits))
+        else:
+            KC_parameters.add_target_coverage(model, handles, target_coverage)
+        if optional_targets:
+            KC_multiobjective.add_coverage_objective(model, handles,
+                                                     KC_multiobjective.target_priorities(df))
+        return model, handles
+
+    model, handles, imported = KC_model_io.load_or_build(
+        model_file, build, {"formulation": formulation, "weapons": weapons, "links": links,
+                            "range_pruning": range_pruning, "kinematics": kinematics,
+                            "control": control, "target_coverage": target_coverage,
+                            "optional_targets": optional_targets,
+                            "sheets": KC_data_cache.sheet_hashes(f)})
+    if imported:
+        print('Model imported from %s' % model_file)
+    starts = handles["starts"]  # indexed by (target_id, phase_id).
+    presences = handles["presences"]  # indexed by (target_id, phase_id, plat_id).
+
+    print(f'Horizon = {handles["horizon"]}')
+    if lower_bounds is not None:
+        print('Lower bound = %i' % lower_bounds.result()["bound"])
+        KC_bounds.add_makespan_bound(model, handles, lower_bounds.result())
 
     # Solve model.
-    solver = cp_model.CpSolver()
-    solution_printer = SolutionPrinter()
-    status = solver.Solve(model, solution_printer)
+    if multi_objective is None:
+        solver = cp_model.CpSolver()
+        if max_time_in_seconds is not None:
+            solver.parameters.max_time_in_seconds = max_time_in_seconds
+        solve = None
+        if telemetry is not None or metrics_port is not None:
+            solve = lambda solver, model, callback: KC_telemetry.solve_with_telemetry(
+                solver, model, callback, name=f, record_path=telemetry,
+                metrics_port=metrics_port)[0]
+        handle = KC_solve.start_solve(model, handles, solver, deadline=deadline, gap=gap_limit,
+                                      bounds=lower_bounds, solve=solve,
+                                      on_solution=lambda incumbent: print_solution(incumbent, handles))
+        handle.wait()
+        status = handle.status
+    else:
+        terms = KC_multiobjective.add_objective_terms(model, handles, df, df_wt)
+        if multi_objective == "lexicographic":
+            solver, results = KC_multiobjective.solve_lexicographic(
+                model, terms, max_time_in_seconds=max_time_in_seconds)
+        else:
+            solver, results = KC_multiobjective.solve_weighted(
+                model, terms, weights, max_time_in_seconds=max_time_in_seconds)
+        KC_multiobjective.print_tradeoff(results)
+        if solver is None:
+            print('No solution found.')
+            return
+        status = solver.ResponseProto().status
+
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        print('Solve status: %s' % solver.StatusName(status))
+        print('No solution found after %f s.' % solver.WallTime())
+        if diagnose and status == cp_model.INFEASIBLE:
+            gaps = None
+            if links:
+                gaps = KC_link_graph.handoff_gaps(df, KC_link_graph.import_link_tables(f),
+                                                  KC_link_graph.import_platform_jamming_states(f),
+                                                  KC_geo.platform_distance(df))
+            limits = KC_parameters.model_limits(parameters, df, df_wt) if control else None
+            result = KC_diagnosis.diagnose(model_df, windows if kinematics else None, gaps, limits,
+                                           weapons=KC_weapons.weapon_arrays(df, df_wt) if weapons else None)
+            print('Diagnosis: %s, %i of %i constraint groups in conflict (minimal: %s, %.2f s)' %
+                  (result["status"], len(result["conflict"]), result["groups"],
+                   result["minimal"], result["time"]))
+            for line in result["report"]:
+                print('  ' + line)
+            if result["status"] in ("OPTIMAL", "FEASIBLE"):
+                print('The diagnosed groups are feasible together: the conflict involves '
+                      'the target coverage or the fractions of targets per weapon type.')
+            elif result["status"] == "UNKNOWN":
+                print('No conflict found within the time limit.')
+        return
 
     # Print final solution.
-    for target_id in all_targets:
+    prosecuted = handles.get("prosecuted", {})
+    for target_id in idx_t_num:
+        if target_id in prosecuted and not solver.BooleanValue(prosecuted[target_id]):
+            print('target %i: not prosecuted' % target_id)
+            continue
         print('target %i:' % target_id)
         for phase_id in idx_i_num:
             start_value = solver.Value(starts[(target_id, phase_id)])
@@ -222,16 +306,37 @@ def flexible_targetshop():
             duration = -1
             selected = -1
             for alt_id in idx_p_num:
+                if (target_id, phase_id, alt_id) not in presences:
+                    continue  # platform is not an alternative for this phase
                 if solver.Value(presences[(target_id, phase_id, alt_id)]):
-                    duration = df[df["(t,i,p)_num"] == (target_id, phase_id, alt_id)]["PLATPROCTIME"].item()
+                    duration = model_df[model_df["(t,i,p)_num"] == (target_id, phase_id, alt_id)]["PLATPROCTIME"].item()
                     platform = df[df["(t,i,p)_num"] == (target_id, phase_id, alt_id)]["Plat_num"].item()
                     selected = alt_id
             print(
                 '  phase_%i_%i starts at %i (alt %i, platform %i, duration %i)' %
                 (target_id, phase_id, start_value, selected, platform, duration))
 
+    if weapons:
+        print('Weapons:')
+        for (target_id, alt_id), (wt, shots) in sorted(KC_weapons.selected_weapons(solver, handles).items()):
+            print('  target %i engaged by platform %i with %i x %s' % (target_id, alt_id, shots, wt))
+
+    if prosecuted:
+        print('Targets prosecuted: %i of %i' %
+              (sum(solver.BooleanValue(literal) for literal in prosecuted.values()), len(prosecuted)))
+        if "coverage_weight" in handles and multi_objective is None:
+            print('Uncovered priority: %i, makespan: %i' %
+                  KC_multiobjective.split_coverage_objective(solver.ObjectiveValue(), handles))
+
     print('Solve status: %s' % solver.StatusName(status))
-    print('Optimal objective value: %i' % solver.ObjectiveValue())
+    if multi_objective is None:
+        print('Optimal objective value: %i' % solver.ObjectiveValue())
+    else:
+        # the objective of the solver is the last stage only: print every term
+        final = [r for r in results if any(n in r for n in KC_multiobjective.objective_names)][-1]
+        print('Objective values (%s): %s' %
+              (final["stage"], ', '.join('%s %i' % (n, final[n])
+                                         for n in KC_multiobjective.objective_names if n in final)))
     print('Statistics')
     print('  - conflicts : %i' % solver.NumConflicts())
     print('  - branches  : %i' % solver.NumBranches())
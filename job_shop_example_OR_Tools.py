@@ -2,6 +2,8 @@
 
 import collections
 from ortools.sat.python import cp_model
+import KC_job_shop
+import KC_model_io
 
 # enter the data
 jobs_data = [  # task = (machine_id, processing_time).
@@ -10,61 +12,27 @@ jobs_data = [  # task = (machine_id, processing_time).
     [(1, 4), (2, 3)]  # Job2
 ]
 
-machines_count = 1 + max(task[0] for job in jobs_data for task in job)
-all_machines = range(machines_count)
-all_jobs = range(len(jobs_data))  # added this, because its used below with no other prior definition
-# Computes horizon dynamically as the sum of all durations.
-horizon = sum(task[1] for job in jobs_data for task in job)
-
-model = cp_model.CpModel()
-
-# Named tuple to store information about created variables.
-task_type = collections.namedtuple(typename='task_type', field_names='start end interval')
+# The model is built by the job shop engine, which codes the machines from
+# their labels (the machines may be named by strings).
+arrays = KC_job_shop.job_arrays(jobs_data)
+all_machines = arrays["machine_labels"]
 # Named tuple to manipulate solution information.
 assigned_task_type = collections.namedtuple(typename='assigned_task_type',
                                             field_names='start job index duration')
 
-# Creates job intervals and add to the corresponding machine lists.
-all_tasks = {}
-machine_to_intervals = collections.defaultdict(list)
-
-for job_id, job in enumerate(jobs_data):
-    for task_id, task in enumerate(job):
-        machine = task[0]
-        duration = task[1]
-        suffix = '_%i_%i' % (job_id, task_id)
-        start_var = model.NewIntVar(0, horizon, 'start' + suffix)
-        end_var = model.NewIntVar(0, horizon, 'end' + suffix)
-        interval_var = model.NewIntervalVar(start_var, duration, end_var,
-                                            'interval' + suffix)
-        all_tasks[job_id, task_id] = task_type(start=start_var,
-                                               end=end_var,
-                                               interval=interval_var)
-        machine_to_intervals[machine].append(interval_var)
-
-
-# Create and add disjunctive constraints.
-for machine in all_machines:
-    model.AddNoOverlap(machine_to_intervals[machine])
+# Model file: exported after the build, or imported (skipping the build) if
+# it exists. Binary proto, or text if the name ends with ".txt".
+model_file = None  # e.g. "job_shop.pb"
 
-# Precedences inside a job.
-for job_id, job in enumerate(jobs_data):
-    for task_id in range(len(job) - 1):
-        model.Add(all_tasks[job_id, task_id +
-                            1].start >= all_tasks[job_id, task_id].end)
 
+def build_model():
+    """Builds the job shop model and returns it with its handles."""
+    model, handles = KC_job_shop.job_shop_model(arrays)
+    return model, {"starts": handles["starts"], "makespan": handles["makespan"]}
 
-# Makespan objective.
-obj_var = model.NewIntVar(0, horizon, 'makespan')
-model.AddMaxEquality(obj_var, [
-    all_tasks[job_id, len(job) - 1].end
-    for job_id, job in enumerate(jobs_data)
-])
-model.Minimize(obj_var)
 
-model.AddMaxEquality(
-    obj_var,
-    [all_tasks[(job, len(jobs_data[job]) - 1)].end for job in all_jobs])
+model, handles, imported = KC_model_io.load_or_build(model_file, build_model)
+starts = handles["starts"]
 
 # Run the solver
 solver = cp_model.CpSolver()
@@ -75,15 +43,13 @@ if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
     print('Solution:')
     # Create one list of assigned tasks per machine.
     assigned_jobs = collections.defaultdict(list)
-    for job_id, job in enumerate(jobs_data):
-        for task_id, task in enumerate(job):
-            machine = task[0]
-            assigned_jobs[machine].append(
-                assigned_task_type(start=solver.Value(
-                    all_tasks[job_id, task_id].start),
-                                   job=job_id,
-                                   index=task_id,
-                                   duration=task[1]))
+    for op, machine_code, duration in zip(arrays["op"], arrays["machine"], arrays["duration"]):
+        machine = all_machines[machine_code]
+        assigned_jobs[machine].append(
+            assigned_task_type(start=solver.Value(starts[op]),
+                               job=arrays["job"][op],
+                               index=arrays["task"][op],
+                               duration=duration))
 
     # Create per machine output lines.
     output = ''